@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Analisador Glicêmico
+#
+# Módulos independentes, dos mais leves ao servidor web:
+#   insulina      cálculo das doses (sem dependências externas)
+#   serie         série colunar das leituras e a etapa de doses (montar_dados)
+#   extracao      leitura do .mhtml e extratores de HTML (bs4/lxml carregados sob demanda)
+#   estatisticas  métricas do período e dados do gráfico
+#   banco         histórico em SQLite e agregados da coorte
+#   publicacao    arquivos da publicação estática
+#   pdf           exportação em PDF
+#   lote          importação em lote e a linha de comando
+#   web           aplicativo Flask (o único que importa o Flask)
+#
+# Este pacote não importa nenhum deles: cada ponto de entrada carrega só o que usa.
+# -----------------------------------------------------------------------------
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Banco de Leituras
+#
+# Histórico em SQLite por paciente e data (BancoGlicemias), com os agregados por dia e
+# por semana do painel da coorte.
+# -----------------------------------------------------------------------------
+
+import contextlib
+import datetime
+import hashlib
+import json
+import sqlite3
+import sys
+
+from .estatisticas import resumo_somas, somas_glicemias
+from .insulina import compilar_tabela_correcao
+from .instrumentacao import medido
+from .serie import EPOCA, data_do_dia
+
+# --- Banco de Leituras (SQLite) ---
+# Guarda, por paciente, cada dia importado com suas glicemias, refeições e as doses
+# calculadas (por conjunto de parâmetros), para montar relatórios de qualquer intervalo
+# sem reenviar as exportações antigas. A unidade de gravação é o dia: um dia idêntico ao
+# já gravado não é reescrito e um dia diferente só substitui o gravado se for ao menos tão
+# completo (mesma regra de mesclar_periodos), então importar a mesma exportação duas vezes,
+# ou exportações com períodos sobrepostos, não duplica leituras.
+# Para o painel da coorte, cada importação mantém também agregados por dia e por semana
+# (somas de glicemias e totais de insulina), atualizados pela diferença de cada dia gravado
+# ou substituído: o painel lê só esses agregados, sem reprocessar o histórico.
+VERSAO_BANCO = 2
+
+ESQUEMA_BANCO = """
+CREATE TABLE IF NOT EXISTS pacientes (id INTEGER PRIMARY KEY, nome TEXT NOT NULL UNIQUE, parametros_id TEXT);
+CREATE TABLE IF NOT EXISTS dias (
+    paciente_id INTEGER NOT NULL, data INTEGER NOT NULL, titulo TEXT NOT NULL, total_kcal REAL, total_carbs REAL,
+    tamanho INTEGER NOT NULL, assinatura TEXT NOT NULL, dataset_id TEXT,
+    PRIMARY KEY (paciente_id, data)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS glicemias (
+    paciente_id INTEGER NOT NULL, momento INTEGER NOT NULL, ordem INTEGER NOT NULL, tipo TEXT NOT NULL, valor INTEGER NOT NULL,
+    PRIMARY KEY (paciente_id, momento, ordem)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS refeicoes (
+    paciente_id INTEGER NOT NULL, data INTEGER NOT NULL, ordem INTEGER NOT NULL, nome TEXT NOT NULL,
+    total_kcal REAL, total_carbs REAL, alimentos TEXT NOT NULL,
+    PRIMARY KEY (paciente_id, data, ordem)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS parametros (id TEXT PRIMARY KEY, carb_ratio REAL NOT NULL, correction_table TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS doses (
+    paciente_id INTEGER NOT NULL, parametros_id TEXT NOT NULL, momento INTEGER NOT NULL, ordem INTEGER NOT NULL,
+    dose INTEGER NOT NULL, dose_carbs INTEGER NOT NULL, dose_correcao INTEGER NOT NULL,
+    PRIMARY KEY (paciente_id, parametros_id, momento, ordem)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_doses_momento ON doses (paciente_id, momento);
+CREATE TABLE IF NOT EXISTS importacoes (
+    dataset_id TEXT NOT NULL, paciente_id INTEGER NOT NULL, periodo TEXT, importado_em TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, paciente_id));
+CREATE TABLE IF NOT EXISTS resumos_dias (
+    paciente_id INTEGER NOT NULL, data INTEGER NOT NULL, leituras INTEGER NOT NULL, soma INTEGER NOT NULL, soma_quadrados INTEGER NOT NULL,
+    abaixo INTEGER NOT NULL, acima INTEGER NOT NULL,
+    PRIMARY KEY (paciente_id, data)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS resumos_semanas (
+    paciente_id INTEGER NOT NULL, semana INTEGER NOT NULL, dias INTEGER NOT NULL, leituras INTEGER NOT NULL, soma INTEGER NOT NULL,
+    soma_quadrados INTEGER NOT NULL, abaixo INTEGER NOT NULL, acima INTEGER NOT NULL,
+    PRIMARY KEY (paciente_id, semana)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_resumos_semanas ON resumos_semanas (semana);
+CREATE TABLE IF NOT EXISTS insulina_dias (
+    paciente_id INTEGER NOT NULL, parametros_id TEXT NOT NULL, data INTEGER NOT NULL, total INTEGER NOT NULL,
+    PRIMARY KEY (paciente_id, data, parametros_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS insulina_semanas (
+    paciente_id INTEGER NOT NULL, parametros_id TEXT NOT NULL, semana INTEGER NOT NULL, dias INTEGER NOT NULL, total INTEGER NOT NULL,
+    PRIMARY KEY (paciente_id, parametros_id, semana)) WITHOUT ROWID;
+"""
+
+class BancoGlicemias:
+    """Série temporal persistente das leituras, indexada por (paciente, momento em minutos desde 1970)."""
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with self._conectar() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+            if versao == 1:  # Bancos da versão 1: parâmetros da última importação e agregados da coorte
+                conexao.execute("ALTER TABLE pacientes ADD COLUMN parametros_id TEXT")
+            conexao.executescript(ESQUEMA_BANCO)
+            if versao == 1:
+                self.reconstruir_resumos(conexao)
+            conexao.execute(f"PRAGMA user_version = {VERSAO_BANCO}")
+
+    def _conectar(self):
+        return contextlib.closing(sqlite3.connect(self.caminho, timeout=30))
+
+    @staticmethod
+    def _paciente_id(conexao, nome, criar=False):
+        if criar:
+            conexao.execute("INSERT OR IGNORE INTO pacientes (nome) VALUES (?)", (nome,))
+        linha = conexao.execute("SELECT id FROM pacientes WHERE nome = ?", (nome,)).fetchone()
+        return linha[0] if linha else None
+
+    @staticmethod
+    def _parametros_id(carb_ratio, correction_table):
+        tabela = compilar_tabela_correcao(correction_table)
+        conteudo = json.dumps([float(carb_ratio), tabela.inicios, [str(f) for f in tabela.fins], tabela.doses])
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _semana(numero):
+        """Segunda-feira (em dias desde 1970) da semana do dia; 01/01/1970 foi uma quinta."""
+        return numero - (numero + 3) % 7
+
+    def _somar_semana(self, conexao, paciente_id, numero, dias, somas):
+        conexao.execute("INSERT INTO resumos_semanas VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (paciente_id, semana) DO UPDATE SET "
+                        "dias = dias + excluded.dias, leituras = leituras + excluded.leituras, soma = soma + excluded.soma, "
+                        "soma_quadrados = soma_quadrados + excluded.soma_quadrados, abaixo = abaixo + excluded.abaixo, acima = acima + excluded.acima",
+                        (paciente_id, self._semana(numero), dias, *somas))
+
+    def _somar_insulina(self, conexao, paciente_id, parametros_id, numero, dias, total):
+        conexao.execute("INSERT INTO insulina_semanas VALUES (?, ?, ?, ?, ?) ON CONFLICT (paciente_id, parametros_id, semana) DO UPDATE SET "
+                        "dias = dias + excluded.dias, total = total + excluded.total", (paciente_id, parametros_id, self._semana(numero), dias, total))
+        if dias < 0:  # A semana perdeu o último dia com doses desses parâmetros: some, como na reconstrução
+            conexao.execute("DELETE FROM insulina_semanas WHERE paciente_id = ? AND parametros_id = ? AND semana = ? AND dias = 0",
+                            (paciente_id, parametros_id, self._semana(numero)))
+
+    def reconstruir_resumos(self, conexao=None):
+        """Recalcula todos os agregados da coorte a partir das leituras e doses gravadas (migração ou verificação)."""
+        with (contextlib.nullcontext(conexao) if conexao else self._conectar()) as conexao, conexao:
+            for tabela in ('resumos_dias', 'resumos_semanas', 'insulina_dias', 'insulina_semanas'):
+                conexao.execute(f"DELETE FROM {tabela}")
+            conexao.execute("INSERT INTO resumos_dias SELECT d.paciente_id, d.data, COUNT(g.valor), COALESCE(SUM(g.valor), 0), "
+                            "COALESCE(SUM(g.valor * g.valor), 0), COALESCE(SUM(g.valor < 70), 0), COALESCE(SUM(g.valor > 180), 0) FROM dias d "
+                            "LEFT JOIN glicemias g ON g.paciente_id = d.paciente_id AND g.momento >= d.data * 1440 AND g.momento < (d.data + 1) * 1440 "
+                            "GROUP BY d.paciente_id, d.data")
+            conexao.execute("INSERT INTO resumos_semanas SELECT paciente_id, data - (data + 3) % 7, COUNT(*), SUM(leituras), SUM(soma), "
+                            "SUM(soma_quadrados), SUM(abaixo), SUM(acima) FROM resumos_dias GROUP BY 1, 2")
+            conexao.execute("INSERT INTO insulina_dias SELECT paciente_id, parametros_id, momento / 1440, SUM(dose) FROM doses GROUP BY 1, 2, 3")
+            conexao.execute("INSERT INTO insulina_semanas SELECT paciente_id, parametros_id, data - (data + 3) % 7, COUNT(*), SUM(total) "
+                            "FROM insulina_dias GROUP BY 1, 2, 3")
+            # Sem o histórico de qual foi a última importação, fica o conjunto de parâmetros com mais dias
+            conexao.execute("UPDATE pacientes SET parametros_id = (SELECT parametros_id FROM insulina_dias i WHERE i.paciente_id = pacientes.id "
+                            "GROUP BY parametros_id ORDER BY COUNT(*) DESC, parametros_id LIMIT 1) WHERE parametros_id IS NULL")
+
+    @medido('banco')
+    def importar(self, dados, carb_ratio, correction_table):
+        """
+        Grava os dias de 'dados' (saída de montar_dados, já com doses) e devolve a contagem de dias
+        'novos', 'substituidos', 'inalterados', 'mantidos' (o gravado era mais completo) e
+        'ignorados' (título sem data reconhecível).
+        """
+        serie, contagem = dados['serie'], dict.fromkeys(('novos', 'substituidos', 'inalterados', 'mantidos', 'ignorados'), 0)
+        parametros_id = self._parametros_id(carb_ratio, correction_table)
+        with self._conectar() as conexao, conexao:
+            paciente_id = self._paciente_id(conexao, dados['paciente'], criar=True)
+            conexao.execute("INSERT OR IGNORE INTO parametros VALUES (?, ?, ?)",
+                            (parametros_id, float(carb_ratio), json.dumps(dict(correction_table), ensure_ascii=False)))
+            conexao.execute("UPDATE pacientes SET parametros_id = ? WHERE id = ?", (parametros_id, paciente_id))
+            for d, dia in enumerate(dados['dias']):
+                if (data := data_do_dia(dia['data'])) is None:
+                    contagem['ignorados'] += 1
+                    continue
+                numero, (i0, i1) = (data - EPOCA).days, serie.intervalo_dia(d)
+                leituras = [(serie.timestamps[i], i - i0, serie.categorias[serie.tipos[i]], serie.valores[i]) for i in range(i0, i1)]
+                assinatura = hashlib.sha256(json.dumps([dia['data'], dia['total_kcal'], dia['total_carbs'], dia['refeicoes'], leituras],
+                                                       ensure_ascii=False).encode('utf-8')).hexdigest()
+                tamanho = len(leituras) + len(dia['refeicoes'])
+                gravado = conexao.execute("SELECT tamanho, assinatura FROM dias WHERE paciente_id = ? AND data = ?", (paciente_id, numero)).fetchone()
+                if gravado and gravado[1] != assinatura and gravado[0] > tamanho:
+                    contagem['mantidos'] += 1
+                    continue
+                if gravado and gravado[1] == assinatura:
+                    contagem['inalterados'] += 1
+                else:
+                    somas, anteriores = somas_glicemias([leitura[3] for leitura in leituras]), (0,) * 5
+                    if gravado:
+                        for tabela in ('glicemias', 'doses'):
+                            conexao.execute(f"DELETE FROM {tabela} WHERE paciente_id = ? AND momento >= ? AND momento < ?",
+                                            (paciente_id, numero * 1440, (numero + 1) * 1440))
+                        conexao.execute("DELETE FROM refeicoes WHERE paciente_id = ? AND data = ?", (paciente_id, numero))
+                        anteriores = conexao.execute("SELECT leituras, soma, soma_quadrados, abaixo, acima FROM resumos_dias WHERE paciente_id = ? AND data = ?",
+                                                     (paciente_id, numero)).fetchone() or anteriores
+                        # As doses do dia antigo, de todos os parâmetros, saíram junto com ele
+                        for outros_parametros, total in conexao.execute("SELECT parametros_id, total FROM insulina_dias WHERE paciente_id = ? AND data = ?",
+                                                                        (paciente_id, numero)).fetchall():
+                            self._somar_insulina(conexao, paciente_id, outros_parametros, numero, -1, -total)
+                        conexao.execute("DELETE FROM insulina_dias WHERE paciente_id = ? AND data = ?", (paciente_id, numero))
+                    conexao.execute("INSERT OR REPLACE INTO resumos_dias VALUES (?, ?, ?, ?, ?, ?, ?)", (paciente_id, numero, *somas))
+                    self._somar_semana(conexao, paciente_id, numero, 0 if gravado else 1, [novo - antigo for novo, antigo in zip(somas, anteriores)])
+                    conexao.execute("INSERT OR REPLACE INTO dias VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    (paciente_id, numero, dia['data'], dia['total_kcal'], dia['total_carbs'], tamanho, assinatura, dados.get('dataset_id')))
+                    conexao.executemany("INSERT INTO glicemias VALUES (?, ?, ?, ?, ?)", [(paciente_id, *leitura) for leitura in leituras])
+                    conexao.executemany("INSERT INTO refeicoes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        [(paciente_id, numero, ordem, r['nome'], r['total_kcal'], r['total_carbs'], json.dumps(r['alimentos'], ensure_ascii=False))
+                                         for ordem, r in enumerate(dia['refeicoes'])])
+                    contagem['substituidos' if gravado else 'novos'] += 1
+                conexao.executemany("INSERT OR REPLACE INTO doses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    [(paciente_id, parametros_id, serie.timestamps[i], i - i0, serie.doses[i], serie.doses_carbs[i], serie.doses_correcao[i])
+                                     for i in range(i0, i1)])
+                total = sum(serie.doses[i0:i1])
+                anterior = conexao.execute("SELECT total FROM insulina_dias WHERE paciente_id = ? AND data = ? AND parametros_id = ?",
+                                           (paciente_id, numero, parametros_id)).fetchone()
+                if anterior is None or anterior[0] != total:
+                    conexao.execute("INSERT OR REPLACE INTO insulina_dias VALUES (?, ?, ?, ?)", (paciente_id, parametros_id, numero, total))
+                    self._somar_insulina(conexao, paciente_id, parametros_id, numero, 0 if anterior else 1, total - (anterior[0] if anterior else 0))
+            if dados.get('dataset_id'):
+                conexao.execute("INSERT OR IGNORE INTO importacoes VALUES (?, ?, ?, ?)",
+                                (dados['dataset_id'], paciente_id, dados.get('periodo'), datetime.datetime.now().isoformat(timespec='seconds')))
+        return contagem
+
+    def carregar_base(self, paciente, inicio=None, fim=None):
+        """Base {"periodo", "dias"} (mesmo formato de extrair_mhtml) dos dias gravados entre as datas inicio e fim, inclusive."""
+        primeiro = (inicio - EPOCA).days if inicio else -sys.maxsize
+        ultimo = (fim - EPOCA).days if fim else sys.maxsize
+        with self._conectar() as conexao:
+            if (paciente_id := self._paciente_id(conexao, paciente)) is None:
+                return {"periodo": None, "dias": []}
+            dias = {numero: {"data": titulo, "total_kcal": kcal, "total_carbs": carbs, "refeicoes": [], "glicemias": []}
+                    for numero, titulo, kcal, carbs in conexao.execute(
+                        "SELECT data, titulo, total_kcal, total_carbs FROM dias WHERE paciente_id = ? AND data BETWEEN ? AND ? ORDER BY data",
+                        (paciente_id, primeiro, ultimo))}
+            if not dias:
+                return {"periodo": None, "dias": []}
+            primeiro, ultimo = min(dias), max(dias)
+            for momento, tipo, valor in conexao.execute(
+                    "SELECT momento, tipo, valor FROM glicemias WHERE paciente_id = ? AND momento >= ? AND momento < ? ORDER BY momento / 1440, ordem",
+                    (paciente_id, primeiro * 1440, (ultimo + 1) * 1440)):
+                dias[momento // 1440]["glicemias"].append({"hora": f"{momento % 1440 // 60:02d}:{momento % 60:02d}", "tipo": tipo, "valor": valor})
+            for numero, nome, kcal, carbs, alimentos in conexao.execute(
+                    "SELECT data, nome, total_kcal, total_carbs, alimentos FROM refeicoes WHERE paciente_id = ? AND data BETWEEN ? AND ? ORDER BY data, ordem",
+                    (paciente_id, primeiro, ultimo)):
+                dias[numero]["refeicoes"].append({"nome": nome, "total_kcal": kcal, "total_carbs": carbs, "alimentos": json.loads(alimentos)})
+        datas = [EPOCA + datetime.timedelta(days=primeiro), EPOCA + datetime.timedelta(days=ultimo)]
+        return {"periodo": f"{datas[0]:%d/%m/%y} - {datas[1]:%d/%m/%y}", "dias": list(dias.values())}
+
+    def pacientes(self):
+        """Pacientes com dias gravados: nome, primeira e última data (ISO) e número de dias."""
+        with self._conectar() as conexao:
+            linhas = conexao.execute("SELECT p.nome, MIN(d.data), MAX(d.data), COUNT(*) FROM pacientes p JOIN dias d ON d.paciente_id = p.id "
+                                     "GROUP BY p.id ORDER BY p.nome").fetchall()
+        return [{"nome": nome, "inicio": (EPOCA + datetime.timedelta(days=inicio)).isoformat(),
+                 "fim": (EPOCA + datetime.timedelta(days=fim)).isoformat(), "dias": total} for nome, inicio, fim, total in linhas]
+
+    def coorte(self, semanas=8, fim=None):
+        """
+        Resumo semanal de todos os pacientes nas 'semanas' semanas que terminam na de 'fim' (data;
+        padrão: a semana mais recente do banco), lido só dos agregados semanais. A insulina é a
+        calculada com os parâmetros da última importação de cada paciente.
+        """
+        with self._conectar() as conexao:
+            ultima = self._semana((fim - EPOCA).days) if fim else conexao.execute("SELECT MAX(semana) FROM resumos_semanas").fetchone()[0]
+            if ultima is None:
+                return {"semanas": [], "pacientes": []}
+            primeira = ultima - 7 * (semanas - 1)
+            linhas = conexao.execute(
+                "SELECT p.nome, s.semana, s.dias, s.leituras, s.soma, s.soma_quadrados, s.abaixo, s.acima, i.total FROM resumos_semanas s "
+                "JOIN pacientes p ON p.id = s.paciente_id LEFT JOIN insulina_semanas i "
+                "ON i.paciente_id = s.paciente_id AND i.parametros_id = p.parametros_id AND i.semana = s.semana "
+                "WHERE s.semana BETWEEN ? AND ? ORDER BY p.nome, s.semana", (primeira, ultima)).fetchall()
+        data_iso = lambda numero: (EPOCA + datetime.timedelta(days=numero)).isoformat()
+        pacientes = {}
+        for nome, semana, dias, *somas, insulina in linhas:
+            item = pacientes.setdefault(nome, {"nome": nome, "semanas": {}, "acumulado": [0] * 6, "insulina": None})
+            item["semanas"][data_iso(semana)] = resumo_somas(dias, somas, insulina)
+            item["acumulado"] = [a + b for a, b in zip(item["acumulado"], [dias, *somas])]
+            if insulina is not None:
+                item["insulina"] = (item["insulina"] or 0) + insulina
+        for item in pacientes.values():
+            dias, *somas = item.pop("acumulado")
+            item["periodo"] = resumo_somas(dias, somas, item.pop("insulina"))
+        return {"semanas": [data_iso(semana) for semana in range(primeira, ultima + 1, 7)], "fim": data_iso(ultima + 6), "pacientes": list(pacientes.values())}
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Configuração
+#
+# Opções do analisador lidas das variáveis de ambiente. Não importa nada além da
+# biblioteca padrão, para que a linha de comando do lote use os mesmos padrões do
+# servidor sem carregar o Flask.
+# -----------------------------------------------------------------------------
+
+import os
+
+def configuracao_do_ambiente(ambiente=None):
+    """Opções do aplicativo (as chaves do app.config), a partir de 'ambiente' (padrão: os.environ)."""
+    ambiente = os.environ if ambiente is None else ambiente
+    return {
+        # Leitura incremental do .mhtml (memória limitada); ative com MHTML_STREAMING=1
+        'MHTML_STREAMING': ambiente.get('MHTML_STREAMING') == '1',
+        # Extrator de HTML usado fora do modo streaming: 'bs4' (padrão), 'lxml' ou 'incremental'
+        'EXTRATOR_HTML': ambiente.get('EXTRATOR_HTML', 'bs4'),
+        # Processos do pool da importação em lote (/batch, um só pool para todas as requisições); vazio = número de CPUs
+        'LOTE_MAX_PROCESSOS': int(ambiente['LOTE_MAX_PROCESSOS']) if ambiente.get('LOTE_MAX_PROCESSOS') else None,
+        # Destino da publicação estática (/publish e "lote --publicar")
+        'DIRETORIO_RELATORIOS': 'relatorios',
+        'ARQUIVO_INDEX': 'index.html',
+        # 'html' (página completa por relatório) ou 'compacto' (JSON gzipado + página compartilhada)
+        'FORMATO_PUBLICACAO': ambiente.get('FORMATO_PUBLICACAO', 'html'),
+        # Pontos no gráfico de tendência; acima disso a série é reduzida por LTTB
+        'GRAFICO_MAX_PONTOS': int(ambiente.get('GRAFICO_MAX_PONTOS', 1000)),
+        # Banco SQLite onde cada importação é gravada (ver BancoGlicemias); vazio = desativado
+        'BANCO_GLICEMIAS': ambiente.get('BANCO_GLICEMIAS') or None,
+        # Threads da fila de uploads em segundo plano (/jobs)
+        'TAREFAS_MAX_TRABALHADORES': int(ambiente.get('TAREFAS_MAX_TRABALHADORES', 2)),
+        # Perfil cProfile de uma requisição com ?perfil=1 (só com PERFIL_HABILITADO=1), gravado nesta pasta
+        'PERFIL_HABILITADO': ambiente.get('PERFIL_HABILITADO') == '1',
+        'DIRETORIO_PERFIS': ambiente.get('DIRETORIO_PERFIS', 'perfis'),
+    }
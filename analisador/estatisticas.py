@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Estatísticas
+#
+# Métricas do período sobre a série colunar (analisar_dados_gerais, vetorizada com o
+# NumPy opcional), os resumos somáveis usados pelo banco e os pontos do gráfico de
+# tendência (LTTB).
+# -----------------------------------------------------------------------------
+
+import bisect
+import datetime
+import math
+from array import array
+from collections import Counter
+
+from .instrumentacao import medido
+from .insulina import carregar_numpy
+from .serie import EPOCA
+
+# --- Módulo de Estatísticas ---
+# Trabalha direto sobre as colunas da SerieGlicemias. Com NumPy e a partir de LIMIAR_NUMPY
+# leituras, as métricas são calculadas em operações vetorizadas sobre as colunas (sem
+# cópia: os arrays são lidos pelo protocolo de buffer). Abaixo disso basta ordenar uma
+# cópia dos valores. Sem NumPy, em séries longas, as métricas globais e por tipo saem de
+# histogramas (valor -> contagem) montados em C pelo Counter, cujo tamanho é limitado pelo
+# número de valores distintos, e não pelo de leituras.
+PERCENTIS = (5, 25, 50, 75, 95)
+# Pontos de equilíbrio medidos com benchmarks/bench_estatisticas.py: abaixo deles o custo
+# fixo das chamadas ao NumPy (ou de montar os histogramas) supera o ganho.
+LIMIAR_NUMPY = 150
+LIMIAR_HISTOGRAMA = 2000
+
+def _metricas_somas(n, soma, soma_quadrados, abaixo, acima):
+    """Média, DP e tempo no alvo a partir das somas (n, Σx, Σx², abaixo/acima do alvo), que se acumulam entre dias e semanas."""
+    media = soma / n
+    # Variância amostral exata em inteiros, como statistics.stdev
+    desvio = math.sqrt((n * soma_quadrados - soma * soma) / (n * (n - 1))) if n > 1 else 0
+    return {"n": n, "media": media, "desvio": desvio, "abaixo": abaixo, "no_alvo": n - abaixo - acima, "acima": acima}
+
+def somas_glicemias(valores):
+    """(n, Σx, Σx², abaixo, acima) de um grupo de leituras, no formato de _metricas_somas."""
+    return len(valores), sum(valores), sum(v * v for v in valores), sum(v < 70 for v in valores), sum(v > 180 for v in valores)
+
+def _metricas_histograma(histograma):
+    """Métricas básicas (n, média, DP, extremos, tempo no alvo) a partir de um histograma de glicemias."""
+    n = soma = soma_quadrados = abaixo = acima = 0
+    for valor, contagem in histograma.items():
+        n += contagem
+        soma += valor * contagem
+        soma_quadrados += valor * valor * contagem
+        if valor < 70: abaixo += contagem
+        elif valor > 180: acima += contagem
+    return {**_metricas_somas(n, soma, soma_quadrados, abaixo, acima), "max": max(histograma), "min": min(histograma)}
+
+def _posicoes_percentis(n, percentis=PERCENTIS):
+    """Posições (fracionárias) de cada percentil na série ordenada e as posições inteiras necessárias para interpolá-las."""
+    posicoes = [(n - 1) * p / 100 for p in percentis]
+    return posicoes, sorted({math.floor(pos) for pos in posicoes} | {math.ceil(pos) for pos in posicoes})
+
+def _interpolar_percentis(posicoes, por_posicao, percentis=PERCENTIS):
+    """Percentis com interpolação linear (mesmo critério do numpy.percentile) a partir dos valores nas posições inteiras."""
+    resultado = {}
+    for p, pos in zip(percentis, posicoes):
+        baixo, alto = por_posicao[math.floor(pos)], por_posicao[math.ceil(pos)]
+        resultado[f"p{p}"] = round(baixo + (alto - baixo) * (pos - math.floor(pos)), 1)
+    return resultado
+
+def _percentis_histograma(histograma, n):
+    """Percentis percorrendo o histograma ordenado."""
+    posicoes, necessarios = _posicoes_percentis(n)
+    por_posicao, acumulado, i = {}, 0, 0
+    for valor in sorted(histograma):
+        acumulado += histograma[valor]
+        while i < len(necessarios) and necessarios[i] < acumulado:
+            por_posicao[necessarios[i]] = valor
+            i += 1
+    return _interpolar_percentis(posicoes, por_posicao)
+
+def _resumo(n, soma, maximo, minimo, no_alvo):
+    return {"leituras": n, "glicemia_media": round(soma / n), "glicemia_max": maximo, "glicemia_min": minimo, "no_alvo": round(no_alvo / n * 100)}
+
+def _resumo_grupo(valores):
+    """Resumo de um grupo pequeno de leituras (um dia), só com builtins em C: (n, média, máx., mín., % no alvo)."""
+    ordenados = sorted(valores)
+    n = len(ordenados)
+    no_alvo = bisect.bisect_right(ordenados, 180) - bisect.bisect_left(ordenados, 70)
+    return n, round(sum(ordenados) / n), ordenados[-1], ordenados[0], round(no_alvo / n * 100)
+
+def _resumo_histograma(histograma):
+    no_alvo = sum(contagem for valor, contagem in histograma.items() if 70 <= valor <= 180)
+    return _resumo(sum(histograma.values()), sum(valor * contagem for valor, contagem in histograma.items()), max(histograma), min(histograma), no_alvo)
+
+def resumo_somas(dias, somas, insulina=None):
+    """Resumo de uma semana da coorte (ou de várias, com as somas acumuladas), com as fórmulas de analisar_dados_gerais."""
+    n = somas[0]
+    if not n:
+        return {"dias": dias, "leituras": 0, "insulina": insulina}
+    m = _metricas_somas(*somas)
+    return {"dias": dias, "leituras": n, "glicemia_media": round(m["media"]), "desvio_padrao": round(m["desvio"], 1),
+            "hba1c_estimada": round((m["media"] + 46.7) / 28.7, 1), "no_alvo": round(m["no_alvo"] / n * 100),
+            "abaixo": round(m["abaixo"] / n * 100), "acima": round(m["acima"] / n * 100), "insulina": insulina}
+
+def _colunas_dias(dias):
+    """Valores, códigos de tipo, tipos e limites dos dias direto dos dicts, sem montar a SerieGlicemias (horários e refeições não entram)."""
+    valores, tipos, categorias, codigos, inicios = [], [], [], {}, [0]
+    for dia in dias:
+        for g in dia.get('glicemias', []):
+            if (codigo := codigos.get(tipo := g['tipo'])) is None:
+                codigo = codigos[tipo] = len(categorias)
+                categorias.append(tipo)
+            valores.append(g['valor'])
+            tipos.append(codigo)
+        inicios.append(len(valores))
+    return array('H', valores), array('B', tipos), categorias, inicios
+
+def _por_dia(valores, inicios):
+    return [(i, *_resumo_grupo(valores[inicio:fim])) for i, (inicio, fim) in enumerate(zip(inicios, inicios[1:])) if fim > inicio]
+
+def _analise_ordenada(valores, tipos, inicios):
+    """Métricas sobre uma cópia ordenada dos valores, para séries curtas; mesmo retorno de _analise_histogramas."""
+    ordenados = sorted(valores)
+    n = len(ordenados)
+    abaixo, acima = bisect.bisect_left(ordenados, 70), n - bisect.bisect_right(ordenados, 180)
+    m = {**_metricas_somas(n, sum(ordenados), sum(v * v for v in ordenados), abaixo, acima), "max": ordenados[-1], "min": ordenados[0]}
+    posicoes, necessarios = _posicoes_percentis(n)
+    grupos = {}
+    for codigo, valor in zip(tipos, valores):
+        grupos.setdefault(codigo, []).append(valor)
+    por_tipo = {codigo: _resumo(len(g), sum(g), max(g), min(g), sum(70 <= v <= 180 for v in g)) for codigo, g in grupos.items()}
+    return m, _interpolar_percentis(posicoes, {i: ordenados[i] for i in necessarios}), por_tipo, _por_dia(valores, inicios)
+
+def _analise_histogramas(valores, tipos, inicios):
+    """Métricas por histogramas (Counter); devolve (métricas globais, percentis, resumo por código de tipo, [(dia, *resumo_grupo)])."""
+    histograma = Counter(valores)
+    histogramas_tipo = {}
+    for (codigo, valor), contagem in Counter(zip(tipos, valores)).items():
+        histogramas_tipo.setdefault(codigo, {})[valor] = contagem
+    m = _metricas_histograma(histograma)
+    return m, _percentis_histograma(histograma, m["n"]), {codigo: _resumo_histograma(h) for codigo, h in histogramas_tipo.items()}, _por_dia(valores, inicios)
+
+def _analise_numpy(np, valores, tipos, inicios):
+    """As mesmas métricas de _analise_histogramas, em operações vetorizadas sobre as colunas."""
+    v = np.frombuffer(valores, dtype=np.uint16).astype(np.int64)
+    t = np.frombuffer(tipos, dtype=np.uint8)
+    n, abaixo, acima = len(v), v < 70, v > 180
+    no_alvo = ~(abaixo | acima)
+    m = {**_metricas_somas(n, int(v.sum()), int(np.dot(v, v)), int(abaixo.sum()), int(acima.sum())), "max": int(v.max()), "min": int(v.min())}
+    posicoes, necessarios = _posicoes_percentis(n)
+    percentis = _interpolar_percentis(posicoes, dict(zip(necessarios, np.partition(v, necessarios)[necessarios].tolist())))
+    # Por tipo: contagens e somas por código com bincount (somas em float64, exatas para inteiros < 2**53)
+    contagens = np.bincount(t)
+    somas = np.bincount(t, weights=v)
+    alvo_tipo = np.bincount(t[no_alvo], minlength=len(contagens))
+    por_tipo = {}
+    for codigo in np.flatnonzero(contagens).tolist():
+        do_tipo = v[t == codigo]
+        por_tipo[codigo] = _resumo(int(contagens[codigo]), int(somas[codigo]), int(do_tipo.max()), int(do_tipo.min()), int(alvo_tipo[codigo]))
+    # Por dia: reduceat sobre o início de cada dia com leituras (os dias vazios não têm elementos entre eles).
+    # np.rint arredonda como o round() do Python (metade para o par) sobre os mesmos quocientes em float64.
+    limites = np.asarray(inicios, dtype=np.int64)
+    com_leituras = np.flatnonzero(np.diff(limites))
+    posicoes_dias, leituras = limites[com_leituras], np.diff(limites)[com_leituras]
+    medias = np.rint(np.add.reduceat(v, posicoes_dias) / leituras).astype(np.int64)
+    alvo_dias = np.rint(np.add.reduceat(no_alvo.astype(np.int64), posicoes_dias) / leituras * 100).astype(np.int64)
+    por_dia = list(zip(com_leituras.tolist(), leituras.tolist(), medias.tolist(), np.maximum.reduceat(v, posicoes_dias).tolist(),
+                       np.minimum.reduceat(v, posicoes_dias).tolist(), alvo_dias.tolist()))
+    return m, percentis, por_tipo, por_dia
+
+@medido('estatisticas')
+def analisar_dados_gerais(dados_completos):
+    """
+    Métricas do período sobre a série colunar: média, extremos, DP, HbA1c estimada,
+    tempo no alvo, CV, GMI, percentis e os resumos por tipo de medição e por dia.
+    """
+    dias = dados_completos.get('dias', [])
+    if (serie := dados_completos.get('serie')) is not None:
+        valores, tipos, categorias, inicios = serie.valores, serie.tipos, serie.categorias, serie.inicios_dias
+    else:
+        valores, tipos, categorias, inicios = _colunas_dias(dias)
+    if not len(valores): return {}
+    if len(valores) >= LIMIAR_NUMPY and (np := carregar_numpy()) is not None:
+        m, percentis, por_tipo, por_dia = _analise_numpy(np, valores, tipos, inicios)
+    else:
+        analise = _analise_histogramas if len(valores) >= LIMIAR_HISTOGRAMA else _analise_ordenada
+        m, percentis, por_tipo, por_dia = analise(valores, tipos, inicios)
+    total, glicemia_media = m["n"], m["media"]
+    return {
+        "glicemia_media": round(glicemia_media), "glicemia_max": m["max"], "glicemia_min": m["min"],
+        "desvio_padrao": round(m["desvio"], 1), "hba1c_estimada": round((glicemia_media + 46.7) / 28.7, 1),
+        "tempo_no_alvo": {"no_alvo": round(m["no_alvo"] / total * 100), "abaixo": round(m["abaixo"] / total * 100), "acima": round(m["acima"] / total * 100)},
+        "total_leituras": total,
+        "cv": round(m["desvio"] / glicemia_media * 100, 1),
+        "gmi": round(3.31 + 0.02392 * glicemia_media, 1),
+        "percentis": percentis,
+        "por_tipo": {categorias[codigo]: resumo for codigo, resumo in sorted(por_tipo.items())},
+        "por_dia": [{"data": dias[i]['data'], "leituras": n, "glicemia_media": media, "glicemia_max": maximo, "glicemia_min": minimo, "no_alvo": alvo}
+                    for i, n, media, maximo, minimo, alvo in por_dia],
+    }
+
+# --- Dados do Gráfico de Tendência ---
+# Relatórios de vários meses têm milhares de leituras. O gráfico recebe no máximo
+# GRAFICO_MAX_PONTOS pontos, escolhidos por LTTB (Largest-Triangle-Three-Buckets), que
+# preserva picos e vales da curva; /chart-data devolve a resolução completa de uma janela.
+def reduzir_lttb(valores, alvo, x=None):
+    """Índices dos pontos mantidos pelo LTTB. 'x' é o eixo x de cada leitura (em geral os
+    timestamps da série, para que lacunas de horas pesem na área); sem ele, vale a posição."""
+    n = len(valores)
+    if alvo >= n or alvo < 3:
+        return list(range(n))
+    if x is None:
+        x = range(n)
+    passo = (n - 2) / (alvo - 2)
+    indices, anterior = [0], 0
+    for balde in range(alvo - 2):
+        inicio, fim = int(balde * passo) + 1, int((balde + 1) * passo) + 1
+        # O terceiro vértice do triângulo é a média do balde seguinte (no último, o ponto final)
+        prox_inicio, prox_fim = fim, min(int((balde + 2) * passo) + 1, n)
+        media_x = sum(x[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+        media_y = sum(valores[prox_inicio:prox_fim]) / (prox_fim - prox_inicio)
+        ax, ay = x[anterior], valores[anterior]
+        anterior = max(range(inicio, fim), key=lambda i: abs((ax - media_x) * (valores[i] - ay) - (ax - x[i]) * (media_y - ay)))
+        indices.append(anterior)
+    indices.append(n - 1)
+    return indices
+
+def dados_grafico(serie, titulos_dias, indices):
+    """Rótulos ("25 08:15") e valores das leituras escolhidas, no formato esperado pelo Chart.js."""
+    dias = [bisect.bisect_right(serie.inicios_dias, i) - 1 for i in indices]
+    return {"labels": [f"{titulos_dias[d].split(' de ')[0]} {serie.hora(i)}" for d, i in zip(dias, indices)],
+            "data": [serie.valores[i] for i in indices], "total": len(serie.valores), "exibidos": len(indices)}
+
+def minutos_epoca(texto, fim=False):
+    """'AAAA-MM-DD' ou 'AAAA-MM-DDTHH:MM' em minutos desde 1970 (escala de SerieGlicemias.timestamps).
+    Com fim=True, uma data sem hora vale até o último minuto do dia."""
+    momento = datetime.datetime.fromisoformat(texto)
+    minutos = (momento.date() - EPOCA).days * 1440 + momento.hour * 60 + momento.minute
+    return minutos + 1439 if fim and len(texto) <= 10 else minutos
+
+def grafico_relatorio(dados, max_pontos=1000):
+    """Pontos do gráfico de tendência (reduzidos por LTTB) e o intervalo de datas da série."""
+    serie = dados['serie']
+    grafico = dados_grafico(serie, [dia['data'] for dia in dados['dias']], reduzir_lttb(serie.valores, max_pontos, serie.timestamps))
+    if serie.timestamps:
+        grafico["periodo"] = [(EPOCA + datetime.timedelta(days=min(serie.timestamps) // 1440)).isoformat(),
+                              (EPOCA + datetime.timedelta(days=max(serie.timestamps) // 1440)).isoformat()]
+    return grafico
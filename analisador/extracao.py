@@ -0,0 +1,564 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Extração do .mhtml
+#
+# Leitura incremental (streaming), extratores de HTML plugáveis (bs4, lxml e incremental)
+# e o cache das estruturas extraídas. O BeautifulSoup, o lxml e o pacote email só são
+# importados pelo caminho que os usa.
+# -----------------------------------------------------------------------------
+
+import codecs
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from html.parser import HTMLParser
+
+from .instrumentacao import contar, medido, medir
+from .serie import montar_dados
+
+# --- Módulo de Extração Incremental (streaming) ---
+# Lê o MHTML em blocos, decodifica o quoted-printable linha a linha e alimenta um
+# HTMLParser que emite cada dia assim que ele termina. Nenhuma cópia completa do
+# arquivo (bytes, texto ou árvore HTML) fica em memória.
+TAMANHO_BLOCO_LEITURA = 64 * 1024
+RE_TOTAIS = re.compile(r'([\d\.]+) kcals / ([\d\.]+) carbs')
+RE_GLICEMIA = re.compile(r'(\d{2}:\d{2}): (\d+) mg/dl')
+_TAGS_VAZIAS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'))
+
+def _ler_linhas(stream, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+    """Lê o stream em blocos e devolve as linhas (com o terminador) uma a uma."""
+    resto = b''
+    while bloco := stream.read(tamanho_bloco):
+        resto += bloco
+        inicio = 0
+        while (fim := resto.find(b'\n', inicio)) != -1:
+            yield resto[inicio:fim + 1]
+            inicio = fim + 1
+        resto = resto[inicio:]
+        if len(resto) > tamanho_bloco:  # Linha sem quebra: entrega em pedaços para manter a memória limitada
+            yield resto
+            resto = b''
+    if resto:
+        yield resto
+
+def _ler_cabecalhos(linhas):
+    """Consome um bloco de cabeçalhos MIME (até a linha em branco) e o devolve como Message."""
+    import email
+    bloco = []
+    for linha in linhas:
+        if not linha.strip(): break
+        bloco.append(linha)
+    return email.message_from_bytes(b''.join(bloco))
+
+def _decodificar_corpo(linhas, parte, delimitador):
+    """Decodifica o corpo quoted-printable de uma parte MIME, devolvendo pedaços de texto."""
+    import quopri
+    decodificador = codecs.getincrementaldecoder(parte.get_content_charset() or 'utf-8')()
+    anterior = None
+    for linha in linhas:
+        if delimitador and linha.startswith(delimitador):
+            anterior = anterior.rstrip(b'\r\n') if anterior is not None else None  # A quebra antes do delimitador pertence a ele
+            break
+        if anterior is not None:
+            yield decodificador.decode(quopri.decodestring(anterior))
+        anterior = linha
+    if anterior:
+        yield decodificador.decode(quopri.decodestring(anterior))
+    yield decodificador.decode(b'', final=True)
+
+def iterar_html_mhtml(stream):
+    """Localiza a primeira parte text/html do MHTML e devolve seu conteúdo em pedaços de texto."""
+    linhas = _ler_linhas(stream)
+    cabecalhos = _ler_cabecalhos(linhas)
+    if cabecalhos.get_content_maintype() != 'multipart':
+        if cabecalhos.get_content_type() == 'text/html':
+            yield from _decodificar_corpo(linhas, cabecalhos, None)
+        return
+    fronteira = cabecalhos.get_param('boundary')
+    if not fronteira: return
+    delimitador = b'--' + fronteira.encode('ascii')
+    if not any(linha.startswith(delimitador) for linha in linhas): return
+    while True:
+        parte = _ler_cabecalhos(linhas)
+        if parte.get_content_type() == 'text/html':
+            yield from _decodificar_corpo(linhas, parte, delimitador)
+            return
+        linha = next((linha for linha in linhas if linha.startswith(delimitador)), None)
+        if linha is None or linha.rstrip().endswith(b'--'): return
+
+class _No:
+    __slots__ = ('tag', 'classe', 'classes', 'pai', 'textos', 'papel', 'ultimo_p', 'p_anterior', 'alimentos_pendentes')
+
+    def __init__(self, tag, classe, pai):
+        self.tag, self.classe, self.classes, self.pai = tag, classe, classe.split(), pai
+        self.textos = self.papel = self.ultimo_p = self.p_anterior = None
+        self.alimentos_pendentes = None
+
+    def texto(self):
+        return ''.join(self.textos)
+
+    def strings_limpas(self):
+        return " ".join(s.strip() for s in self.textos if s.strip())
+
+class ParserIncremental(HTMLParser):
+    """
+    Reconhece a marcação do relatório exportado sem montar uma árvore: mantém apenas a
+    pilha de elementos abertos e o dia corrente. Emite ('periodo', texto) e ('dia', dia_data).
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.eventos = deque()
+        self._pilha = []
+        self._capturas = []
+        self._texto_pendente = []
+        self._periodo_lido = False
+        self._dia = self._card = None
+
+    # Texto: o HTMLParser pode partir um mesmo nó de texto entre dois feed(); junta antes de distribuir.
+    def handle_data(self, data):
+        if self._capturas: self._texto_pendente.append(data)
+
+    def _descarregar_texto(self):
+        if self._texto_pendente:
+            texto = ''.join(self._texto_pendente)
+            self._texto_pendente.clear()
+            for no in self._capturas: no.textos.append(texto)
+
+    def _capturar(self, no, papel):
+        no.papel, no.textos = papel, []
+        self._capturas.append(no)
+
+    def handle_starttag(self, tag, attrs):
+        self._descarregar_texto()
+        pai = self._pilha[-1] if self._pilha else None
+        no = _No(tag, next((v for k, v in attrs if k == 'class'), None) or '', pai)
+        dia, card = self._dia, self._card
+        if tag == 'h2' and not self._periodo_lido:
+            self._periodo_lido = True
+            self._capturar(no, 'periodo')
+        elif tag == 'h1' and no.classe == 'font-bold text-xl':
+            self._fechar_dia()
+            self._dia = {"dados": {"data": "", "total_kcal": 0, "total_carbs": 0, "glicemias": [], "refeicoes": []},
+                         "container": pai, "avo": pai.pai if pai else None, "h1_fechado": False, "total_lido": False}
+            self._capturar(no, 'dia')
+        elif dia and tag == 'p' and pai is dia["container"] and dia["h1_fechado"] and not dia["total_lido"]:
+            dia["total_lido"] = True
+            self._capturar(no, 'total')
+        elif dia and not card and tag == 'div' and pai is dia["avo"] and pai is not None and 'rounded' in no.classes:
+            no.papel = 'card'
+            self._card = {"no": no, "titulo": None, "detalhes": None, "glicemias": [], "alimentos": []}
+        elif card:
+            if tag == 'div' and no.classe == 'font-bold text-lg' and card["titulo"] is None:
+                card["titulo"] = False
+                self._capturar(no, 'titulo')
+            elif tag == 'div' and no.classe == 'text-sm text-gray-500' and card["detalhes"] is None:
+                card["detalhes"] = False
+                self._capturar(no, 'detalhes')
+            elif tag == 'div' and pai.alimentos_pendentes:
+                self._capturar(no, 'detalhes_alimento')
+            elif tag == 'p':
+                no.p_anterior = pai.ultimo_p
+                self._capturar(no, 'p')
+        if tag not in _TAGS_VAZIAS:
+            self._pilha.append(no)
+
+    def handle_endtag(self, tag):
+        self._descarregar_texto()
+        if not any(no.tag == tag for no in self._pilha): return
+        while (no := self._pilha.pop()).tag != tag:
+            self._fechar_no(no)
+        self._fechar_no(no)
+
+    def _fechar_no(self, no):
+        if no.textos is not None:
+            self._capturas.remove(no)
+        papel, dia, card = no.papel, self._dia, self._card
+        if papel == 'periodo':
+            self.eventos.append(('periodo', no.texto().replace('Relatório: ', '')))
+        elif papel == 'dia':
+            dia["dados"]["data"], dia["h1_fechado"] = no.texto(), True
+        elif papel == 'total':
+            if match := RE_TOTAIS.search(no.texto()):
+                dia["dados"]["total_kcal"], dia["dados"]["total_carbs"] = map(float, match.groups())
+        elif papel == 'titulo':
+            card["titulo"] = no.texto().strip()
+        elif papel == 'detalhes':
+            card["detalhes"] = no.texto()
+        elif papel == 'detalhes_alimento':
+            detalhes = no.strings_limpas()
+            card["alimentos"].extend({"nome": nome, "detalhes": detalhes} for nome in no.pai.alimentos_pendentes)
+            no.pai.alimentos_pendentes = None
+        elif papel == 'p':
+            texto = no.texto()
+            no.pai.ultimo_p = texto
+            if 'text-gray-500' in no.classes and no.p_anterior is not None and (match := RE_GLICEMIA.search(texto)):
+                card["glicemias"].append({"hora": match.group(1), "valor": int(match.group(2)), "tipo": no.p_anterior.strip()})
+            avo = no.pai.pai
+            if ('font-bold' in no.classes and no.pai.tag == 'div' and avo is not None and avo.tag == 'div'
+                    and avo.pai is not None and 'p-4' in avo.pai.classes):
+                if no.pai.alimentos_pendentes is None: no.pai.alimentos_pendentes = []
+                no.pai.alimentos_pendentes.append(texto)
+        elif papel == 'card':
+            self._fechar_card()
+        if dia and no is dia["avo"]:
+            self._fechar_dia()
+
+    def _fechar_card(self):
+        card, self._card = self._card, None
+        if not card["titulo"]: return
+        dia_data = self._dia["dados"]
+        if card["titulo"] == 'Glicemias':
+            dia_data['glicemias'].extend(card["glicemias"])
+        else:
+            refeicao = {"nome": card["titulo"], "total_kcal": 0, "total_carbs": 0, "alimentos": card["alimentos"]}
+            if card["detalhes"] and (match := RE_TOTAIS.search(card["detalhes"])):
+                refeicao['total_kcal'], refeicao['total_carbs'] = map(float, match.groups())
+            dia_data['refeicoes'].append(refeicao)
+
+    def _fechar_dia(self):
+        if self._dia:
+            self.eventos.append(('dia', self._dia["dados"]))
+            self._dia = self._card = None
+
+    def close(self):
+        super().close()
+        self._descarregar_texto()
+        while self._pilha:
+            self._fechar_no(self._pilha.pop())
+        self._fechar_dia()
+
+def iterar_registros_html(pedacos):
+    """Processa o HTML em pedaços e devolve os registros ('periodo' / 'dia') à medida que ficam prontos."""
+    extrator = ParserIncremental()
+    for pedaco in pedacos:
+        extrator.feed(pedaco)
+        while extrator.eventos: yield extrator.eventos.popleft()
+    extrator.close()
+    while extrator.eventos: yield extrator.eventos.popleft()
+
+# --- Extratores de HTML (backends plugáveis) ---
+# Cada extrator recebe o HTML já decodificado e devolve (periodo, dias) sem doses.
+# Todos devem produzir exatamente a mesma estrutura; ver verificar_paridade_extratores.
+# As bibliotecas de árvore (bs4, lxml) só são importadas quando o seu extrator é usado.
+@functools.lru_cache(maxsize=None)
+def carregar_lxml():
+    """Módulos (etree, html) do lxml, importados na primeira chamada; None se ele não estiver instalado."""
+    try:
+        from lxml import etree, html
+    except ImportError:  # Backend opcional: pip install lxml
+        return None
+    return etree, html
+
+class ExtratorHTML:
+    """Interface comum dos extratores: extrair(html) -> (periodo, dias)."""
+    nome = None
+
+    def extrair(self, html):
+        raise NotImplementedError
+
+class ExtratorBeautifulSoup(ExtratorHTML):
+    """Extrator de referência, em Python puro, sobre a árvore do BeautifulSoup."""
+    nome = 'bs4'
+
+    def extrair(self, html):
+        from bs4 import BeautifulSoup
+        with medir('arvore_html'):
+            soup = BeautifulSoup(html, 'html.parser')
+        periodo = soup.find('h2').text.replace('Relatório: ', '')
+        dias = []
+        for dia_h1 in soup.find_all('h1', class_='font-bold text-xl'):
+            dia_container = dia_h1.parent
+            dia_data = {"data": dia_h1.text, "total_kcal": 0, "total_carbs": 0, "glicemias": [], "refeicoes": []}
+            p_total = dia_h1.find_next_sibling('p')
+            if p_total and (match := RE_TOTAIS.search(p_total.text)):
+                dia_data["total_kcal"], dia_data["total_carbs"] = map(float, match.groups())
+            cards = dia_container.find_next_siblings('div', class_='rounded')
+            for card in cards:
+                if not (card_title_element := card.find('div', class_='font-bold text-lg')): continue
+                card_title = card_title_element.text.strip()
+                if card_title == 'Glicemias':
+                    for p in card.find_all('p', class_='text-gray-500'):
+                        if (tipo_element := p.find_previous_sibling('p')) and (match := RE_GLICEMIA.search(p.text)):
+                            dia_data['glicemias'].append({"hora": match.group(1), "valor": int(match.group(2)), "tipo": tipo_element.text.strip()})
+                else:
+                    refeicao = {"nome": card_title, "total_kcal": 0, "total_carbs": 0, "alimentos": []}
+                    if (details_div := card.find('div', class_='text-sm text-gray-500')) and (match := RE_TOTAIS.search(details_div.text)):
+                        refeicao['total_kcal'], refeicao['total_carbs'] = map(float, match.groups())
+                    for alimento_p in card.select('.p-4 > div > div > p.font-bold'):
+                        nome_alimento = alimento_p.text
+                        detalhes_div = alimento_p.find_next_sibling('div')
+                        if detalhes_div: refeicao['alimentos'].append({"nome": nome_alimento, "detalhes": " ".join(detalhes_div.stripped_strings)})
+                    dia_data['refeicoes'].append(refeicao)
+            dias.append(dia_data)
+        return periodo, dias
+
+def _xpath_classe(classe):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {classe} ')"
+
+class ExtratorLxml(ExtratorHTML):
+    """Extrator compilado (libxml2): mesmas regras do extrator bs4, expressas em XPath pré-compilado."""
+    nome = 'lxml'
+
+    def __init__(self):
+        if (lxml := carregar_lxml()) is None:
+            raise RuntimeError("O extrator 'lxml' requer o pacote lxml (pip install lxml).")
+        self._documento = lxml[1].document_fromstring
+        X = lxml[0].XPath
+        self._periodo = X("(//h2)[1]")
+        self._dias = X("//h1[@class='font-bold text-xl']")
+        self._p_total = X("following-sibling::p[1]")
+        self._cards = X(f"following-sibling::div[{_xpath_classe('rounded')}]")
+        self._titulo = X(".//div[@class='font-bold text-lg'][1]")
+        self._p_glicemias = X(f".//p[{_xpath_classe('text-gray-500')}]")
+        self._p_tipo = X("preceding-sibling::p[1]")
+        self._detalhes = X(".//div[@class='text-sm text-gray-500']")
+        self._alimentos = X(f".//p[{_xpath_classe('font-bold')}][parent::div/parent::div/parent::*[{_xpath_classe('p-4')}]]")
+        self._div_seguinte = X("following-sibling::div[1]")
+        self._textos = X(".//text()")
+        self._texto = X("string()")
+
+    def extrair(self, html):
+        with medir('arvore_html'):
+            raiz = self._documento(html)
+        texto = self._texto
+        periodo = texto(self._periodo(raiz)[0]).replace('Relatório: ', '')
+        dias = []
+        for dia_h1 in self._dias(raiz):
+            dia_data = {"data": texto(dia_h1), "total_kcal": 0, "total_carbs": 0, "glicemias": [], "refeicoes": []}
+            p_total = self._p_total(dia_h1)
+            if p_total and (match := RE_TOTAIS.search(texto(p_total[0]))):
+                dia_data["total_kcal"], dia_data["total_carbs"] = map(float, match.groups())
+            for card in self._cards(dia_h1.getparent()):
+                if not (titulo := self._titulo(card)): continue
+                card_title = texto(titulo[0]).strip()
+                if card_title == 'Glicemias':
+                    for p in self._p_glicemias(card):
+                        if (tipo_element := self._p_tipo(p)) and (match := RE_GLICEMIA.search(texto(p))):
+                            dia_data['glicemias'].append({"hora": match.group(1), "valor": int(match.group(2)), "tipo": texto(tipo_element[0]).strip()})
+                else:
+                    refeicao = {"nome": card_title, "total_kcal": 0, "total_carbs": 0, "alimentos": []}
+                    if (details_div := self._detalhes(card)) and (match := RE_TOTAIS.search(texto(details_div[0]))):
+                        refeicao['total_kcal'], refeicao['total_carbs'] = map(float, match.groups())
+                    for alimento_p in self._alimentos(card):
+                        if detalhes_div := self._div_seguinte(alimento_p):
+                            detalhes = " ".join(s.strip() for s in self._textos(detalhes_div[0]) if s.strip())
+                            refeicao['alimentos'].append({"nome": texto(alimento_p), "detalhes": detalhes})
+                    dia_data['refeicoes'].append(refeicao)
+            dias.append(dia_data)
+        return periodo, dias
+
+class ExtratorIncremental(ExtratorHTML):
+    """Extrator sem árvore (ParserIncremental); também usado pelo modo streaming."""
+    nome = 'incremental'
+
+    def extrair(self, html):
+        periodo, dias = None, []
+        for tipo, registro in iterar_registros_html((html,)):
+            if tipo == 'periodo': periodo = registro
+            else: dias.append(registro)
+        if periodo is None:
+            raise ValueError("Não foi possível encontrar o período (h2) no relatório.")
+        return periodo, dias
+
+EXTRATORES = {cls.nome: cls for cls in (ExtratorBeautifulSoup, ExtratorLxml, ExtratorIncremental)}
+
+def obter_extrator(nome):
+    """Instancia o extrator configurado (uma instância por chamada: XPaths compilados não são compartilhados entre threads)."""
+    if nome not in EXTRATORES:
+        raise ValueError(f"Extrator desconhecido: {nome!r}. Opções: {', '.join(EXTRATORES)}")
+    return EXTRATORES[nome]()
+
+def verificar_paridade_extratores(html, nomes=None):
+    """
+    Executa os extratores indicados (por padrão, todos os disponíveis) sobre o mesmo HTML e
+    devolve a lista dos que divergem do extrator de referência (bs4). Lista vazia = paridade.
+    """
+    referencia = ExtratorBeautifulSoup().extrair(html)
+    nomes = nomes or [n for n in EXTRATORES if n != 'lxml' or carregar_lxml() is not None]
+    return [nome for nome in nomes if obter_extrator(nome).extrair(html) != referencia]
+
+# --- Cache de Relatórios Extraídos ---
+# A estrutura extraída (dias, glicemias, refeições, alimentos) não depende dos parâmetros
+# de dose; é guardada pelo hash do arquivo para que um reenvio com outra relação de
+# carboidratos ou tabela de correção pule a decodificação e o parsing do HTML.
+VERSAO_EXTRACAO = 1  # Incremente ao mudar a estrutura extraída, invalidando o cache em disco
+
+@medido('hash')
+def hash_arquivo(stream):
+    """SHA-256 do conteúdo do arquivo, lido em blocos; o stream é rebobinado ao final."""
+    h = hashlib.sha256()
+    while bloco := stream.read(TAMANHO_BLOCO_LEITURA):
+        h.update(bloco)
+    stream.seek(0)
+    return f"v{VERSAO_EXTRACAO}-{h.hexdigest()}"
+
+class CacheRelatorios:
+    """
+    Cache LRU limitado por bytes, com camada opcional em disco. Os itens ficam serializados
+    em JSON: ocupam menos memória que a árvore de dicts e cada leitura devolve uma cópia
+    independente, que pode receber as doses sem contaminar o cache.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, diretorio=None, max_arquivos_disco=500):
+        self.max_bytes, self.diretorio, self.max_arquivos_disco = max_bytes, diretorio, max_arquivos_disco
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self._arquivos_disco = 0  # Estimativa dos arquivos no diretório; recontada só ao podar
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            self._arquivos_disco = sum(1 for e in os.scandir(diretorio) if e.name.endswith('.json'))
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def obter(self, chave):
+        with self._trava:
+            if (serializado := self._itens.get(chave)) is not None:
+                self._itens.move_to_end(chave)
+                return json.loads(serializado)
+        if not self.diretorio:
+            return None
+        try:  # Outro processo pode ter podado o arquivo: conta como ausente
+            with open(caminho := self._caminho(chave), 'rb') as f:
+                serializado = f.read()
+            os.utime(caminho)  # Mantém a ordem LRU também no disco
+        except OSError:
+            return None
+        self._guardar_memoria(chave, serializado)
+        return json.loads(serializado)
+
+    def guardar(self, chave, base):
+        serializado = json.dumps(base, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._guardar_memoria(chave, serializado)
+        if self.diretorio:
+            caminho = self._caminho(chave)
+            novo = not os.path.exists(caminho)
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            with open(temporario, 'wb') as f:
+                f.write(serializado)
+            os.replace(temporario, caminho)
+            with self._trava:
+                self._arquivos_disco += novo
+                podar = self._arquivos_disco > self.max_arquivos_disco
+            if podar:
+                self._podar_disco()
+
+    def _guardar_memoria(self, chave, serializado):
+        if len(serializado) > self.max_bytes: return
+        with self._trava:
+            if (antigo := self._itens.pop(chave, None)) is not None:
+                self._bytes -= len(antigo)
+            self._itens[chave] = serializado
+            self._bytes += len(serializado)
+            while self._bytes > self.max_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self._bytes -= len(removido)
+
+    def _podar_disco(self):
+        """
+        Remove os arquivos mais antigos até 90% de max_arquivos_disco. Só roda quando a contagem
+        em memória passa do limite; a folga evita varrer o diretório a cada nova gravação.
+        """
+        arquivos = []
+        for entrada in os.scandir(self.diretorio):
+            if entrada.name.endswith('.json'):
+                try:
+                    arquivos.append((entrada.stat().st_mtime, entrada.path))
+                except FileNotFoundError:  # Podado por outro processo durante a varredura
+                    pass
+        arquivos.sort()
+        excedentes = arquivos[:max(0, len(arquivos) - max(1, self.max_arquivos_disco * 9 // 10))]
+        for _, caminho in excedentes:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+        with self._trava:
+            self._arquivos_disco = len(arquivos) - len(excedentes)
+
+    def __contains__(self, chave):
+        with self._trava:
+            if chave in self._itens: return True
+        return bool(self.diretorio) and os.path.exists(self._caminho(chave))
+
+# --- Módulo de Extração e Processamento de Dados ---
+def extrair_mhtml(file_storage, streaming=False, extrator='bs4', progresso=None):
+    """
+    Extrai do MHTML a estrutura independente das doses: {"periodo", "dias"}.
+    Com streaming=True o arquivo é lido em blocos e processado incrementalmente,
+    com memória de pico limitada independentemente do tamanho da exportação.
+    'progresso', se informado, é chamado com o número de dias já extraídos (a cada dia
+    no modo streaming; uma única vez, ao final, nos demais).
+    """
+    with medir('extracao'):
+        base, erro = _extrair_mhtml(file_storage, streaming, extrator, progresso)
+    if base:
+        contar('dias', len(base['dias']))
+        contar('cartoes', sum(len(dia['refeicoes']) + bool(dia['glicemias']) for dia in base['dias']))
+        contar('leituras', sum(len(dia['glicemias']) for dia in base['dias']))
+    return base, erro
+
+def _extrair_mhtml(file_storage, streaming, extrator, progresso):
+    if streaming:
+        pedacos = iterar_html_mhtml(getattr(file_storage, 'stream', file_storage))
+        if (primeiro := next(pedacos, None)) is None:
+            return None, "Não foi possível encontrar o conteúdo HTML no arquivo."
+        base = {"periodo": None, "dias": []}
+        for tipo, registro in iterar_registros_html(itertools.chain((primeiro,), pedacos)):
+            if tipo == 'periodo':
+                base['periodo'] = registro
+            else:
+                base['dias'].append(registro)
+                if progresso: progresso(len(base['dias']))
+        if base['periodo'] is None:
+            return None, "Não foi possível encontrar o período (h2) no relatório."
+        return base, None
+    import email
+    import quopri
+    with medir('mime'):
+        msg = email.message_from_bytes(file_storage.read())
+        html_part = next((part for part in msg.walk() if part.get_content_type() == "text/html"), None)
+    if not html_part:
+        return None, "Não foi possível encontrar o conteúdo HTML no arquivo."
+    charset = html_part.get_content_charset() or 'utf-8'
+    with medir('quoted_printable'):
+        html_content_quoted = html_part.get_payload(decode=False)
+        html_content_bytes = quopri.decodestring(html_content_quoted)
+        html = html_content_bytes.decode(charset)
+    periodo, dias = obter_extrator(extrator).extrair(html)
+    if progresso: progresso(len(dias))
+    return {"periodo": periodo, "dias": dias}, None
+
+def parse_mhtml(file_storage, patient_name, carb_ratio, correction_table, streaming=False, extrator='bs4', cache=None, progresso=None):
+    """
+    Extrai o conteúdo HTML de um arquivo MHTML com o extrator escolhido (ver EXTRATORES)
+    e calcula as doses. Se um cache for informado, a extração é reaproveitada para
+    arquivos idênticos (mesmo hash de conteúdo) e o hash vira o 'dataset_id' dos dados,
+    usado por /recalculate. Com a base vinda do cache, 'progresso' é chamado uma vez, com
+    todos os dias e o stream no fim (o arquivo conta como lido por inteiro).
+    """
+    try:
+        stream = getattr(file_storage, 'stream', file_storage)
+        stream.seek(0, io.SEEK_END)
+        contar('bytes_entrada', stream.tell())
+        stream.seek(0)
+        chave = hash_arquivo(stream) if cache is not None else None
+        if (base := cache.obter(chave) if cache is not None else None) is None:
+            base, erro = extrair_mhtml(file_storage, streaming, extrator, progresso)
+            if erro:
+                return None, erro
+            if cache is not None:
+                cache.guardar(chave, base)
+        elif progresso:
+            stream.seek(0, io.SEEK_END)
+            progresso(len(base['dias']))
+        return montar_dados(base, patient_name, carb_ratio, correction_table, chave), None
+    except Exception as e:
+        return None, f"Ocorreu um erro ao processar o arquivo. Detalhe: {str(e)}"
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Instrumentação
+#
+# Tempos por etapa (medido/medir), contadores da requisição ou tarefa em curso
+# (medicao_atual) e os agregados exportados em /metrics, no formato do Prometheus.
+# -----------------------------------------------------------------------------
+
+import bisect
+import contextlib
+import contextvars
+import functools
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+
+# --- Instrumentação: tempos por etapa, contadores e /metrics ---
+# Cada etapa do pipeline (hash, MIME, quoted-printable, árvore HTML, extração, doses,
+# estatísticas, renderização, banco) é medida com medir()/@medido e agregada em 'metricas',
+# exposta em /metrics no formato texto do Prometheus. A medição da requisição (ou da
+# tarefa em segundo plano) em curso fica num ContextVar e vira uma linha de log em JSON.
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Metricas:
+    """Histogramas de duração e contadores acumulados no processo, com rótulos."""
+    def __init__(self):
+        self._histogramas = {}  # (nome, rótulos) -> [contagem por bucket..., +Inf, soma]
+        self._contadores = Counter()
+        self._ajuda = {}
+        self._trava = threading.Lock()
+
+    def observar(self, nome, rotulos, segundos):
+        with self._trava:
+            if (serie := self._histogramas.get((nome, rotulos))) is None:
+                serie = self._histogramas[(nome, rotulos)] = [0] * (len(BUCKETS_SEGUNDOS) + 1) + [0.0]
+            serie[bisect.bisect_left(BUCKETS_SEGUNDOS, segundos)] += 1
+            serie[-1] += segundos
+
+    def incrementar(self, nome, rotulos, valor=1):
+        with self._trava:
+            self._contadores[(nome, rotulos)] += valor
+
+    def descrever(self, nome, ajuda):
+        self._ajuda[nome] = ajuda
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        def formatar(rotulos):
+            return "{" + ",".join(f'{k}="{v}"' for k, v in rotulos) + "}" if rotulos else ""
+        with self._trava:
+            histogramas, contadores = sorted(self._histogramas.items()), sorted(self._contadores.items())
+        linhas, vistos = [], set()
+        for (nome, rotulos), serie in histogramas:
+            if nome not in vistos:
+                vistos.add(nome)
+                linhas += [f"# HELP {nome} {self._ajuda.get(nome, nome)}", f"# TYPE {nome} histogram"]
+            for limite, acumulado in zip(BUCKETS_SEGUNDOS + ('+Inf',), itertools.accumulate(serie[:-1])):
+                linhas.append(f"{nome}_bucket{formatar(rotulos + (('le', limite),))} {acumulado}")
+            linhas += [f"{nome}_sum{formatar(rotulos)} {serie[-1]:.6f}", f"{nome}_count{formatar(rotulos)} {sum(serie[:-1])}"]
+        for (nome, rotulos), valor in contadores:
+            if nome not in vistos:
+                vistos.add(nome)
+                linhas += [f"# HELP {nome} {self._ajuda.get(nome, nome)}", f"# TYPE {nome} counter"]
+            linhas.append(f"{nome}{formatar(rotulos)} {valor}")
+        return "\n".join(linhas) + "\n"
+
+metricas = Metricas()
+metricas.descrever('analisador_etapa_segundos', 'Duração de cada etapa do processamento (etapas podem se sobrepor, ex.: arvore_html dentro de extracao).')
+metricas.descrever('analisador_requisicao_segundos', 'Duração total das requisições HTTP, por rota.')
+metricas.descrever('analisador_requisicoes_total', 'Requisições HTTP atendidas, por rota, método e status.')
+metricas.descrever('analisador_processados_total', 'Itens processados: bytes de entrada, dias, cartões e leituras.')
+
+class Medicao:
+    """Tempos (em segundos, somados por etapa) e contadores de uma requisição ou tarefa."""
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas, self.contadores = Counter(), Counter()
+
+    def resumo(self):
+        return {"duracao_ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+                "etapas_ms": {etapa: round(s * 1000, 1) for etapa, s in self.etapas.items()}, "contadores": dict(self.contadores)}
+
+medicao_atual = contextvars.ContextVar('medicao_atual', default=None)
+log_requisicoes = logging.getLogger('analisador.requisicoes')
+
+@contextlib.contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        metricas.observar('analisador_etapa_segundos', (('etapa', etapa),), duracao)
+        if (medicao := medicao_atual.get()) is not None:
+            medicao.etapas[etapa] += duracao
+
+def medido(etapa):
+    """Decorador: mede cada chamada da função como a etapa indicada."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+def contar(tipo, valor):
+    metricas.incrementar('analisador_processados_total', (('tipo', tipo),), valor)
+    if (medicao := medicao_atual.get()) is not None:
+        medicao.contadores[tipo] += valor
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Cálculo de Insulina
+#
+# Relação de carboidratos e tabela de correção. Sem dependências externas: o NumPy,
+# opcional, só é importado por TabelaCorrecao.doses_para.
+# -----------------------------------------------------------------------------
+
+import bisect
+import functools
+import math
+
+# --- Módulo de Cálculo de Insulina ---
+def get_default_correction_table():
+    return {
+        "101-135": 1, "136-170": 2, "171-205": 3, "206-240": 4,
+        "241-275": 5, "276-310": 6, "311-345": 7, "345+": 8
+    }
+
+GLICEMIA_MINIMA_CORRECAO = 101
+
+class TabelaCorrecao:
+    """
+    Tabela de correção compilada: as faixas ("101-135", "345+") são lidas uma única vez,
+    ordenadas e validadas (sem lacunas nem sobreposições); a busca é binária (bisect).
+    """
+    __slots__ = ('inicios', 'fins', 'doses')
+
+    def __init__(self, correction_table):
+        faixas = []
+        for range_str, dose in correction_table.items():
+            try:
+                if range_str.endswith('+'):
+                    inicio, fim = int(range_str[:-1]) + 1, math.inf
+                else:
+                    inicio, fim = map(int, range_str.split('-'))
+                faixas.append((inicio, fim, int(dose)))
+            except ValueError:
+                raise ValueError(f"Faixa ou dose inválida na tabela de correção: {range_str!r} = {dose!r}") from None
+        faixas.sort()
+        for (inicio_ant, fim_ant, _), (inicio, fim, _) in zip(faixas, faixas[1:]):
+            if inicio <= fim_ant:
+                raise ValueError(f"Faixas sobrepostas na tabela de correção a partir de {inicio} mg/dL.")
+            if inicio > fim_ant + 1:
+                raise ValueError(f"Lacuna na tabela de correção entre {fim_ant} e {inicio} mg/dL.")
+        if any(inicio > fim for inicio, fim, _ in faixas):
+            raise ValueError("Faixa com início maior que o fim na tabela de correção.")
+        self.inicios = [f[0] for f in faixas]
+        self.fins = [f[1] for f in faixas]
+        self.doses = [f[2] for f in faixas]
+
+    def dose(self, glicemia):
+        if glicemia < GLICEMIA_MINIMA_CORRECAO: return 0
+        i = bisect.bisect_right(self.inicios, glicemia) - 1
+        return self.doses[i] if i >= 0 and glicemia <= self.fins[i] else 0
+
+    def doses_para(self, glicemias):
+        """Versão vetorizada: converte uma sequência de glicemias em doses numa única chamada (NumPy, se disponível)."""
+        if (np := carregar_numpy()) is None:
+            return [self.dose(g) for g in glicemias]
+        valores = np.asarray(glicemias)
+        if not self.inicios:
+            return np.zeros(len(valores), dtype=np.int64)
+        i = np.searchsorted(np.asarray(self.inicios), valores, side='right') - 1
+        indice = np.clip(i, 0, None)
+        validas = (i >= 0) & (valores <= np.asarray(self.fins, dtype=float)[indice]) & (valores >= GLICEMIA_MINIMA_CORRECAO)
+        return np.where(validas, np.asarray(self.doses)[indice], 0)
+
+@functools.lru_cache(maxsize=None)
+def carregar_numpy():
+    """NumPy, importado só no primeiro cálculo vetorizado; None se não estiver instalado (é opcional)."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+@functools.lru_cache(maxsize=64)
+def _compilar_tabela(itens):
+    return TabelaCorrecao(dict(itens))
+
+def compilar_tabela_correcao(correction_table):
+    """Compila (com cache) a tabela de correção; aceita também uma TabelaCorrecao já compilada."""
+    if isinstance(correction_table, TabelaCorrecao):
+        return correction_table
+    if not isinstance(correction_table, dict):  # Ex.: JSON com uma lista no lugar do objeto
+        raise TypeError("A tabela de correção deve ser um objeto {faixa: dose}.")
+    # Doses float inteiras (1.0 vindo de JSON) viram int antes do str(): "1.0" não é uma dose válida
+    return _compilar_tabela(tuple((str(k), str(int(v) if isinstance(v, float) and v.is_integer() else v)) for k, v in correction_table.items()))
+
+def calcular_dose_correcao(glicemia, correction_table):
+    """Calcula a dose de correção de insulina com base na glicemia e na tabela de correção."""
+    return compilar_tabela_correcao(correction_table).dose(glicemia)
+
+def calcular_dose_insulina(glicemia, carbs=0.0, tipo_medicao="", carb_ratio=15, correction_table=None):
+    """
+    Calcula a dose total de insulina Lispro.
+    """
+    if correction_table is None:
+        correction_table = get_default_correction_table()
+    correction_table = compilar_tabela_correcao(correction_table)
+    dose_carboidratos = 0
+    if 'antes' in tipo_medicao.lower() and carbs > 0 and carb_ratio > 0:
+        dose_carboidratos = round(carbs / carb_ratio)
+    dose_correcao = calcular_dose_correcao(glicemia['valor'], correction_table)
+    if 'depois' in tipo_medicao.lower():
+        glicemia['dose_sugerida'] = dose_correcao
+        glicemia['calculo'] = f"Correção para {glicemia['valor']}mg/dL = {dose_correcao}UI"
+    else:
+        glicemia['dose_sugerida'] = dose_carboidratos + dose_correcao
+        glicemia['calculo'] = f"Carbs ({carbs}g / {carb_ratio} = {dose_carboidratos}UI) + Correção ({glicemia['valor']}mg/dL = {dose_correcao}UI) = {glicemia['dose_sugerida']}UI"
+    return glicemia
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Importação em Lote
+#
+# Extração paralela de vários .mhtml (importar_lote) e a linha de comando
+# "analisador_glicemia_real.py lote". Os processos do pool importam só este módulo e os que
+# ele usa; Flask, banco e PDF são carregados apenas pelas opções que precisam deles.
+# -----------------------------------------------------------------------------
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+
+from .configuracao import configuracao_do_ambiente
+from .estatisticas import analisar_dados_gerais
+from .extracao import EXTRATORES, VERSAO_EXTRACAO, extrair_mhtml, hash_arquivo
+from .insulina import compilar_tabela_correcao, get_default_correction_table
+from .publicacao import FORMATOS_PUBLICACAO
+from .serie import data_do_dia, montar_dados
+
+# --- Importação em Lote ---
+# Vários .mhtml (arquivos soltos, pastas ou .zip) são extraídos em paralelo num pool de
+# processos. Cada arquivo é isolado: um erro vira uma linha do resultado, sem abortar o
+# lote. As exportações de um mesmo paciente são unidas num único período antes das doses.
+def paciente_do_caminho(caminho_relativo, padrao):
+    """O paciente é a pasta que contém o arquivo (dentro do .zip ou do diretório importado); sem pasta, usa o padrão."""
+    pastas = [p for p in re.split(r'[\\/]', os.path.dirname(caminho_relativo)) if p]
+    return pastas[-1] if pastas else padrao
+
+def _extrair_arquivo_lote(nome, origem, streaming, extrator):
+    """Executado nos processos do pool: extrai um arquivo (caminho ou bytes) e mede o tempo."""
+    inicio = time.perf_counter()
+    try:
+        with (open(origem, 'rb') if isinstance(origem, str) else io.BytesIO(origem)) as stream:
+            chave = hash_arquivo(stream)
+            base, erro = extrair_mhtml(stream, streaming, extrator)
+    except Exception as e:
+        base, chave, erro = None, None, f"Ocorreu um erro ao processar o arquivo. Detalhe: {str(e)}"
+    return {"arquivo": nome, "base": base, "dataset_id": chave, "erro": erro, "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+
+def _tamanho_dia(dia):
+    return len(dia['glicemias']) + len(dia['refeicoes'])
+
+def mesclar_periodos(bases):
+    """
+    Une as exportações de um mesmo paciente em uma única base. Dias repetidos (períodos
+    sobrepostos) ficam com a versão mais completa; em empate, a da exportação mais recente na lista.
+    """
+    por_chave = {}
+    for base in bases:
+        for dia in base['dias']:
+            chave = data_do_dia(dia['data']) or dia['data']
+            if (atual := por_chave.get(chave)) is None or _tamanho_dia(dia) >= _tamanho_dia(atual):
+                por_chave[chave] = dia
+    ordem = {chave: i for i, chave in enumerate(por_chave)}
+    chaves = sorted(por_chave, key=lambda c: (0, c.toordinal()) if isinstance(c, datetime.date) else (1, ordem[c]))
+    datas = [c for c in chaves if isinstance(c, datetime.date)]
+    if datas:
+        periodo = f"{datas[0]:%d/%m/%y} - {datas[-1]:%d/%m/%y}"
+    else:
+        periodo = " | ".join(dict.fromkeys(base['periodo'] for base in bases))
+    return {"periodo": periodo, "dias": [por_chave[c] for c in chaves]}
+
+# --- Pool Compartilhado do Servidor ---
+# A linha de comando cria um pool por execução; no servidor, as requisições de /batch
+# dividem um único pool, criado na primeira importação, em vez de subir processos a cada
+# requisição. Se um processo morrer, o pool quebrado é descartado e o próximo lote cria outro.
+_pool_lote = None
+_trava_pool_lote = threading.Lock()
+
+def pool_lote(max_processos=None):
+    """Pool de processos compartilhado; o tamanho é fixado pela chamada que o cria (padrão: número de CPUs)."""
+    global _pool_lote
+    with _trava_pool_lote:
+        if _pool_lote is None:
+            _pool_lote = concurrent.futures.ProcessPoolExecutor(max_workers=max(1, max_processos or os.cpu_count() or 1))
+        return _pool_lote
+
+def _descartar_pool_lote(pool):
+    global _pool_lote
+    with _trava_pool_lote:
+        if _pool_lote is pool:
+            _pool_lote = None
+    pool.shutdown(wait=False)
+
+def importar_lote(arquivos, carb_ratio, correction_table, max_processos=None, streaming=True, extrator='bs4', cache=None, pool=None):
+    """
+    Importa vários arquivos em paralelo. 'arquivos' é uma lista de (nome, paciente, origem),
+    com origem sendo um caminho ou os bytes do arquivo. Devolve {"arquivos": [...], "pacientes": {...}},
+    com tempo e erro por arquivo e, por paciente, os dados já unidos e analisados. Com 'pool'
+    (ex.: pool_lote()), usa esse pool em vez de criar um com max_processos.
+    """
+    inicio = time.perf_counter()
+    resultados = [None] * len(arquivos)
+    max_processos = max(1, min(max_processos or os.cpu_count() or 1, len(arquivos) or 1))
+    with contextlib.nullcontext(pool) if pool is not None else concurrent.futures.ProcessPoolExecutor(max_workers=max_processos) as executor:
+        futuros = {executor.submit(_extrair_arquivo_lote, nome, origem, streaming, extrator): i for i, (nome, _, origem) in enumerate(arquivos)}
+        for futuro in concurrent.futures.as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:  # Processo do pool morto, resultado não serializável, etc.
+                if pool is not None and isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                    _descartar_pool_lote(pool)
+                resultados[i] = {"arquivo": arquivos[i][0], "base": None, "dataset_id": None, "erro": f"Falha no processo de importação: {e}", "tempo_ms": None}
+    bases_por_paciente = {}
+    for (_, paciente, _), resultado in zip(arquivos, resultados):
+        resultado["paciente"] = paciente
+        if resultado["base"] is not None:
+            bases_por_paciente.setdefault(paciente, []).append(resultado)
+    pacientes = {}
+    for paciente, itens in bases_por_paciente.items():
+        base = mesclar_periodos([r["base"] for r in itens]) if len(itens) > 1 else itens[0]["base"]
+        chave = itens[0]["dataset_id"]
+        if len(itens) > 1:
+            chave = f"v{VERSAO_EXTRACAO}-lote-" + hashlib.sha256("|".join(sorted(r["dataset_id"] for r in itens)).encode()).hexdigest()
+        if cache is not None:
+            cache.guardar(chave, base)
+        dados = montar_dados(base, paciente, carb_ratio, correction_table, chave)
+        pacientes[paciente] = {"base": base, "dados": dados, "analise": analisar_dados_gerais(dados), "arquivos": [r["arquivo"] for r in itens]}
+    arquivos_resumo = [{"arquivo": r["arquivo"], "paciente": r["paciente"], "status": "erro" if r["erro"] else "ok", "erro": r["erro"],
+                        "tempo_ms": r["tempo_ms"], "dias": len(r["base"]["dias"]) if r["base"] else 0, "dataset_id": r["dataset_id"]} for r in resultados]
+    return {"arquivos": arquivos_resumo, "pacientes": pacientes, "tempo_total_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+
+def resumo_paciente_lote(paciente, item):
+    dados, analise = item["dados"], item["analise"]
+    return {"paciente": paciente, "periodo": dados["periodo"], "dias": dados["total_dias"], "dataset_id": dados["dataset_id"],
+            "arquivos": item["arquivos"], "glicemia_media": analise.get("glicemia_media"), "hba1c_estimada": analise.get("hba1c_estimada"),
+            "tempo_no_alvo": analise.get("tempo_no_alvo"), "total_insulina": sum(dia['total_insulina'] for dia in dados['dias'])}
+
+def arquivos_do_zip(zip_stream, paciente_padrao):
+    """Lista (nome, paciente, bytes) dos .mhtml de um .zip; a pasta de cada arquivo define o paciente."""
+    with zipfile.ZipFile(zip_stream) as pacote:
+        return [(info.filename, paciente_do_caminho(info.filename, paciente_padrao), pacote.read(info))
+                for info in pacote.infolist() if not info.is_dir() and info.filename.lower().endswith('.mhtml')]
+
+def tabela_correcao_argumento(texto):
+    """--correction-table: caminho de um arquivo JSON {faixa: dose} ou pares faixa=dose separados por vírgula ("101-150=1,150+=2")."""
+    try:
+        if os.path.isfile(texto):
+            with open(texto, encoding='utf-8') as f:
+                tabela = json.load(f)
+        else:
+            pares = [par.partition('=') for par in texto.split(',') if par.strip()]
+            if not pares or any(not sep for _, sep, _ in pares):
+                raise ValueError("use um arquivo JSON ou pares faixa=dose separados por vírgula")
+            tabela = {faixa.strip(): dose.strip() for faixa, _, dose in pares}
+        compilar_tabela_correcao(tabela)
+    except (OSError, ValueError, TypeError) as e:  # json.JSONDecodeError é um ValueError
+        raise argparse.ArgumentTypeError(f"tabela de correção inválida: {e}")
+    return tabela
+
+def main_lote(argv=None):
+    """Linha de comando: python analisador_glicemia_real.py lote <arquivos|pastas|.zip>... [opções]"""
+    configuracao = configuracao_do_ambiente()
+    parser = argparse.ArgumentParser(prog='analisador_glicemia_real.py lote', description='Importa vários relatórios .mhtml em paralelo.')
+    parser.add_argument('caminhos', nargs='+', help='Arquivos .mhtml, pastas (uma subpasta por paciente) ou arquivos .zip')
+    parser.add_argument('--paciente', default='Utilizador', help='Paciente dos arquivos que não estão numa subpasta')
+    parser.add_argument('--carb-ratio', type=float, default=15)
+    parser.add_argument('--correction-table', type=tabela_correcao_argumento, default=None, metavar='TABELA',
+                        help='Arquivo JSON {faixa: dose} ou pares faixa=dose separados por vírgula (padrão: a tabela de correção padrão)')
+    parser.add_argument('--processos', type=int, default=None, help='Tamanho do pool (padrão: número de CPUs)')
+    parser.add_argument('--extrator', default='bs4', choices=list(EXTRATORES))
+    parser.add_argument('--json', dest='saida_json', help='Grava o resumo do lote neste arquivo JSON')
+    parser.add_argument('--publicar', action='store_true', help='Publica o relatório de cada paciente em relatorios/ e atualiza o index.html')
+    parser.add_argument('--formato', default=configuracao['FORMATO_PUBLICACAO'], choices=FORMATOS_PUBLICACAO, help='Formato da publicação')
+    parser.add_argument('--pdf', metavar='PASTA', help='Exporta o PDF de cada paciente nesta pasta (em paralelo, com --processos)')
+    parser.add_argument('--banco', default=configuracao['BANCO_GLICEMIAS'], help='Grava as leituras neste banco SQLite (padrão: BANCO_GLICEMIAS)')
+    args = parser.parse_args(argv)
+    arquivos = []
+    for caminho in args.caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, nomes in os.walk(caminho):
+                for nome in sorted(nomes):
+                    if nome.lower().endswith('.mhtml'):
+                        completo = os.path.join(raiz, nome)
+                        arquivos.append((completo, paciente_do_caminho(os.path.relpath(completo, caminho), args.paciente), completo))
+        elif caminho.lower().endswith('.zip'):
+            with open(caminho, 'rb') as f:
+                arquivos.extend(arquivos_do_zip(f, args.paciente))
+        else:
+            arquivos.append((caminho, args.paciente, caminho))
+    if not arquivos:
+        print("Nenhum arquivo .mhtml encontrado.", file=sys.stderr)
+        return 1
+    correction_table = args.correction_table or get_default_correction_table()
+    resultado = importar_lote(arquivos, args.carb_ratio, correction_table, args.processos, extrator=args.extrator)
+    for r in resultado["arquivos"]:
+        situacao = f"{r['dias']} dias" if r["status"] == "ok" else f"ERRO: {r['erro']}"
+        print(f"{r['tempo_ms'] if r['tempo_ms'] is not None else '-':>9} ms  {r['paciente']:<20} {r['arquivo']}  {situacao}")
+    resumo = [resumo_paciente_lote(p, item) for p, item in resultado["pacientes"].items()]
+    for r in resumo:
+        print(f"{r['paciente']}: {r['periodo']} ({r['dias']} dias, {len(r['arquivos'])} arquivo(s)) - média {r['glicemia_media']} mg/dL, HbA1c {r['hba1c_estimada']}%")
+    print(f"Total: {len(arquivos)} arquivo(s) em {resultado['tempo_total_ms']} ms")
+    if args.banco:
+        from .banco import BancoGlicemias
+        banco = BancoGlicemias(args.banco)
+        for paciente, item in resultado["pacientes"].items():
+            contagem = banco.importar(item["dados"], args.carb_ratio, correction_table)
+            print(f"Banco {args.banco}: {paciente} - " + ", ".join(f"{n} {situacao}" for situacao, n in contagem.items() if n))
+    if args.publicar:
+        from .web import publicar_relatorios  # Só aqui o lote carrega o Flask e os templates
+        itens = [{"base": item["base"], "dataset_id": item["dados"]["dataset_id"], "paciente": paciente, "carb_ratio": args.carb_ratio,
+                  "correction_table": correction_table, "formato": args.formato} for paciente, item in resultado["pacientes"].items()]
+        publicacao = publicar_relatorios(itens)
+        for arquivo, situacao in publicacao["relatorios"].items():
+            print(f"{situacao:>11}: relatorios/{arquivo}")
+        print("index.html atualizado." if publicacao["index_alterado"] else "index.html sem alterações.")
+    if args.pdf:
+        from .pdf import exportar_pdfs
+        itens = [{"base": item["base"], "dataset_id": item["dados"]["dataset_id"], "paciente": paciente, "carb_ratio": args.carb_ratio,
+                  "correction_table": correction_table} for paciente, item in resultado["pacientes"].items()]
+        for r in exportar_pdfs(itens, args.pdf, args.processos, configuracao['GRAFICO_MAX_PONTOS']):
+            print(f"{r['situacao']:>11}: {r['arquivo']}" + (f"  {r['erro']}" if r['erro'] else f" ({r['tempo_ms']} ms)"))
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as f:
+            json.dump({"arquivos": resultado["arquivos"], "pacientes": resumo, "tempo_total_ms": resultado["tempo_total_ms"]}, f, ensure_ascii=False, indent=2)
+    return 0 if all(r["status"] == "ok" for r in resultado["arquivos"]) else 2
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Exportação em PDF
+#
+# PDF vetorial do relatório, montado direto dos dados (sem Flask e sem dependências
+# externas), e a exportação em paralelo do lote.
+# -----------------------------------------------------------------------------
+
+import concurrent.futures
+import math
+import os
+import time
+import unicodedata
+import zlib
+
+from .estatisticas import analisar_dados_gerais, grafico_relatorio
+from .instrumentacao import medido
+from .publicacao import escrever_se_mudou, nome_arquivo_relatorio
+from .serie import montar_dados
+
+# --- Exportação em PDF (gerada no servidor) ---
+# O PDF é montado direto de 'dados'/'analise', sem navegador e sem dependências: um gerador
+# mínimo de PDF 1.4 com as fontes padrão (Helvetica, não embutida), texto e gráfico vetoriais
+# e uma página por dia. Não há data de criação nem identificadores aleatórios: os mesmos dados
+# geram sempre os mesmos bytes, então o resultado é guardado pela impressão do relatório.
+VERSAO_PDF = 1
+LARGURA_PDF, ALTURA_PDF, MARGEM_PDF = 842, 595, 36  # A4 paisagem, em pontos
+CORES_PDF = {'texto': (31, 41, 55), 'suave': (107, 114, 128), 'azul': (29, 78, 216), 'verde': (34, 197, 94), 'vermelho': (239, 68, 68),
+             'celeste': (14, 165, 233), 'fundo_abaixo': (224, 242, 254), 'fundo_alvo': (220, 252, 231), 'fundo_acima': (254, 226, 226),
+             'grade': (229, 231, 235), 'cartao': (243, 244, 246), 'branco': (255, 255, 255)}
+# Larguras da Helvetica (milésimos de em) dos caracteres ASCII 32 a 126, das métricas AFM padrão
+_LARGURAS_HELVETICA = (278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, *[556] * 10, 278, 278, 584, 584, 584, 556,
+                       1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667,
+                       667, 611, 278, 278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556, 556, 556,
+                       333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584)
+
+def _texto_pdf(texto):
+    """String literal do PDF em WinAnsi (cp1252); caracteres fora dela viram '?'."""
+    return b'(' + str(texto).encode('cp1252', 'replace').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def _num_pdf(valor):
+    return (b'%.2f' % valor).rstrip(b'0').rstrip(b'.')
+
+def largura_texto(texto, tamanho, negrito=False):
+    """Largura do texto em pontos; acentuados contam como a letra base e o negrito é aproximado."""
+    total = 0
+    for caractere in texto:
+        codigo = ord(unicodedata.normalize('NFD', caractere)[0])
+        total += _LARGURAS_HELVETICA[codigo - 32] if 32 <= codigo <= 126 else 556
+    return total * tamanho / 1000 * (1.06 if negrito else 1)
+
+def quebrar_linhas(texto, tamanho, largura, negrito=False):
+    """Quebra o texto em linhas que caibam na largura (palavras maiores que a linha ficam inteiras)."""
+    linhas, atual = [], ''
+    for palavra in texto.split():
+        candidata = f"{atual} {palavra}" if atual else palavra
+        if atual and largura_texto(candidata, tamanho, negrito) > largura:
+            linhas.append(atual)
+            candidata = palavra
+        atual = candidata
+    return linhas + [atual] if atual else linhas
+
+class DocumentoPDF:
+    """
+    Gerador mínimo de PDF: páginas A4 em paisagem com texto (Helvetica), retângulos e
+    linhas. As coordenadas partem do canto superior esquerdo, em pontos.
+    """
+    def __init__(self, titulo=''):
+        self.titulo = titulo
+        self.paginas = []
+
+    def nova_pagina(self):
+        self.paginas.append([])
+        return len(self.paginas) - 1
+
+    @staticmethod
+    def _cor(cor, operador):
+        return b' '.join(_num_pdf(c / 255) for c in cor) + b' ' + operador
+
+    def texto(self, pagina, x, y, conteudo, tamanho=10, negrito=False, cor=CORES_PDF['texto'], alinhar='esquerda'):
+        """Escreve uma linha com a base em 'y'; 'alinhar' ('esquerda', 'centro', 'direita') refere-se a 'x'."""
+        if alinhar != 'esquerda':
+            x -= largura_texto(conteudo, tamanho, negrito) / (2 if alinhar == 'centro' else 1)
+        self.paginas[pagina].append(b'%s BT /F%d %s Tf %s %s Td %s Tj ET' % (
+            self._cor(cor, b'rg'), 2 if negrito else 1, _num_pdf(tamanho), _num_pdf(x), _num_pdf(ALTURA_PDF - y), _texto_pdf(conteudo)))
+
+    def retangulo(self, pagina, x, y, largura, altura, cor):
+        self.paginas[pagina].append(b'%s %s %s %s %s re f' % (self._cor(cor, b'rg'), _num_pdf(x), _num_pdf(ALTURA_PDF - y - altura), _num_pdf(largura), _num_pdf(altura)))
+
+    def linha(self, pagina, pontos, cor, espessura=1):
+        if len(pontos) < 2: return
+        caminho = b' '.join(b'%s %s %s' % (_num_pdf(x), _num_pdf(ALTURA_PDF - y), b'l' if i else b'm') for i, (x, y) in enumerate(pontos))
+        self.paginas[pagina].append(b'%s %s w 1 j %s S' % (self._cor(cor, b'RG'), _num_pdf(espessura), caminho))
+
+    def gerar(self):
+        """Serializa o documento, com os objetos sempre na mesma ordem e sem datas."""
+        objetos = [None, None,  # Catálogo e árvore de páginas, preenchidos ao final
+                   b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+                   b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>']
+        paginas = []
+        for operacoes in self.paginas:
+            fluxo = zlib.compress(b'\n'.join(operacoes), 9)
+            objetos.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(fluxo), fluxo))
+            objetos.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                           % (LARGURA_PDF, ALTURA_PDF, len(objetos)))
+            paginas.append(len(objetos))
+        objetos[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        objetos[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % p for p in paginas), len(paginas))
+        objetos.append(b'<< /Title %s /Producer (analisador_glicemia_real) >>' % _texto_pdf(self.titulo))
+        saida, posicoes = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'), []
+        for numero, objeto in enumerate(objetos, 1):
+            posicoes.append(len(saida))
+            saida += b'%d 0 obj\n%s\nendobj\n' % (numero, objeto)
+        inicio_xref = len(saida)
+        saida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1) + b''.join(b'%010d 00000 n \n' % p for p in posicoes)
+        saida += b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, len(objetos), inicio_xref)
+        return bytes(saida)
+
+def _pdf_resumo(pdf, dados, analise):
+    """Primeira página: cabeçalho, resumo geral, tempo no alvo e glicemia por momento."""
+    p, cor = pdf.nova_pagina(), CORES_PDF
+    pdf.texto(p, MARGEM_PDF, 56, "Relatório de Controle Glicêmico", 22, True, cor['azul'])
+    pdf.texto(p, MARGEM_PDF, 76, f"Paciente: {dados['paciente']} | Período: {dados['periodo']}", 11, cor=cor['suave'])
+    pdf.texto(p, MARGEM_PDF, 114, "Resumo Geral", 14, True)
+    if not analise:
+        pdf.texto(p, MARGEM_PDF, 136, "Nenhuma leitura de glicemia no período.", 10, cor=cor['suave'])
+        return
+    cartoes = [("Glicemia Média", f"{analise['glicemia_media']} mg/dL", cor['azul'], ""),
+               ("HbA1c Estimada", f"{analise['hba1c_estimada']}%", cor['verde'], f"GMI: {analise['gmi']}%"),
+               ("Variabilidade (DP)", f"{analise['desvio_padrao']}", (147, 51, 234), f"CV: {analise['cv']}%"),
+               ("Medições Extremas", f"{analise['glicemia_max']} / {analise['glicemia_min']} mg/dL", cor['vermelho'], "Máxima / Mínima"),
+               ("Total de Dias", f"{dados['total_dias']}", cor['suave'], f"{analise['total_leituras']} leituras")]
+    largura = (LARGURA_PDF - 2 * MARGEM_PDF - 4 * 12) / 5
+    for i, (titulo, valor, cor_valor, detalhe) in enumerate(cartoes):
+        x = MARGEM_PDF + i * (largura + 12)
+        pdf.retangulo(p, x, 126, largura, 74, cor['cartao'])
+        pdf.texto(p, x + 10, 144, titulo, 9, True, cor['suave'])
+        pdf.texto(p, x + 10, 172, valor, 18 if len(valor) < 12 else 13, True, cor_valor)
+        pdf.texto(p, x + 10, 190, detalhe, 8, cor=cor['suave'])
+    pdf.texto(p, MARGEM_PDF, 234, "Glicemia Alvo", 14, True)
+    x, largura_barra = MARGEM_PDF, LARGURA_PDF - 2 * MARGEM_PDF
+    pdf.retangulo(p, x, 246, largura_barra, 24, cor['grade'])
+    for chave, cor_faixa in (('abaixo', cor['celeste']), ('no_alvo', cor['verde']), ('acima', cor['vermelho'])):
+        largura = largura_barra * analise['tempo_no_alvo'][chave] / 100
+        if largura <= 0: continue
+        pdf.retangulo(p, x, 246, largura, 24, cor_faixa)
+        if largura >= 28:
+            pdf.texto(p, x + largura / 2, 262, f"{analise['tempo_no_alvo'][chave]}%", 10, True, cor['branco'], 'centro')
+        x += largura
+    for (rotulo, cor_faixa), x in zip((("<70", cor['celeste']), ("70-180", cor['verde']), (">180", cor['vermelho'])),
+                                      (MARGEM_PDF, LARGURA_PDF / 2 - 20, LARGURA_PDF - MARGEM_PDF - 40)):
+        pdf.retangulo(p, x, 279, 8, 8, cor_faixa)
+        pdf.texto(p, x + 12, 287, rotulo, 9, cor=cor['suave'])
+    if not analise['por_tipo']: return
+    pdf.texto(p, MARGEM_PDF, 320, "Glicemia por Momento", 14, True)
+    colunas = (MARGEM_PDF, MARGEM_PDF + 300, MARGEM_PDF + 380, MARGEM_PDF + 490, MARGEM_PDF + 640)
+    y = 340
+    for x, titulo in zip(colunas, ("Momento", "Leituras", "Média", "Mín / Máx", "No Alvo")):
+        pdf.texto(p, x, y, titulo, 9, True, cor['suave'])
+    pdf.linha(p, [(MARGEM_PDF, y + 5), (LARGURA_PDF - MARGEM_PDF, y + 5)], cor['grade'])
+    for tipo, resumo in analise['por_tipo'].items():
+        if y > ALTURA_PDF - MARGEM_PDF - 40:
+            p, y = pdf.nova_pagina(), MARGEM_PDF + 20
+        y += 17
+        celulas = (tipo, resumo['leituras'], f"{resumo['glicemia_media']} mg/dL", f"{resumo['glicemia_min']} / {resumo['glicemia_max']} mg/dL", f"{resumo['no_alvo']}%")
+        for x, celula in zip(colunas, celulas):
+            pdf.texto(p, x, y, str(celula), 9)
+        pdf.linha(p, [(MARGEM_PDF, y + 5), (LARGURA_PDF - MARGEM_PDF, y + 5)], cor['grade'], 0.5)
+    pc = analise['percentis']
+    pdf.texto(p, MARGEM_PDF, y + 24, f"Percentis (mg/dL): P5 {pc['p5']} · P25 {pc['p25']} · Mediana {pc['p50']} · P75 {pc['p75']} · P95 {pc['p95']}", 8, cor=cor['suave'])
+
+def _pdf_grafico(pdf, dados, max_pontos):
+    """Página do gráfico de tendência, em linhas vetoriais, com os mesmos pontos do relatório HTML."""
+    p, cor, grafico = pdf.nova_pagina(), CORES_PDF, grafico_relatorio(dados, max_pontos)
+    pdf.texto(p, MARGEM_PDF, 52, "Tendência Glicêmica", 16, True)
+    valores = grafico['data']
+    if grafico['exibidos'] < grafico['total']:
+        pdf.texto(p, MARGEM_PDF, 68, f"Exibindo {grafico['exibidos']} de {grafico['total']} leituras (curva reduzida preservando picos e vales).", 9, cor=cor['suave'])
+    if not valores:
+        pdf.texto(p, MARGEM_PDF, 90, "Nenhuma leitura de glicemia no período.", 10, cor=cor['suave'])
+        return
+    x0, x1, y0, y1 = MARGEM_PDF + 30, LARGURA_PDF - MARGEM_PDF, 86, ALTURA_PDF - MARGEM_PDF - 24
+    minimo, maximo = min(40, min(valores) // 50 * 50), max(300, -(-max(valores) // 50) * 50)
+    escala_y = lambda v: y1 - (v - minimo) / (maximo - minimo) * (y1 - y0)
+    escala_x = lambda i: x0 + (i / (len(valores) - 1) if len(valores) > 1 else 0.5) * (x1 - x0)
+    pdf.retangulo(p, x0, escala_y(180), x1 - x0, escala_y(70) - escala_y(180), cor['fundo_alvo'])
+    for v in range(-(-minimo // 50) * 50, maximo + 1, 50):
+        pdf.linha(p, [(x0, escala_y(v)), (x1, escala_y(v))], cor['grade'], 0.5)
+        pdf.texto(p, x0 - 5, escala_y(v) + 3, str(v), 8, cor=cor['suave'], alinhar='direita')
+    pdf.linha(p, [(x0, y0), (x0, y1), (x1, y1)], cor['suave'], 0.75)
+    passo = max(1, math.ceil(len(valores) / 12))
+    for i in range(0, len(valores), passo):
+        pdf.linha(p, [(escala_x(i), y1), (escala_x(i), y1 + 3)], cor['suave'], 0.5)
+        pdf.texto(p, escala_x(i), y1 + 13, grafico['labels'][i], 7, cor=cor['suave'], alinhar='centro')
+    pdf.linha(p, [(escala_x(i), escala_y(v)) for i, v in enumerate(valores)], cor['azul'], 0.8)
+
+class _ColunaPDF:
+    """Cursor vertical de uma coluna da página do dia; ao encher, continua na página seguinte do dia."""
+    TOPO, LIMITE = 116, ALTURA_PDF - MARGEM_PDF
+
+    def __init__(self, paginas, x, largura):
+        self.paginas, self.x, self.largura = paginas, x, largura
+        self.n, self.y = 0, self.TOPO
+
+    def reservar(self, altura):
+        """(página, y) de um bloco de 'altura' pontos."""
+        if self.y + altura > self.LIMITE and self.y > self.TOPO:
+            self.n, self.y = self.n + 1, self.TOPO
+        posicao = (self.paginas(self.n), self.y)
+        self.y += altura
+        return posicao
+
+def _pdf_dia(pdf, dados, d, dia):
+    """Página(s) de um dia: glicemias com as doses à esquerda, refeições e alimentos à direita."""
+    serie, cor, paginas = dados['serie'], CORES_PDF, []
+
+    def pagina(n):
+        while len(paginas) <= n:
+            p = pdf.nova_pagina()
+            pdf.texto(p, MARGEM_PDF, 52, dia['data'] + (" (continuação)" if paginas else ""), 16, True)
+            pdf.texto(p, MARGEM_PDF, 68, f"Total: {dia['total_kcal']:.1f} kcals / {dia['total_carbs']:.1f}g carbs", 10, cor=cor['suave'])
+            pdf.texto(p, LARGURA_PDF - MARGEM_PDF, 48, "Total Insulina do Dia", 11, True, cor['azul'], 'direita')
+            pdf.texto(p, LARGURA_PDF - MARGEM_PDF, 68, f"{dia['total_insulina']:.0f} UI", 16, True, cor['azul'], 'direita')
+            pdf.linha(p, [(MARGEM_PDF, 80), (LARGURA_PDF - MARGEM_PDF, 80)], cor['grade'])
+            pdf.texto(p, MARGEM_PDF, 100, "Glicemias e Doses", 12, True)
+            pdf.texto(p, MARGEM_PDF + 340, 100, "Refeições e Alimentos", 12, True)
+            paginas.append(p)
+        return paginas[n]
+
+    pagina(0)
+    coluna = _ColunaPDF(pagina, MARGEM_PDF, 320)
+    for i in range(*serie.intervalo_dia(d)):
+        valor = serie.valores[i]
+        calculo = quebrar_linhas(f"Cálculo: {serie.calculo(i)}", 7, coluna.largura - 16)
+        p, y = coluna.reservar(40 + 9 * len(calculo) + 6)
+        fundo = cor['fundo_abaixo'] if valor < 70 else cor['fundo_acima'] if valor > 180 else cor['fundo_alvo']
+        pdf.retangulo(p, coluna.x, y, coluna.largura, 40 + 9 * len(calculo), fundo)
+        pdf.texto(p, coluna.x + 8, y + 15, f"{serie.hora(i)} ({serie.categorias[serie.tipos[i]]})", 9, cor=cor['suave'])
+        pdf.texto(p, coluna.x + coluna.largura - 8, y + 15, f"{valor} mg/dL", 11, True, alinhar='direita')
+        pdf.texto(p, coluna.x + 8, y + 31, f"Dose Sugerida: {serie.doses[i]} UI", 9, True, cor['azul'])
+        for n, linha in enumerate(calculo):
+            pdf.texto(p, coluna.x + 8, y + 42 + 9 * n, linha, 7, cor=cor['suave'])
+    coluna = _ColunaPDF(pagina, MARGEM_PDF + 340, LARGURA_PDF - 2 * MARGEM_PDF - 340)
+    if not dia['refeicoes']:
+        p, y = coluna.reservar(14)
+        pdf.texto(p, coluna.x, y + 10, "Nenhuma refeição registrada para este dia.", 9, cor=cor['suave'])
+    for refeicao in dia['refeicoes']:
+        p, y = coluna.reservar(28)
+        pdf.retangulo(p, coluna.x, y, coluna.largura, 26, cor['cartao'])
+        pdf.texto(p, coluna.x + 8, y + 12, refeicao['nome'], 10, True)
+        pdf.texto(p, coluna.x + 8, y + 22, f"{refeicao['total_kcal']:.1f} kcals / {refeicao['total_carbs']:.1f}g carbs", 8, cor=cor['suave'])
+        for alimento in refeicao['alimentos'] or [None]:
+            texto = f"{alimento['nome']} ({alimento['detalhes']})" if alimento else "Nenhum alimento detalhado."
+            for n, linha in enumerate(quebrar_linhas(texto, 8, coluna.largura - 24)):
+                p, y = coluna.reservar(11)
+                pdf.texto(p, coluna.x + (10 if n == 0 else 18), y + 8, ("• " if n == 0 else "") + linha, 8, cor=cor['texto'] if alimento else cor['suave'])
+        coluna.reservar(8)
+
+@medido('pdf')
+def gerar_pdf(dados, max_pontos=1000):
+    """PDF do relatório: resumo, gráfico de tendência e uma página (ou mais) por dia."""
+    pdf = DocumentoPDF(f"Relatório de Controle Glicêmico - {dados['paciente']} - {dados['periodo']}")
+    _pdf_resumo(pdf, dados, analisar_dados_gerais(dados))
+    _pdf_grafico(pdf, dados, max_pontos)
+    for d, dia in enumerate(dados['dias']):
+        _pdf_dia(pdf, dados, d, dia)
+    return pdf.gerar()
+
+def nome_arquivo_pdf(patient_name, periodo):
+    return nome_arquivo_relatorio(patient_name, periodo).removesuffix('.html') + '.pdf'
+
+def _exportar_pdf_lote(item, caminho, max_pontos):
+    """Executado nos processos do pool: monta os dados de um item e grava o PDF se ele mudou."""
+    inicio = time.perf_counter()
+    try:
+        dados = montar_dados(item['base'], item['paciente'], item['carb_ratio'], item['correction_table'], item['dataset_id'])
+        situacao, erro = 'gerado' if escrever_se_mudou(caminho, gerar_pdf(dados, max_pontos)) else 'inalterado', None
+    except Exception as e:
+        situacao, erro = 'erro', f"Falha ao gerar o PDF: {e}"
+    return {"arquivo": caminho, "paciente": item['paciente'], "situacao": situacao, "erro": erro, "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+
+def exportar_pdfs(itens, diretorio, max_processos=None, max_pontos=1000):
+    """
+    Gera em paralelo, num pool de processos, o PDF de cada item (mesmo formato de
+    publicar_relatorios) em 'diretorio'. Como a saída é determinística, um PDF cujo
+    relatório não mudou não é reescrito ('inalterado').
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    caminhos = [os.path.join(diretorio, nome_arquivo_pdf(item['paciente'], item['base']['periodo'])) for item in itens]
+    resultados = [None] * len(itens)
+    max_processos = max(1, min(max_processos or os.cpu_count() or 1, len(itens) or 1))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_processos) as pool:
+        futuros = {pool.submit(_exportar_pdf_lote, item, caminho, max_pontos): i for i, (item, caminho) in enumerate(zip(itens, caminhos))}
+        for futuro in concurrent.futures.as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:  # Processo do pool morto, item não serializável, etc.
+                resultados[i] = {"arquivo": caminhos[i], "paciente": itens[i]['paciente'], "situacao": 'erro', "erro": f"Falha no processo de exportação: {e}", "tempo_ms": None}
+    return resultados
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Arquivos da Publicação Estática
+#
+# Nomes, manifesto, escrita atômica e os dados do formato compacto. A renderização
+# dos templates e publicar_relatorios ficam em analisador.web.
+# -----------------------------------------------------------------------------
+
+import json
+import math
+import os
+import re
+import urllib.parse
+
+from .estatisticas import analisar_dados_gerais, grafico_relatorio
+
+# --- Publicação Estática dos Relatórios ---
+# Renderiza o REPORT_TEMPLATE direto em relatorios/ e regenera o index.html a partir do
+# manifesto (relatorios/manifesto.json). Cada entrada guarda a impressão digital das
+# entradas (dataset, paciente, parâmetros e template); só é re-renderizado o relatório
+# cuja impressão mudou, e o index só é reescrito se o seu conteúdo mudar.
+# No formato 'compacto', cada relatório vira só um JSON gzipado com os dados, exibido
+# por uma página única e compartilhada (relatorios/relatorio.html?dados=<nome>), que
+# o navegador mantém em cache entre os relatórios.
+ARQUIVO_MANIFESTO = 'manifesto.json'
+ARQUIVO_CASCA = 'relatorio.html'
+FORMATOS_PUBLICACAO = ('html', 'compacto')
+
+def nome_arquivo_relatorio(patient_name, periodo):
+    paciente_safe = re.sub(r'[^a-z0-9_]', '', patient_name.lower().replace(' ', '_'))
+    periodo_safe = (periodo or "periodo").replace(' a ', '_').replace('/', '-')
+    return f"relatorio_glicemico_{paciente_safe}_{periodo_safe}.html"
+
+def dados_compactos(dados, max_pontos=1000):
+    """
+    Dados do relatório para a página compartilhada: só o que ela exibe, com glicemias e
+    refeições em listas posicionais. O texto do cálculo é remontado no navegador.
+    """
+    serie, analise = dados['serie'], analisar_dados_gerais(dados)
+    dias = []
+    for d, dia in enumerate(dados['dias']):
+        i0, i1 = serie.intervalo_dia(d)
+        dias.append({"data": dia['data'], "total_kcal": dia['total_kcal'], "total_carbs": dia['total_carbs'], "total_insulina": dia['total_insulina'],
+                     "glicemias": [[serie.hora(i), serie.tipos[i], serie.valores[i], serie.doses[i], serie.doses_carbs[i], serie.doses_correcao[i],
+                                    None if math.isnan(serie.carbs[i]) else serie.carbs[i]] for i in range(i0, i1)],
+                     "refeicoes": [[r['nome'], r['total_kcal'], r['total_carbs'], [[a['nome'], a['detalhes']] for a in r['alimentos']]] for r in dia['refeicoes']]})
+    return {"versao": 1, "paciente": dados['paciente'], "periodo": dados['periodo'], "total_dias": dados['total_dias'],
+            "carb_ratio": str(serie.carb_ratio), "tipos": serie.categorias, "analise": {k: v for k, v in analise.items() if k != 'por_dia'},
+            "grafico": grafico_relatorio(dados, max_pontos), "dias": dias}
+
+def escrever_atomico(caminho, conteudo):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') if isinstance(conteudo, bytes) else open(temporario, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+def escrever_se_mudou(caminho, conteudo):
+    """Reescreve o arquivo só se o conteúdo mudou; devolve True se escreveu."""
+    if os.path.exists(caminho):
+        with open(caminho, 'rb') if isinstance(conteudo, bytes) else open(caminho, encoding='utf-8') as f:
+            if f.read() == conteudo: return False
+    escrever_atomico(caminho, conteudo)
+    return True
+
+def carregar_manifesto(diretorio):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {"relatorios": {}}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+def href_relatorio(diretorio, arquivo, item):
+    pasta = os.path.basename(diretorio)
+    if item.get("formato") == 'compacto':
+        return f"{pasta}/{ARQUIVO_CASCA}?dados={urllib.parse.quote(arquivo.removesuffix('.json.gz'))}"
+    return f"{pasta}/{arquivo}"
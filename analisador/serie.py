@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Série de Glicemias
+#
+# Armazenamento colunar das leituras (SerieGlicemias) e a etapa de doses
+# (montar_dados) sobre a estrutura extraída do .mhtml.
+# -----------------------------------------------------------------------------
+
+import bisect
+import datetime
+import functools
+import math
+import re
+import sys
+import unicodedata
+from array import array
+from collections.abc import Sequence
+
+from .insulina import compilar_tabela_correcao
+from .instrumentacao import medido
+
+# --- Armazenamento Colunar das Leituras ---
+# As glicemias de todo o período ficam em arrays paralelos (valor, instante, tipo, carbs,
+# doses), com os tipos internados como categorias. O achatamento dos dias acontece uma
+# única vez; estatísticas, gráfico e /recalculate leem as colunas diretamente, e o texto
+# do 'calculo' só é montado quando o relatório é renderizado.
+MESES = {'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+         'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12}
+RE_DATA_DIA = re.compile(r'(\d{1,2}) de (\w+) de (\d{4})')
+EPOCA = datetime.date(1970, 1, 1)
+
+def data_do_dia(texto):
+    """Converte o título do dia ("25 de Agosto de 2025") em date; None se não reconhecer."""
+    if (match := RE_DATA_DIA.search(texto)) and (mes := MESES.get(match.group(2).lower())):
+        try:
+            return datetime.date(int(match.group(3)), mes, int(match.group(1)))
+        except ValueError:
+            return None
+    return None
+
+# Refeições: os cartões e as medições pré-prandiais são comparados pelo nome normalizado (sem
+# acentos, minúsculas, sem horário). A categoria (palavra-chave) só é usada quando um dos lados
+# não tem qualificador: "Antes do café" acha "Café da manhã", mas "Antes do lanche da tarde" nunca
+# fica com o "Lanche da manhã". Os períodos citados nos nomes desempatam "Antes do lanche".
+CATEGORIAS_REFEICAO = ('cafe', 'almoco', 'jantar', 'lanche')
+PERIODOS_REFEICAO = {'manha': (0, 720), 'tarde': (720, 1080), 'noite': (1080, 1440)}  # [início, fim) em minutos do dia
+RE_HORA = re.compile(r'\b(\d{1,2}):(\d{2})\b')
+RE_ANTES = re.compile(r'^antes\s+d[aoe]s?\s+')
+
+def _normalizar(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+
+@functools.lru_cache(maxsize=256)
+def nome_refeicao(nome):
+    """Nome normalizado de uma refeição ("Lanche da Tarde 15:30" -> 'lanche da tarde')."""
+    return ' '.join(RE_HORA.sub(' ', _normalizar(nome)).split())
+
+@functools.lru_cache(maxsize=256)
+def categoria_refeicao(nome):
+    """Categoria ('cafe', 'almoco', 'jantar', 'lanche') de um nome de refeição; None se não reconhecer."""
+    normalizado = _normalizar(nome)
+    return next((categoria for categoria in CATEGORIAS_REFEICAO if categoria in normalizado), None)
+
+@functools.lru_cache(maxsize=256)
+def refeicao_medicao(tipo):
+    """Nome normalizado da refeição de uma medição pré-prandial ("Antes do lanche da tarde" -> 'lanche da tarde'); None nas demais."""
+    normalizado = nome_refeicao(tipo)
+    return RE_ANTES.sub('', normalizado) if RE_ANTES.match(normalizado) else None
+
+@functools.lru_cache(maxsize=256)
+def categoria_medicao(tipo):
+    """Categoria da refeição de uma medição pré-prandial ("Antes do almoço" -> 'almoco'); None nas demais."""
+    return categoria_refeicao(tipo) if 'antes' in _normalizar(tipo) else None
+
+def _minutos(hora):
+    horas, minutos = hora.split(':')
+    return int(horas) * 60 + int(minutos)
+
+def minuto_refeicao(refeicao):
+    """Minuto do dia da refeição: o campo 'hora', se houver, ou um horário no nome do cartão ("Lanche 15:30"); None sem horário."""
+    if hora := refeicao.get('hora'):
+        return _minutos(hora)
+    return int(match.group(1)) * 60 + int(match.group(2)) if (match := RE_HORA.search(refeicao['nome'])) else None
+
+def _ordem_refeicao(refeicao):
+    return refeicao[0] is None, refeicao[0] or 0  # Por horário; as sem horário no fim
+
+def _periodo(nome):
+    return next((periodo for chave, periodo in PERIODOS_REFEICAO.items() if chave in nome.split()), None)
+
+def _candidatas(nome, por_nome, por_categoria, minuto):
+    """Refeições (minuto, carbs) que podem ser a da medição: as de mesmo nome; sem elas, as da categoria sem qualificador."""
+    if nome in por_nome:
+        return por_nome[nome]
+    if (categoria := categoria_refeicao(nome)) is None:
+        return None
+    if nome != categoria:  # "lanche da tarde" sem cartão de mesmo nome: só um "Lanche" sem qualificador serve
+        return por_nome.get(categoria)
+    nomes = por_categoria.get(categoria, [])
+    if len(nomes) > 1:  # "Antes do lanche" com "Lanche da manhã" e "Lanche da tarde": vale o período do horário da medição
+        nomes = [n for n in nomes if (periodo := _periodo(n)) is None or periodo[0] <= minuto < periodo[1]] or nomes
+    return sorted((r for n in nomes for r in por_nome[n]), key=_ordem_refeicao) if nomes else None
+
+def _escolher(candidatas, minuto):
+    """A primeira refeição com horário no mesmo minuto ou depois da medição (sem nenhuma, a última antes dela); sem horários, a de menos carboidratos."""
+    com_horario = [r for r in candidatas if r[0] is not None]
+    if com_horario:
+        j = bisect.bisect_left(com_horario, (minuto,))
+        return com_horario[min(j, len(com_horario) - 1)][1]
+    return min(carbs for _, carbs in candidatas)
+
+def carbs_pre_refeicao(glicemias, refeicoes):
+    """
+    Carboidratos da refeição de cada medição pré-prandial de um dia (None nas demais), na ordem
+    de 'glicemias'. As refeições são indexadas uma vez pelo nome normalizado (e pela categoria);
+    cada medição procura o cartão de mesmo nome ("Antes do lanche da tarde" -> "Lanche da tarde")
+    e, entre os candidatos com horário, fica com o primeiro no mesmo minuto ou depois dela. Várias
+    medições antes da mesma refeição recebem os mesmos carboidratos. A exportação lista os cartões
+    fora de ordem e não traz o horário das refeições; entre cartões repetidos sem horário (dois
+    "Jantar" no mesmo dia), vale o de menos carboidratos, para não superestimar a dose.
+    """
+    carbs = [None] * len(glicemias)
+    if not refeicoes:
+        return carbs
+    por_nome, por_categoria = {}, {}
+    for refeicao in refeicoes:
+        por_nome.setdefault(nome := nome_refeicao(refeicao['nome']), []).append((minuto_refeicao(refeicao), refeicao['total_carbs']))
+    for nome, lista in por_nome.items():
+        lista.sort(key=_ordem_refeicao)
+        if categoria := categoria_refeicao(nome):
+            por_categoria.setdefault(categoria, []).append(nome)
+    for i, g in enumerate(glicemias):
+        if (nome := refeicao_medicao(g['tipo'])) is not None:
+            minuto = _minutos(g['hora'])
+            if candidatas := _candidatas(nome, por_nome, por_categoria, minuto):
+                carbs[i] = _escolher(candidatas, minuto)
+    return carbs
+
+class SerieGlicemias:
+    """
+    Leituras de glicemia em colunas. 'timestamps' guarda minutos desde 1970-01-01 (hora
+    local do relatório); 'carbs' usa NaN quando não há refeição associada. 'inicios_dias'
+    delimita as leituras de cada dia (dia i = [inicios_dias[i], inicios_dias[i + 1])).
+    """
+    def __init__(self):
+        self.valores = array('H')
+        self.timestamps = array('q')
+        self.tipos = array('B')
+        self.carbs = array('d')
+        self.doses = array('i')
+        self.doses_carbs = array('i')
+        self.doses_correcao = array('i')
+        self.categorias = []
+        self.inicios_dias = array('L', [0])
+        self.carb_ratio = None
+        self._codigos = {}
+
+    @classmethod
+    def de_dias(cls, dias):
+        """Achata os dias extraídos (dicts) nas colunas, associando cada medição à sua refeição."""
+        serie = cls()
+        for indice, dia in enumerate(dias):
+            data = data_do_dia(dia.get('data', ''))
+            inicio_dia = (data - EPOCA).days * 1440 if data else indice * 1440
+            glicemias = dia.get('glicemias', [])
+            for g, carbs in zip(glicemias, carbs_pre_refeicao(glicemias, dia.get('refeicoes', []))):
+                serie.valores.append(g['valor'])
+                serie.timestamps.append(inicio_dia + _minutos(g['hora']))
+                serie.tipos.append(serie._codigo(g['tipo']))
+                serie.carbs.append(math.nan if carbs is None else carbs)
+            serie.inicios_dias.append(len(serie.valores))
+        return serie
+
+    def _codigo(self, tipo):
+        if (codigo := self._codigos.get(tipo)) is None:
+            codigo = self._codigos[tipo] = len(self.categorias)
+            self.categorias.append(sys.intern(tipo))
+        return codigo
+
+    def __len__(self):
+        return len(self.valores)
+
+    def intervalo_dia(self, indice):
+        return self.inicios_dias[indice], self.inicios_dias[indice + 1]
+
+    def calcular_doses(self, carb_ratio, correction_table):
+        """Preenche as colunas de dose para todas as leituras (mesmas regras de calcular_dose_insulina)."""
+        correcoes = compilar_tabela_correcao(correction_table).doses_para(self.valores)
+        regras = [('antes' in tipo.lower(), 'depois' in tipo.lower()) for tipo in self.categorias]
+        self.doses, self.doses_carbs, self.doses_correcao = array('i'), array('i'), array('i')
+        for codigo, carbs, correcao in zip(self.tipos, self.carbs, correcoes):
+            antes, depois = regras[codigo]
+            dose_carbs = round(carbs / carb_ratio) if antes and carbs > 0 and carb_ratio > 0 else 0
+            self.doses_carbs.append(dose_carbs)
+            self.doses_correcao.append(correcao)
+            self.doses.append(correcao if depois else dose_carbs + correcao)
+        self.carb_ratio = carb_ratio
+        return self
+
+    def total_insulina_dia(self, indice):
+        return sum(self.doses[slice(*self.intervalo_dia(indice))])
+
+    def hora(self, i):
+        minutos = self.timestamps[i] % 1440
+        return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+    def calculo(self, i):
+        """Texto explicativo da dose, gerado sob demanda."""
+        valor, correcao = self.valores[i], self.doses_correcao[i]
+        if 'depois' in self.categorias[self.tipos[i]].lower():
+            return f"Correção para {valor}mg/dL = {correcao}UI"
+        carbs = 0 if math.isnan(self.carbs[i]) else self.carbs[i]
+        return f"Carbs ({carbs}g / {self.carb_ratio} = {self.doses_carbs[i]}UI) + Correção ({valor}mg/dL = {correcao}UI) = {self.doses[i]}UI"
+
+    def leituras_dia(self, indice):
+        return FatiaGlicemias(self, *self.intervalo_dia(indice))
+
+class LeituraGlicemia:
+    """Visão de uma leitura da série; expõe os mesmos campos do antigo dict de glicemia."""
+    __slots__ = ('_serie', '_i')
+
+    def __init__(self, serie, i):
+        self._serie, self._i = serie, i
+
+    hora = property(lambda self: self._serie.hora(self._i))
+    valor = property(lambda self: self._serie.valores[self._i])
+    tipo = property(lambda self: self._serie.categorias[self._serie.tipos[self._i]])
+    dose_sugerida = property(lambda self: self._serie.doses[self._i])
+    calculo = property(lambda self: self._serie.calculo(self._i))
+
+    def __getitem__(self, chave):
+        return getattr(self, chave)
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave, padrao)
+
+class FatiaGlicemias(Sequence):
+    """As leituras de um dia, como sequência de LeituraGlicemia criadas sob demanda."""
+    __slots__ = ('_serie', '_inicio', '_fim')
+
+    def __init__(self, serie, inicio, fim):
+        self._serie, self._inicio, self._fim = serie, inicio, fim
+
+    def __len__(self):
+        return self._fim - self._inicio
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0: indice += len(self)
+        if not 0 <= indice < len(self): raise IndexError(indice)
+        return LeituraGlicemia(self._serie, self._inicio + indice)
+
+# --- Módulo de Cálculo de Doses (sobre dados já extraídos) ---
+@medido('doses')
+def calcular_doses(base, carb_ratio, correction_table):
+    """
+    Etapa de doses, separada da extração: monta a série colunar a partir da estrutura
+    extraída (sem alterá-la, pois pode estar em cache) e calcula as doses. Devolve
+    (dias, serie), onde cada dia traz 'total_insulina' e 'glicemias' como visão da série.
+    """
+    serie = SerieGlicemias.de_dias(base['dias']).calcular_doses(carb_ratio, correction_table)
+    dias = [{**{k: v for k, v in dia.items() if k != 'glicemias'}, "glicemias": serie.leituras_dia(i), "total_insulina": serie.total_insulina_dia(i)}
+            for i, dia in enumerate(base['dias'])]
+    return dias, serie
+
+def montar_dados(base, patient_name, carb_ratio, correction_table, dataset_id=None):
+    """Aplica a etapa de doses sobre uma base extraída e monta o dict 'dados' usado pelo relatório."""
+    dias, serie = calcular_doses(base, carb_ratio, correction_table)
+    return {"paciente": patient_name, "periodo": base['periodo'], "dias": dias, "serie": serie, "dataset_id": dataset_id, "total_dias": len(dias)}
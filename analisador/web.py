@@ -0,0 +1,1394 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Aplicativo Web
+#
+# Rotas do Flask, templates HTML, fila de uploads em segundo plano e a publicação
+# renderizada. É o único módulo que importa o Flask.
+# -----------------------------------------------------------------------------
+
+import concurrent.futures
+import cProfile
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+
+from flask import Flask, request, redirect, url_for, flash, jsonify, g
+from markupsafe import Markup
+
+from .banco import BancoGlicemias
+from .configuracao import configuracao_do_ambiente
+from .estatisticas import analisar_dados_gerais, dados_grafico, grafico_relatorio, minutos_epoca, reduzir_lttb
+from .extracao import VERSAO_EXTRACAO, CacheRelatorios, parse_mhtml
+from .instrumentacao import Medicao, log_requisicoes, medicao_atual, medido, medir, metricas
+from .insulina import compilar_tabela_correcao, get_default_correction_table
+from .lote import arquivos_do_zip, importar_lote, paciente_do_caminho, pool_lote, resumo_paciente_lote
+from .pdf import VERSAO_PDF, gerar_pdf, nome_arquivo_pdf
+from .publicacao import (ARQUIVO_CASCA, ARQUIVO_MANIFESTO, FORMATOS_PUBLICACAO, carregar_manifesto, dados_compactos, escrever_atomico,
+                         escrever_se_mudou, href_relatorio, nome_arquivo_relatorio)
+from .serie import SerieGlicemias, calcular_doses, montar_dados
+
+app = Flask(__name__)
+app.secret_key = 'super-secret-key'
+# Opções lidas do ambiente (MHTML_STREAMING, BANCO_GLICEMIAS, GRAFICO_MAX_PONTOS, ...); ver analisador.configuracao
+app.config.update(configuracao_do_ambiente())
+
+# --- Templates Compilados e Fragmentos por Dia ---
+# Os templates são compilados uma única vez, na inicialização (registro_templates, criado
+# no fim do módulo, após as definições). Cada dia do relatório é renderizado à parte pelo
+# DAY_TEMPLATE e guardado pelo conteúdo do dia e pelas suas doses: ao recalcular com outros
+# parâmetros, só os dias cujo cálculo mudou voltam a ser renderizados.
+class RegistroTemplates:
+    """Templates Jinja compilados uma vez e renderizados com o contexto padrão do Flask."""
+    def __init__(self, ambiente, fontes):
+        self._templates = {nome: ambiente.from_string(fonte) for nome, fonte in fontes.items()}
+        self.assinatura = hashlib.sha256('\0'.join(fontes[nome] for nome in sorted(fontes)).encode('utf-8')).hexdigest()
+
+    def obter(self, nome):
+        return self._templates[nome]
+
+    def renderizar(self, nome, **contexto):
+        app.update_template_context(contexto)
+        with medir('renderizacao'):
+            return self._templates[nome].render(contexto)
+
+class CacheFragmentos:
+    """LRU de conteúdos já renderizados (fragmentos HTML ou PDFs), limitado pelo tamanho total."""
+    def __init__(self, max_caracteres=32 * 1024 * 1024):
+        self.max_caracteres = max_caracteres
+        self._itens = OrderedDict()
+        self._caracteres = 0
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            if (html := self._itens.get(chave)) is not None:
+                self._itens.move_to_end(chave)
+            return html
+
+    def guardar(self, chave, html):
+        if len(html) > self.max_caracteres: return
+        with self._trava:
+            if (antigo := self._itens.pop(chave, None)) is not None:
+                self._caracteres -= len(antigo)
+            self._itens[chave] = html
+            self._caracteres += len(html)
+            while self._caracteres > self.max_caracteres:
+                _, removido = self._itens.popitem(last=False)
+                self._caracteres -= len(removido)
+
+cache_fragmentos = CacheFragmentos(int(os.environ.get('CACHE_FRAGMENTOS_MAX_MB', 32)) * 1024 * 1024)
+
+def _identidade_dias(dados):
+    """Identifica o conteúdo extraído: o dataset_id (hash do arquivo) ou, sem ele, um hash da série e das refeições."""
+    if dados.get('dataset_id'):
+        return dados['dataset_id']
+    serie, h = dados['serie'], hashlib.sha256()
+    for coluna in (serie.valores, serie.timestamps, serie.tipos, serie.inicios_dias):
+        h.update(coluna.tobytes())
+    h.update(json.dumps([serie.categorias] + [[dia['data'], dia['total_kcal'], dia['total_carbs'], dia['refeicoes']] for dia in dados['dias']],
+                        ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+@medido('fragmentos_dias')
+def renderizar_dias(dados, cache=None):
+    """HTML de cada dia do relatório; os dias com mesmo conteúdo e mesmas doses vêm do cache."""
+    serie, template = dados['serie'], registro_templates.obter('dia')
+    identidade = _identidade_dias(dados) if cache is not None else None
+    fragmentos = []
+    for d, dia in enumerate(dados['dias']):
+        i0, i1 = serie.intervalo_dia(d)
+        chave = (identidade, d, serie.carb_ratio, serie.doses[i0:i1].tobytes(), serie.doses_carbs[i0:i1].tobytes(), serie.doses_correcao[i0:i1].tobytes())
+        if cache is None or (html := cache.obter(chave)) is None:
+            html = template.render(dia=dia, dia_idx=d)
+            if cache is not None:
+                cache.guardar(chave, html)
+        fragmentos.append(Markup(html))
+    return fragmentos
+
+cache_relatorios = CacheRelatorios(
+    max_bytes=int(os.environ.get('CACHE_RELATORIOS_MAX_MB', 64)) * 1024 * 1024,
+    diretorio=os.environ.get('CACHE_RELATORIOS_DIR') or None,
+)
+
+_bancos = {}
+
+def banco_glicemias():
+    """Banco configurado em BANCO_GLICEMIAS (aberto uma vez por caminho) ou None se desativado."""
+    if not (caminho := app.config['BANCO_GLICEMIAS']):
+        return None
+    if caminho not in _bancos:
+        _bancos[caminho] = BancoGlicemias(caminho)
+    return _bancos[caminho]
+
+# --- Publicação Estática dos Relatórios (renderização) ---
+# Os nomes, o manifesto e o formato compacto estão em analisador.publicacao.
+_trava_publicacao = threading.Lock()
+
+def contexto_relatorio(dados, carb_ratio, correction_table, publicado=False):
+    """Variáveis do REPORT_TEMPLATE para um 'dados' já com doses."""
+    grafico = grafico_relatorio(dados, app.config['GRAFICO_MAX_PONTOS'])
+    return {"dados": dados, "analise": analisar_dados_gerais(dados), "grafico": grafico, "chart_data": json.dumps(grafico), "dias_html": renderizar_dias(dados, cache_fragmentos),
+            "filename_html": nome_arquivo_relatorio(dados['paciente'], dados.get('periodo')),
+            "parametros": {"carb_ratio": carb_ratio, "correction_table": correction_table}, "publicado": publicado}
+
+def impressao_relatorio(dataset_id, patient_name, carb_ratio, correction_table, formato='html'):
+    """Impressão digital de tudo que determina o relatório publicado."""
+    tabela = compilar_tabela_correcao(correction_table)
+    conteudo = json.dumps([dataset_id, patient_name, float(carb_ratio), tabela.inicios, [str(f) for f in tabela.fins], tabela.doses,
+                           registro_templates.assinatura, app.config['GRAFICO_MAX_PONTOS'], formato])
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def gerar_index(manifesto, caminho_index, diretorio):
+    """Regenera o index.html a partir do manifesto; devolve True se o arquivo mudou."""
+    relatorios = [{"href": href_relatorio(diretorio, arquivo, item),
+                   "titulo": item.get("titulo") or f"Relatório de {item['periodo'].replace(' - ', ' a ')} - {item['paciente']}"}
+                  for arquivo, item in manifesto["relatorios"].items()]
+    with app.app_context():
+        conteudo = registro_templates.renderizar('index', relatorios=relatorios)
+    return escrever_se_mudou(caminho_index, conteudo)
+
+def publicar_relatorios(itens, diretorio='relatorios', caminho_index='index.html', forcar=False):
+    """
+    Publica vários relatórios de uma vez. Cada item é um dict com 'base' (estrutura extraída),
+    'dataset_id', 'paciente', 'carb_ratio', 'correction_table' e, opcionalmente, 'formato'
+    ('html', o padrão, ou 'compacto'). Devolve, por arquivo, 'publicado' ou 'inalterado',
+    mais se o index foi reescrito.
+    """
+    with _trava_publicacao:
+        os.makedirs(diretorio, exist_ok=True)
+        manifesto = carregar_manifesto(diretorio)
+        situacao = {}
+        for item in itens:
+            formato = item.get('formato') or 'html'
+            if formato not in FORMATOS_PUBLICACAO:
+                raise ValueError(f"Formato de publicação desconhecido: {formato!r}. Opções: {', '.join(FORMATOS_PUBLICACAO)}")
+            arquivo = nome_arquivo_relatorio(item['paciente'], item['base']['periodo'])
+            if formato == 'compacto':
+                arquivo = arquivo.removesuffix('.html') + '.json.gz'
+                with app.app_context():
+                    escrever_se_mudou(os.path.join(diretorio, ARQUIVO_CASCA), registro_templates.renderizar('casca'))
+            impressao = impressao_relatorio(item['dataset_id'], item['paciente'], item['carb_ratio'], item['correction_table'], formato)
+            anterior = manifesto["relatorios"].get(arquivo, {})
+            if not forcar and anterior.get("impressao") == impressao and os.path.exists(os.path.join(diretorio, arquivo)):
+                situacao[arquivo] = 'inalterado'
+                continue
+            dados = montar_dados(item['base'], item['paciente'], item['carb_ratio'], item['correction_table'], item['dataset_id'])
+            if formato == 'compacto':
+                serializado = json.dumps(dados_compactos(dados, app.config['GRAFICO_MAX_PONTOS']), ensure_ascii=False, separators=(',', ':'))
+                conteudo = gzip.compress(serializado.encode('utf-8'), compresslevel=9, mtime=0)  # mtime fixo: saída determinística
+            else:
+                with app.app_context():
+                    conteudo = registro_templates.renderizar('relatorio', **contexto_relatorio(dados, item['carb_ratio'], item['correction_table'], publicado=True))
+            escrever_atomico(os.path.join(diretorio, arquivo), conteudo)
+            manifesto["relatorios"][arquivo] = {
+                "paciente": item['paciente'], "periodo": dados['periodo'], "dataset_id": item['dataset_id'], "impressao": impressao, "formato": formato,
+                "parametros": {"carb_ratio": item['carb_ratio'], "correction_table": dict(item['correction_table'])},
+                "publicado_em": datetime.datetime.now().isoformat(timespec='seconds'),
+            }
+            situacao[arquivo] = 'publicado'
+        if any(v == 'publicado' for v in situacao.values()):
+            escrever_atomico(os.path.join(diretorio, ARQUIVO_MANIFESTO), json.dumps(manifesto, ensure_ascii=False, indent=2))
+        index_alterado = gerar_index(manifesto, caminho_index, diretorio)
+    return {"relatorios": situacao, "index_alterado": index_alterado}
+
+def impressao_pdf(dataset_id, patient_name, carb_ratio, correction_table):
+    return impressao_relatorio(dataset_id, patient_name, carb_ratio, correction_table, f"pdf-v{VERSAO_PDF}")
+
+cache_pdfs = CacheFragmentos(int(os.environ.get('CACHE_PDFS_MAX_MB', 64)) * 1024 * 1024)
+
+# --- Fila de Processamento em Segundo Plano ---
+# POST /jobs aceita o upload e devolve um job_id na hora. A extração (sempre em streaming,
+# para relatar os dias já processados), as doses e a gravação no banco rodam num pool de
+# threads; GET /jobs/<id> informa o progresso e GET /jobs/<id>/report entrega o relatório.
+class FilaTarefas:
+    """Tarefas de processamento de uploads, mantidas em memória (as mais antigas concluídas são descartadas)."""
+    def __init__(self, max_trabalhadores=2, max_tarefas=100):
+        self.max_tarefas = max_tarefas
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_trabalhadores, thread_name_prefix='tarefa')
+        self._tarefas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def enviar(self, conteudo, nome_arquivo, patient_name, carb_ratio, correction_table):
+        """Enfileira o processamento dos bytes de um .mhtml e devolve o id da tarefa."""
+        tarefa = {"id": uuid.uuid4().hex, "situacao": "na_fila", "arquivo": nome_arquivo, "bytes": len(conteudo), "bytes_lidos": 0,
+                  "dias_processados": 0, "erro": None, "dados": None, "criada_em": time.time(), "concluida_em": None,
+                  "parametros": {"patient_name": patient_name, "carb_ratio": carb_ratio, "correction_table": correction_table}}
+        with self._trava:
+            self._tarefas[tarefa["id"]] = tarefa
+            concluidas = [chave for chave, t in self._tarefas.items() if t["concluida_em"] is not None]
+            for chave in concluidas[:max(0, len(self._tarefas) - self.max_tarefas)]:
+                del self._tarefas[chave]
+        self._pool.submit(self._executar, tarefa, conteudo)
+        return tarefa["id"]
+
+    def _executar(self, tarefa, conteudo):
+        tarefa["situacao"] = "processando"
+        tarefa["medicao"] = medicao = Medicao()
+        medicao_atual.set(medicao)  # Cada thread do pool tem o seu próprio contexto
+        stream, parametros = io.BytesIO(conteudo), tarefa["parametros"]
+        def progresso(dias):
+            tarefa["dias_processados"], tarefa["bytes_lidos"] = dias, stream.tell()
+        try:
+            dados, erro = parse_mhtml(stream, parametros["patient_name"], parametros["carb_ratio"], parametros["correction_table"],
+                                      streaming=True, cache=cache_relatorios, progresso=progresso)
+            if not erro and (banco := banco_glicemias()) is not None:
+                banco.importar(dados, parametros["carb_ratio"], parametros["correction_table"])
+        except Exception as e:  # parse_mhtml já trata os erros do arquivo; aqui só sobra o inesperado (banco, etc.)
+            dados, erro = None, f"Ocorreu um erro ao processar o arquivo. Detalhe: {e}"
+        if dados:
+            tarefa["dias_processados"] = dados["total_dias"]
+        tarefa.update(dados=dados, erro=erro, bytes_lidos=tarefa["bytes"], situacao="erro" if erro else "concluida", concluida_em=time.time())
+        log_requisicoes.info(json.dumps({"evento": "tarefa", "job_id": tarefa["id"], "situacao": tarefa["situacao"], **medicao.resumo()}, ensure_ascii=False))
+
+    def obter(self, tarefa_id):
+        with self._trava:
+            return self._tarefas.get(tarefa_id)
+
+    @staticmethod
+    def resumo(tarefa):
+        """Estado público da tarefa (sem os dados), para o endpoint de progresso."""
+        fim = tarefa["concluida_em"] or time.time()
+        return {"job_id": tarefa["id"], "situacao": tarefa["situacao"], "arquivo": tarefa["arquivo"], "dias_processados": tarefa["dias_processados"],
+                "progresso": round(100 * tarefa["bytes_lidos"] / tarefa["bytes"]) if tarefa["bytes"] else 100,
+                "erro": tarefa["erro"], "tempo_ms": round((fim - tarefa["criada_em"]) * 1000, 1),
+                "etapas_ms": tarefa["medicao"].resumo()["etapas_ms"] if tarefa.get("medicao") else {}}
+
+fila_tarefas = FilaTarefas(app.config['TAREFAS_MAX_TRABALHADORES'])
+
+# --- Medição de cada requisição (log estruturado e perfil opcional) ---
+@app.before_request
+def iniciar_medicao():
+    g.medicao = Medicao()
+    g.token_medicao = medicao_atual.set(g.medicao)
+    if app.config['PERFIL_HABILITADO'] and request.args.get('perfil') == '1':
+        g.perfil = cProfile.Profile()
+        g.perfil.enable()
+
+@app.after_request
+def registrar_medicao(response):
+    if (perfil := g.pop('perfil', None)) is not None:
+        perfil.disable()
+        os.makedirs(app.config['DIRETORIO_PERFIS'], exist_ok=True)
+        caminho = os.path.join(app.config['DIRETORIO_PERFIS'], f"{datetime.datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint}.prof")
+        perfil.dump_stats(caminho)
+        response.headers['X-Perfil'] = caminho
+    if (medicao := g.get('medicao')) is not None:
+        rota = request.endpoint or 'desconhecida'
+        resumo = medicao.resumo()
+        metricas.observar('analisador_requisicao_segundos', (('rota', rota),), resumo["duracao_ms"] / 1000)
+        metricas.incrementar('analisador_requisicoes_total', (('rota', rota), ('metodo', request.method), ('status', str(response.status_code))))
+        if rota != 'metrics':
+            log_requisicoes.info(json.dumps({"evento": "requisicao", "metodo": request.method, "rota": rota, "status": response.status_code, **resumo}, ensure_ascii=False))
+    return response
+
+@app.teardown_request
+def encerrar_medicao(exc=None):
+    if (perfil := g.pop('perfil', None)) is not None:  # Requisição que terminou em exceção
+        perfil.disable()
+    if (token := g.pop('token_medicao', None)) is not None:
+        medicao_atual.reset(token)
+
+# --- Rota de métricas (formato texto do Prometheus) ---
+@app.route('/metrics')
+def metrics():
+    return metricas.exportar(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+# --- Rota Principal para GERAR o Relatório ---
+@app.route('/', methods=['GET', 'POST'])
+def home():
+    if request.method == 'POST':
+        if 'report_file' not in request.files or not request.files['report_file'].filename:
+            flash('Nenhum arquivo selecionado.', 'error')
+            return redirect(request.url)
+        file = request.files['report_file']
+        patient_name = request.form.get('patient_name') or "Utilizador"
+        carb_ratio = float(request.form.get('carb_ratio', 15))
+        correction_table = {key.replace('correction_', ''): val for key, val in request.form.items() if key.startswith('correction_')}
+        try:
+            compilar_tabela_correcao(correction_table)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(request.url)
+        if file.filename.endswith('.mhtml'):
+            dados, erro = parse_mhtml(file, patient_name, carb_ratio, correction_table, streaming=app.config['MHTML_STREAMING'], extrator=app.config['EXTRATOR_HTML'], cache=cache_relatorios)
+            if erro:
+                flash(erro, 'error')
+                return redirect(request.url)
+            if (banco := banco_glicemias()) is not None:
+                banco.importar(dados, carb_ratio, correction_table)
+            return registro_templates.renderizar('relatorio', **contexto_relatorio(dados, carb_ratio, correction_table))
+        else:
+            flash('Formato de arquivo inválido. Por favor, envie um arquivo .mhtml.', 'error')
+            return redirect(request.url)
+    banco = banco_glicemias()
+    return registro_templates.renderizar('upload', correction_table=get_default_correction_table(), pacientes_banco=banco.pacientes() if banco else [])
+
+# --- Rotas da fila de processamento em segundo plano ---
+@app.route('/jobs', methods=['POST'])
+def enviar_tarefa():
+    """Aceita o upload (mesmos campos da página inicial) e devolve o job_id imediatamente (202)."""
+    file = request.files.get('report_file')
+    if not file or not file.filename:
+        return jsonify({'status': 'error', 'message': 'Nenhum arquivo selecionado.'}), 400
+    if not file.filename.endswith('.mhtml'):
+        return jsonify({'status': 'error', 'message': 'Formato de arquivo inválido. Por favor, envie um arquivo .mhtml.'}), 400
+    try:
+        carb_ratio = float(request.form.get('carb_ratio', 15))
+        correction_table = {key.replace('correction_', ''): val for key, val in request.form.items() if key.startswith('correction_')} or get_default_correction_table()
+        compilar_tabela_correcao(correction_table)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+    tarefa_id = fila_tarefas.enviar(file.read(), file.filename, request.form.get('patient_name') or "Utilizador", carb_ratio, correction_table)
+    return jsonify({'status': 'success', 'job_id': tarefa_id, 'status_url': url_for('situacao_tarefa', tarefa_id=tarefa_id),
+                    'report_url': url_for('relatorio_tarefa', tarefa_id=tarefa_id)}), 202
+
+@app.route('/jobs/<tarefa_id>')
+def situacao_tarefa(tarefa_id):
+    if (tarefa := fila_tarefas.obter(tarefa_id)) is None:
+        return jsonify({'status': 'error', 'message': 'Tarefa não encontrada.'}), 404
+    return jsonify({'status': 'success', **FilaTarefas.resumo(tarefa)})
+
+@app.route('/jobs/<tarefa_id>/report')
+def relatorio_tarefa(tarefa_id):
+    if (tarefa := fila_tarefas.obter(tarefa_id)) is None:
+        flash('Tarefa não encontrada. Carregue o arquivo novamente.', 'error')
+        return redirect(url_for('home'))
+    if tarefa["situacao"] == "erro":
+        flash(tarefa["erro"], 'error')
+        return redirect(url_for('home'))
+    if tarefa["situacao"] != "concluida":
+        return jsonify({'status': 'error', 'message': 'O relatório ainda está sendo processado.', **FilaTarefas.resumo(tarefa)}), 409
+    parametros = tarefa["parametros"]
+    return registro_templates.renderizar('relatorio', **contexto_relatorio(tarefa["dados"], parametros["carb_ratio"], parametros["correction_table"]))
+
+# --- Rota para GERAR o Relatório de um intervalo a partir do banco ---
+@app.route('/historico')
+def historico():
+    """Relatório de 'paciente' entre as datas 'inicio' e 'fim' (ISO, opcionais), montado com as leituras do banco."""
+    if (banco := banco_glicemias()) is None:
+        flash('O banco de leituras não está configurado (BANCO_GLICEMIAS).', 'error')
+        return redirect(url_for('home'))
+    patient_name = request.args.get('paciente') or "Utilizador"
+    try:
+        inicio = datetime.date.fromisoformat(request.args['inicio']) if request.args.get('inicio') else None
+        fim = datetime.date.fromisoformat(request.args['fim']) if request.args.get('fim') else None
+        carb_ratio = float(request.args.get('carb_ratio', 15))
+        correction_table = {key.replace('correction_', ''): val for key, val in request.args.items() if key.startswith('correction_')} or get_default_correction_table()
+        compilar_tabela_correcao(correction_table)
+    except ValueError as e:
+        flash(f'Parâmetros inválidos: {e}', 'error')
+        return redirect(url_for('home'))
+    base = banco.carregar_base(patient_name, inicio, fim)
+    if not base['dias']:
+        flash(f'Nenhum dia registrado para {patient_name} no intervalo escolhido.', 'error')
+        return redirect(url_for('home'))
+    # O id do conjunto é o hash do conteúdo consultado: /recalculate e /chart-data o encontram no cache
+    dataset_id = f"v{VERSAO_EXTRACAO}-banco-" + hashlib.sha256(json.dumps(base, ensure_ascii=False).encode('utf-8')).hexdigest()
+    cache_relatorios.guardar(dataset_id, base)
+    dados = montar_dados(base, patient_name, carb_ratio, correction_table, dataset_id)
+    return registro_templates.renderizar('relatorio', **contexto_relatorio(dados, carb_ratio, correction_table))
+
+# --- Painel da coorte (agregados semanais do banco) ---
+@app.route('/coorte')
+def coorte():
+    """Tempo no alvo, glicemia média, HbA1c estimada e insulina de cada paciente, por semana ('semanas' até 'fim'); formato=json devolve os dados."""
+    em_json = request.args.get('formato') == 'json'
+    if (banco := banco_glicemias()) is None:
+        if em_json:
+            return jsonify({'status': 'error', 'message': 'O banco de leituras não está configurado (BANCO_GLICEMIAS).'}), 400
+        flash('O banco de leituras não está configurado (BANCO_GLICEMIAS).', 'error')
+        return redirect(url_for('home'))
+    try:
+        semanas = int(request.args.get('semanas') or 8)
+        fim = datetime.date.fromisoformat(request.args['fim']) if request.args.get('fim') else None
+        if not 1 <= semanas <= 104:
+            raise ValueError('o número de semanas deve estar entre 1 e 104')
+    except ValueError as e:
+        if em_json:
+            return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+        flash(f'Parâmetros inválidos: {e}', 'error')
+        return redirect(url_for('home'))
+    painel = banco.coorte(semanas, fim)
+    if em_json:
+        return jsonify({'status': 'success', **painel})
+    return registro_templates.renderizar('coorte', painel=painel, semanas=semanas, fim=request.args.get('fim') or '')
+
+# --- Rota para RECALCULAR as doses sem novo upload ---
+@app.route('/recalculate', methods=['POST'])
+def recalculate():
+    """Recalcula as doses de um relatório já extraído (em cache) com novos parâmetros."""
+    inicio = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'dataset_id' not in data:
+        return jsonify({'status': 'error', 'message': 'Dados inválidos.'}), 400
+    base = cache_relatorios.obter(data['dataset_id'])
+    if base is None:
+        return jsonify({'status': 'error', 'message': 'Relatório não encontrado no cache. Carregue o arquivo novamente.'}), 404
+    try:
+        carb_ratio = float(data.get('carb_ratio', 15))
+        correction_table = data.get('correction_table') or get_default_correction_table()
+        dias, serie = calcular_doses(base, carb_ratio, correction_table)
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+    return jsonify({
+        'status': 'success',
+        'dias': [{"data": dia['data'], "total_insulina": dia['total_insulina'],
+                  "glicemias": [{"hora": serie.hora(i), "dose_sugerida": serie.doses[i], "calculo": serie.calculo(i)} for i in range(*serie.intervalo_dia(d))]}
+                 for d, dia in enumerate(dias)],
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 1),
+    })
+
+# --- Rota com os pontos do gráfico em resolução completa ---
+@app.route('/chart-data', methods=['POST'])
+def chart_data():
+    """Leituras de uma janela de tempo ('inicio'/'fim', ISO) de um relatório em cache, reduzidas só acima de 'max_pontos'."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'dataset_id' not in data:
+        return jsonify({'status': 'error', 'message': 'Dados inválidos.'}), 400
+    base = cache_relatorios.obter(data['dataset_id'])
+    if base is None:
+        return jsonify({'status': 'error', 'message': 'Relatório não encontrado no cache. Carregue o arquivo novamente.'}), 404
+    try:
+        inicio = minutos_epoca(data['inicio']) if data.get('inicio') else None
+        fim = minutos_epoca(data['fim'], fim=True) if data.get('fim') else None
+        max_pontos = int(data['max_pontos']) if data.get('max_pontos') is not None else app.config['GRAFICO_MAX_PONTOS']
+        if max_pontos < 3:
+            raise ValueError('max_pontos deve ser pelo menos 3')
+        if inicio is not None and fim is not None and inicio > fim:
+            raise ValueError('inicio depois de fim')
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+    serie = SerieGlicemias.de_dias(base['dias'])
+    janela = [i for i, t in enumerate(serie.timestamps) if (inicio is None or t >= inicio) and (fim is None or t <= fim)]
+    reduzidos = reduzir_lttb([serie.valores[i] for i in janela], max_pontos, [serie.timestamps[i] for i in janela])
+    return jsonify({'status': 'success', **dados_grafico(serie, [dia['data'] for dia in base['dias']], [janela[i] for i in reduzidos]), 'total': len(janela)})
+
+# --- Rota para IMPORTAR vários relatórios ---
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Importa vários .mhtml (campo 'report_files', aceita também .zip) e devolve o resumo do lote em JSON."""
+    paciente_padrao = request.form.get('patient_name') or "Utilizador"
+    try:
+        carb_ratio = float(request.form.get('carb_ratio', 15))
+        correction_table = {key.replace('correction_', ''): val for key, val in request.form.items() if key.startswith('correction_')} or get_default_correction_table()
+        compilar_tabela_correcao(correction_table)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+    arquivos, ignorados = [], []
+    for file in request.files.getlist('report_files'):
+        if file.filename.lower().endswith('.zip'):
+            try:
+                arquivos.extend(arquivos_do_zip(file.stream, paciente_padrao))
+            except zipfile.BadZipFile:
+                ignorados.append(file.filename)
+        elif file.filename.lower().endswith('.mhtml'):
+            arquivos.append((file.filename, paciente_do_caminho(file.filename, paciente_padrao), file.read()))
+        elif file.filename:
+            ignorados.append(file.filename)
+    if not arquivos:
+        return jsonify({'status': 'error', 'message': 'Nenhum arquivo .mhtml enviado.', 'ignorados': ignorados}), 400
+    resultado = importar_lote(arquivos, carb_ratio, correction_table, extrator=app.config['EXTRATOR_HTML'], cache=cache_relatorios,
+                              pool=pool_lote(app.config['LOTE_MAX_PROCESSOS']))
+    if (banco := banco_glicemias()) is not None:
+        for item in resultado['pacientes'].values():
+            banco.importar(item['dados'], carb_ratio, correction_table)
+    return jsonify({
+        'status': 'success',
+        'arquivos': resultado['arquivos'],
+        'pacientes': [resumo_paciente_lote(p, item) for p, item in resultado['pacientes'].items()],
+        'ignorados': ignorados,
+        'tempo_total_ms': resultado['tempo_total_ms'],
+    })
+
+# --- Rota para PUBLICAR o Relatório (renderizado no servidor) ---
+@app.route('/publish', methods=['POST'])
+def publish():
+    """Publica em relatorios/ um relatório em cache, renderizado no servidor, e atualiza o index.html."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'dataset_id' not in data:
+        return jsonify({'status': 'error', 'message': 'Dados inválidos.'}), 400
+    base = cache_relatorios.obter(data['dataset_id'])
+    if base is None:
+        return jsonify({'status': 'error', 'message': 'Relatório não encontrado no cache. Carregue o arquivo novamente.'}), 404
+    try:
+        item = {"base": base, "dataset_id": data['dataset_id'], "paciente": data.get('patient_name') or "Utilizador",
+                "carb_ratio": float(data.get('carb_ratio', 15)), "correction_table": data.get('correction_table') or get_default_correction_table(),
+                "formato": data.get('formato') or app.config['FORMATO_PUBLICACAO']}
+        resultado = publicar_relatorios([item], app.config['DIRETORIO_RELATORIOS'], app.config['ARQUIVO_INDEX'])
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+    except OSError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    arquivo, situacao = next(iter(resultado['relatorios'].items()))
+    filepath = os.path.join(app.config['DIRETORIO_RELATORIOS'], arquivo)
+    mensagem = f'Relatório publicado em: {filepath}' if situacao == 'publicado' else f'Relatório já estava atualizado em: {filepath}'
+    return jsonify({'status': 'success', 'message': mensagem, 'arquivo': filepath, 'situacao': situacao, 'index_alterado': resultado['index_alterado']})
+
+# --- Rota para EXPORTAR o Relatório em PDF (gerado no servidor) ---
+@app.route('/export-pdf', methods=['POST'])
+def export_pdf():
+    """PDF vetorial de um relatório em cache, com uma página por dia; os mesmos parâmetros devolvem os mesmos bytes (ETag)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'dataset_id' not in data:
+        return jsonify({'status': 'error', 'message': 'Dados inválidos.'}), 400
+    base = cache_relatorios.obter(data['dataset_id'])
+    if base is None:
+        return jsonify({'status': 'error', 'message': 'Relatório não encontrado no cache. Carregue o arquivo novamente.'}), 404
+    try:
+        patient_name = data.get('patient_name') or "Utilizador"
+        carb_ratio = float(data.get('carb_ratio', 15))
+        correction_table = data.get('correction_table') or get_default_correction_table()
+        impressao = impressao_pdf(data['dataset_id'], patient_name, carb_ratio, correction_table)
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': f'Parâmetros inválidos: {e}'}), 400
+    if (conteudo := cache_pdfs.obter(impressao)) is None:
+        conteudo = gerar_pdf(montar_dados(base, patient_name, carb_ratio, correction_table, data['dataset_id']), app.config['GRAFICO_MAX_PONTOS'])
+        cache_pdfs.guardar(impressao, conteudo)
+    resposta = app.response_class(conteudo, mimetype='application/pdf')
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome_arquivo_pdf(patient_name, base["periodo"])}"'
+    resposta.set_etag(impressao)
+    return resposta
+
+# --- Rota para SALVAR o Relatório ---
+@app.route('/save-report', methods=['POST'])
+def save_report():
+    try:
+        data = request.get_json()
+        if not data or 'filename' not in data or 'html_content' not in data:
+            return jsonify({'status': 'error', 'message': 'Dados inválidos.'}), 400
+        filename = data['filename']
+        content = data['html_content']
+        output_dir = 'relatorios'
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        filepath = os.path.join(output_dir, filename)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return jsonify({'status': 'success', 'message': f'Relatório salvo com sucesso em: {filepath}'})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# --- Templates HTML ---
+UPLOAD_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Analisador de Glicemia</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    <style> body { font-family: 'Inter', sans-serif; } </style>
+</head>
+<body class="bg-gray-100 flex items-center justify-center min-h-screen py-12">
+    <div class="max-w-3xl w-full bg-white p-8 rounded-lg shadow-lg">
+        <div class="text-center mb-8">
+            <h1 class="text-3xl font-bold text-blue-700 mb-2">Analisador de Glicemia e Insulina</h1>
+            <p class="text-gray-600">Configure os parâmetros de cálculo e carregue seu relatório (.mhtml).</p>
+        </div>
+        {% with messages = get_flashed_messages(with_categories=true) %}
+            {% if messages %}{% for category, message in messages %}
+                <div class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded relative mb-4" role="alert">
+                    <strong class="font-bold">Erro:</strong>
+                    <span class="block sm:inline">{{ message }}</span>
+                </div>
+            {% endfor %}{% endif %}
+        {% endwith %}
+        <form action="/" method="post" enctype="multipart/form-data" class="space-y-8">
+            <fieldset class="border rounded-lg p-4">
+                <legend class="text-lg font-medium text-gray-800 px-2">Parâmetros de Cálculo</legend>
+                <div class="grid grid-cols-1 md:grid-cols-2 gap-6 mt-4">
+                    <div>
+                        <label for="patient_name" class="block text-sm font-medium text-gray-700">Nome do Paciente</label>
+                        <input type="text" name="patient_name" id="patient_name" class="mt-1 block w-full px-3 py-2 bg-white border border-gray-300 rounded-md shadow-sm" placeholder="Opcional">
+                    </div>
+                    <div>
+                        <label for="carb_ratio" class="block text-sm font-medium text-gray-700">Relação Insulina/Carboidrato (1 UI para Xg)</label>
+                        <input type="number" name="carb_ratio" id="carb_ratio" value="15" class="mt-1 block w-full px-3 py-2 bg-white border border-gray-300 rounded-md shadow-sm">
+                    </div>
+                </div>
+                <div class="mt-6">
+                    <h3 class="text-md font-medium text-gray-800 mb-2">Fator de Correção (UI adicional)</h3>
+                    <div class="grid grid-cols-2 sm:grid-cols-4 gap-4">
+                        {% for range, dose in correction_table.items() %}
+                        <div>
+                            <label for="correction_{{range}}" class="block text-xs font-medium text-gray-500">GC {{range}}</label>
+                            <input type="number" name="correction_{{range}}" id="correction_{{range}}" value="{{dose}}" class="mt-1 block w-full px-2 py-1.5 bg-white border border-gray-300 rounded-md shadow-sm">
+                        </div>
+                        {% endfor %}
+                    </div>
+                </div>
+            </fieldset>
+            <fieldset class="border rounded-lg p-4">
+                <legend class="text-lg font-medium text-gray-800 px-2">Arquivo do Relatório</legend>
+                <label for="report_file" class="relative block w-full mt-4 text-sm text-gray-700 bg-gray-50 border-2 border-dashed border-gray-300 rounded-lg cursor-pointer hover:bg-gray-100 p-6 text-center">
+                    <span id="file-upload-text" class="text-blue-600 font-semibold">Clique para carregar ou arraste o arquivo .mhtml aqui</span>
+                    <input type="file" name="report_file" id="report_file" class="hidden" accept=".mhtml" required>
+                </label>
+            </fieldset>
+            <button type="submit" id="analisar-btn" class="w-full bg-blue-600 text-white font-bold py-3 px-4 rounded-lg hover:bg-blue-700">Analisar Relatório</button>
+        </form>
+        {% if pacientes_banco %}
+        <form action="/historico" method="get" class="mt-8">
+            <fieldset class="border rounded-lg p-4">
+                <legend class="text-lg font-medium text-gray-800 px-2">Relatório a partir do Histórico</legend>
+                <div class="grid grid-cols-1 md:grid-cols-4 gap-4 mt-4">
+                    <div class="md:col-span-2">
+                        <label for="historico_paciente" class="block text-sm font-medium text-gray-700">Paciente</label>
+                        <select name="paciente" id="historico_paciente" class="mt-1 block w-full px-3 py-2 bg-white border border-gray-300 rounded-md shadow-sm">
+                            {% for paciente in pacientes_banco %}
+                            <option value="{{ paciente.nome }}">{{ paciente.nome }} ({{ paciente.dias }} dias, {{ paciente.inicio }} a {{ paciente.fim }})</option>
+                            {% endfor %}
+                        </select>
+                    </div>
+                    <div>
+                        <label for="historico_inicio" class="block text-sm font-medium text-gray-700">De</label>
+                        <input type="date" name="inicio" id="historico_inicio" class="mt-1 block w-full px-3 py-2 bg-white border border-gray-300 rounded-md shadow-sm">
+                    </div>
+                    <div>
+                        <label for="historico_fim" class="block text-sm font-medium text-gray-700">Até</label>
+                        <input type="date" name="fim" id="historico_fim" class="mt-1 block w-full px-3 py-2 bg-white border border-gray-300 rounded-md shadow-sm">
+                    </div>
+                </div>
+                <input type="hidden" name="carb_ratio" id="historico_carb_ratio" value="15">
+                <button type="submit" class="mt-4 w-full bg-gray-700 text-white font-bold py-3 px-4 rounded-lg hover:bg-gray-800">Gerar Relatório do Período</button>
+                <a href="/coorte" class="mt-3 block text-center text-sm text-blue-600 hover:text-blue-800 hover:underline">Painel da Coorte (resumo semanal de todos os pacientes)</a>
+            </fieldset>
+        </form>
+        {% endif %}
+    </div>
+    <script>
+        const historicoCarbRatio = document.getElementById('historico_carb_ratio');
+        if (historicoCarbRatio) {
+            document.getElementById('carb_ratio').addEventListener('input', function() { historicoCarbRatio.value = this.value; });
+        }
+        // Envia o upload para a fila (/jobs) e acompanha o progresso, sem prender a requisição
+        document.querySelector('form[action="/"]').addEventListener('submit', async function(event) {
+            event.preventDefault();
+            const botao = document.getElementById('analisar-btn');
+            botao.disabled = true;
+            botao.textContent = 'Enviando...';
+            try {
+                const response = await fetch('/jobs', { method: 'POST', body: new FormData(this) });
+                const tarefa = await response.json();
+                if (!response.ok) throw new Error(tarefa.message);
+                while (true) {
+                    const situacao = await (await fetch(tarefa.status_url)).json();
+                    if (situacao.situacao === 'concluida' || situacao.situacao === 'erro') break;
+                    botao.textContent = `Processando... ${situacao.dias_processados} dias (${situacao.progresso}%)`;
+                    await new Promise(resolve => setTimeout(resolve, 500));
+                }
+                window.location.href = tarefa.report_url;
+            } catch (error) {
+                alert(`Erro ao enviar o relatório: ${error.message}`);
+                botao.disabled = false;
+                botao.textContent = 'Analisar Relatório';
+            }
+        });
+        document.getElementById('report_file').addEventListener('change', function() {
+            const textEl = document.getElementById('file-upload-text');
+            if (this.files && this.files.length > 0) {
+                textEl.textContent = `Arquivo: ${this.files[0].name}`;
+                textEl.classList.replace('text-blue-600', 'text-green-600');
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+
+REPORT_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Relatório de Controle Glicêmico</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <script src="https://cdnjs.cloudflare.com/ajax/libs/html2pdf.js/0.10.1/html2pdf.bundle.min.js"></script>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    <style> 
+        body { font-family: 'Inter', sans-serif; } 
+        .pdf-page {
+            page-break-before: always;
+            page-break-inside: avoid;
+        }
+        @media print { 
+            html, body { 
+                -webkit-print-color-adjust: exact; 
+                print-color-adjust: exact; 
+                font-size: 8pt;
+            } 
+            .no-print { display: none !important; }
+            #report-content > .pdf-page:first-of-type {
+                page-break-before: auto;
+            }
+            .pdf-day-container {
+                display: flex !important;
+                flex-direction: row !important;
+                gap: 0.5rem !important;
+            }
+            .pdf-day-glicemias { flex: 0 0 45%; }
+            .pdf-day-refeicoes { flex: 0 0 55%; }
+            h1, h2, h3, h4, p, li, span, div {
+                font-size: inherit !important;
+                padding: 0.1rem !important;
+                margin: 0 !important;
+                line-height: 1.1 !important;
+            }
+            ul { padding-left: 1rem !important; }
+            .shadow-md { box-shadow: none !important; border: 1px solid #eee; }
+            .rounded-lg { border-radius: 4px !important; }
+        }
+    </style>
+</head>
+<body class="bg-gray-100 text-gray-800">
+    <div id="report-content" class="container mx-auto p-4 sm:p-6 md:p-8">
+        <header class="mb-8 flex flex-wrap justify-between items-center gap-4 no-print">
+            <div>
+                <h1 class="text-3xl md:text-4xl font-bold text-blue-700">Relatório de Controle Glicêmico</h1>
+                <p class="text-md text-gray-600">Paciente: {{ dados.paciente }} | Período: {{ dados.periodo }}</p>
+            </div>
+            <div class="flex gap-2">
+                {% if not publicado %}
+                <a href="/" class="bg-gray-600 text-white font-bold py-2 px-4 rounded-lg hover:bg-gray-700">Carregar Novo</a>
+                <button onclick="saveReportToServer(this)" class="bg-green-600 text-white font-bold py-2 px-4 rounded-lg hover:bg-green-700">Salvar HTML no Servidor</button>
+                {% endif %}
+                <button onclick="exportToPDF(this)" class="bg-blue-600 text-white font-bold py-2 px-4 rounded-lg hover:bg-blue-700">Exportar para PDF</button>
+            </div>
+        </header>
+
+        {% if dados.dataset_id and not publicado %}
+        <section id="painel-recalculo" class="mb-8 no-print">
+            <h2 class="text-2xl font-semibold mb-4 text-gray-700">Parâmetros de Cálculo</h2>
+            <div class="bg-white p-6 rounded-lg shadow-md">
+                <div class="grid grid-cols-2 sm:grid-cols-3 lg:grid-cols-9 gap-4">
+                    <div>
+                        <label class="block text-xs font-medium text-gray-500">1 UI para Xg</label>
+                        <input type="number" data-param="carb_ratio" value="{{ parametros.carb_ratio }}" class="mt-1 block w-full px-2 py-1.5 bg-white border border-gray-300 rounded-md shadow-sm">
+                    </div>
+                    {% for range, dose in parametros.correction_table.items() %}
+                    <div>
+                        <label class="block text-xs font-medium text-gray-500">GC {{range}}</label>
+                        <input type="number" data-correcao="{{range}}" value="{{dose}}" class="mt-1 block w-full px-2 py-1.5 bg-white border border-gray-300 rounded-md shadow-sm">
+                    </div>
+                    {% endfor %}
+                </div>
+                <p id="recalculo-status" class="text-xs text-gray-500 mt-2">Altere os parâmetros para recalcular as doses sem carregar o arquivo novamente.</p>
+            </div>
+        </section>
+        {% endif %}
+
+        <div class="pdf-page">
+            <div id="pdf-header" class="hidden">
+                 <h1 class="text-3xl md:text-4xl font-bold text-blue-700">Relatório de Controle Glicêmico</h1>
+                <p class="text-md text-gray-600 mb-8">Paciente: {{ dados.paciente }} | Período: {{ dados.periodo }}</p>
+            </div>
+            <section class="mb-8">
+                <h2 class="text-2xl font-semibold mb-4 text-gray-700">Resumo Geral</h2>
+                <div class="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-5 gap-6">
+                    <div class="bg-white p-6 rounded-lg shadow-md" title="A média de todas as medições de glicose no período."><h3 class="font-semibold text-gray-500">Glicemia Média</h3><p class="text-4xl font-bold text-blue-600">{{ analise.glicemia_media }} <span class="text-lg">mg/dL</span></p></div>
+                    <div class="bg-white p-6 rounded-lg shadow-md" title="Estimativa da Hemoglobina Glicada (A1c) baseada na glicemia média. Fórmula: (Glicemia Média + 46.7) / 28.7."><h3 class="font-semibold text-gray-500">HbA1c Estimada</h3><p class="text-4xl font-bold text-green-600">{{ analise.hba1c_estimada }}<span class="text-lg">%</span></p><p class="text-sm text-gray-500" title="Glucose Management Indicator: 3.31 + 0.02392 × Glicemia Média.">GMI: {{ analise.gmi }}%</p></div>
+                    <div class="bg-white p-6 rounded-lg shadow-md" title="Desvio Padrão (DP). Um valor mais baixo indica maior estabilidade glicêmica."><h3 class="font-semibold text-gray-500">Variabilidade (DP)</h3><p class="text-4xl font-bold text-purple-600">{{ analise.desvio_padrao }}</p><p class="text-sm text-gray-500" title="Coeficiente de Variação (DP / Média). Valores até 36% indicam glicemia estável.">CV: {{ analise.cv }}%</p></div>
+                    <div class="bg-white p-6 rounded-lg shadow-md" title="O valor mais alto e o mais baixo registrados."><h3 class="font-semibold text-gray-500">Medições Extremas</h3><div class="flex items-baseline"><p class="text-2xl font-bold text-red-500">{{ analise.glicemia_max }}</p><span class="mx-2 text-gray-400">/</span><p class="text-2xl font-bold text-sky-500">{{ analise.glicemia_min }}</p><span class="text-sm ml-1">mg/dL</span></div></div>
+                    <div class="bg-white p-6 rounded-lg shadow-md" title="O número total de dias com registros no relatório."><h3 class="font-semibold text-gray-500">Total de Dias</h3><p class="text-4xl font-bold text-gray-600">{{ dados.total_dias }}</p></div>
+                </div>
+            </section>
+             <section class="mb-8">
+                 <h2 class="text-2xl font-semibold mb-4 text-gray-700">Glicemia Alvo</h2>
+                <div class="bg-white p-6 rounded-lg shadow-md">
+                    <div class="w-full bg-gray-200 rounded-full h-8 flex overflow-hidden">
+                        <div class="bg-sky-500 h-8 flex items-center justify-center text-white font-bold" style="width: {{ analise.tempo_no_alvo.abaixo }}%" title="Abaixo do Alvo">{{ analise.tempo_no_alvo.abaixo }}%</div>
+                        <div class="bg-green-500 h-8 flex items-center justify-center text-white font-bold" style="width: {{ analise.tempo_no_alvo.no_alvo }}%" title="No Alvo">{{ analise.tempo_no_alvo.no_alvo }}%</div>
+                        <div class="bg-red-500 h-8 flex items-center justify-center text-white font-bold" style="width: {{ analise.tempo_no_alvo.acima }}%" title="Acima do Alvo">{{ analise.tempo_no_alvo.acima }}%</div>
+                    </div>
+                    <div class="flex justify-between mt-2 text-sm text-gray-600">
+                        <span><span class="inline-block w-3 h-3 bg-sky-500 rounded-full mr-1"></span>&lt;70</span>
+                        <span><span class="inline-block w-3 h-3 bg-green-500 rounded-full mr-1"></span>70-180</span>
+                        <span><span class="inline-block w-3 h-3 bg-red-500 rounded-full mr-1"></span>&gt;180</span>
+                    </div>
+                </div>
+            </section>
+            {% if analise.por_tipo %}
+            <section class="mb-8">
+                <h2 class="text-2xl font-semibold mb-4 text-gray-700">Glicemia por Momento</h2>
+                <div class="bg-white p-6 rounded-lg shadow-md overflow-x-auto">
+                    <table class="w-full text-sm text-left">
+                        <thead class="text-gray-500 border-b"><tr><th class="py-2">Momento</th><th>Leituras</th><th>Média</th><th>Mín / Máx</th><th>No Alvo</th></tr></thead>
+                        <tbody>
+                        {% for tipo, resumo in analise.por_tipo.items() %}
+                            <tr class="border-b"><td class="py-2">{{ tipo }}</td><td>{{ resumo.leituras }}</td><td>{{ resumo.glicemia_media }} mg/dL</td><td>{{ resumo.glicemia_min }} / {{ resumo.glicemia_max }} mg/dL</td><td>{{ resumo.no_alvo }}%</td></tr>
+                        {% endfor %}
+                        </tbody>
+                    </table>
+                    <p class="text-xs text-gray-500 mt-3">Percentis (mg/dL): P5 {{ analise.percentis.p5 }} · P25 {{ analise.percentis.p25 }} · Mediana {{ analise.percentis.p50 }} · P75 {{ analise.percentis.p75 }} · P95 {{ analise.percentis.p95 }}</p>
+                </div>
+            </section>
+            {% endif %}
+        </div>
+        
+        <div class="pdf-page">
+            <h2 class="text-2xl font-semibold mb-4 text-gray-700">Tendência Glicêmica</h2>
+            {% if grafico.exibidos < grafico.total or (dados.dataset_id and not publicado) %}
+            <div class="flex flex-wrap items-center gap-3 mb-3 text-sm text-gray-600">
+                <span id="grafico-resumo">{% if grafico.exibidos < grafico.total %}Exibindo {{ grafico.exibidos }} de {{ grafico.total }} leituras (curva reduzida preservando picos e vales).{% endif %}</span>
+                {% if dados.dataset_id and not publicado and grafico.periodo %}
+                <span class="print:hidden flex items-center gap-2">
+                    <input type="date" id="zoom-inicio" value="{{ grafico.periodo[0] }}" min="{{ grafico.periodo[0] }}" max="{{ grafico.periodo[1] }}" class="p-1 border rounded">
+                    <input type="date" id="zoom-fim" value="{{ grafico.periodo[1] }}" min="{{ grafico.periodo[0] }}" max="{{ grafico.periodo[1] }}" class="p-1 border rounded">
+                    <button type="button" onclick="detalharGrafico()" class="bg-blue-600 hover:bg-blue-700 text-white py-1 px-3 rounded">Detalhar</button>
+                    <button type="button" onclick="atualizarGrafico(graficoVisaoGeral)" class="bg-gray-200 hover:bg-gray-300 py-1 px-3 rounded">Visão geral</button>
+                </span>
+                {% endif %}
+            </div>
+            {% endif %}
+            <div class="bg-white p-6 rounded-lg shadow-md h-[600px]">
+                <canvas id="glucoseChart"></canvas>
+            </div>
+        </div>
+
+        <section>
+            <h2 class="text-2xl font-semibold my-4 text-gray-700 print:hidden">Registros Detalhados por Dia</h2>
+            {% for dia_html in dias_html %}{{ dia_html }}{% endfor %}
+        </section>
+    </div>
+    <script>
+        let glucoseChartInstance;
+        let recalculoTimer;
+        const datasetId = {{ dados.dataset_id|tojson }};
+
+        function parametrosAtuais() {
+            const painel = document.getElementById('painel-recalculo');
+            const correctionTable = {};
+            painel.querySelectorAll('[data-correcao]').forEach(el => { correctionTable[el.dataset.correcao] = el.value; });
+            return { carb_ratio: painel.querySelector('[data-param="carb_ratio"]').value, correction_table: correctionTable };
+        }
+
+        async function recalcularDoses() {
+            const status = document.getElementById('recalculo-status');
+            try {
+                const response = await fetch('/recalculate', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ dataset_id: datasetId, ...parametrosAtuais() })
+                });
+                const data = await response.json();
+                if (!response.ok) {
+                    throw new Error(data.message || 'Ocorreu um erro desconhecido.');
+                }
+                data.dias.forEach((dia, i) => {
+                    const total = document.querySelector(`[data-total-dia="${i}"]`);
+                    if (total) total.textContent = `${dia.total_insulina} UI`;
+                    dia.glicemias.forEach((glicemia, j) => {
+                        const dose = document.querySelector(`[data-dose="${i}-${j}"]`);
+                        const calculo = document.querySelector(`[data-calculo="${i}-${j}"]`);
+                        if (dose) dose.textContent = `Dose Sugerida: ${glicemia.dose_sugerida} UI`;
+                        if (calculo) calculo.textContent = `Cálculo: ${glicemia.calculo}`;
+                    });
+                });
+                status.textContent = `Doses recalculadas em ${data.tempo_ms} ms.`;
+            } catch (error) {
+                console.error('Erro ao recalcular as doses:', error);
+                status.textContent = 'Falha ao recalcular as doses: ' + error.message;
+            }
+        }
+
+        document.querySelectorAll('#painel-recalculo input').forEach(el => el.addEventListener('input', () => {
+            clearTimeout(recalculoTimer);
+            recalculoTimer = setTimeout(recalcularDoses, 300);
+        }));
+
+        async function saveReportToServer(button) {
+            const originalText = button.innerHTML;
+            button.innerHTML = 'Salvando...';
+            button.disabled = true;
+
+            const filename = "{{ filename_html|safe }}";
+            // Com o relatório em cache, o servidor renderiza e publica a página; sem ele, envia o HTML da página.
+            const publicar = datasetId !== null && document.getElementById('painel-recalculo');
+
+            try {
+                const response = await fetch(publicar ? '/publish' : '/save-report', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(publicar ? {
+                        dataset_id: datasetId,
+                        patient_name: {{ dados.paciente|tojson }},
+                        ...parametrosAtuais()
+                    } : {
+                        filename: filename,
+                        html_content: document.documentElement.outerHTML
+                    })
+                });
+                const data = await response.json();
+                if (response.ok) {
+                    alert(data.message);
+                } else {
+                    throw new Error(data.message || 'Ocorreu um erro desconhecido.');
+                }
+            } catch (error) {
+                console.error('Erro ao salvar o relatório:', error);
+                alert('Falha ao salvar o relatório: ' + error.message);
+            } finally {
+                button.innerHTML = originalText;
+                button.disabled = false;
+            }
+        }
+        
+        async function exportToPDF(button) {
+            const element = document.getElementById('report-content');
+            const patientName = "{{ dados.paciente }}".replace(/\\s+/g, '_').toLowerCase();
+            const period = "{{ dados.periodo }}".replace(/\\s*\\/\\s*/g, '-').replace(/\\s/g, '');
+            const filename = `relatorio_glicemico_${patientName}_${period}.pdf`;
+            // Com o relatório em cache, o PDF (vetorial, uma página por dia) é gerado no servidor; sem ele, a página é convertida no navegador.
+            if (datasetId !== null && document.getElementById('painel-recalculo')) {
+                const originalText = button.innerHTML;
+                button.innerHTML = 'Gerando PDF...';
+                button.disabled = true;
+                try {
+                    const response = await fetch('/export-pdf', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ dataset_id: datasetId, patient_name: {{ dados.paciente|tojson }}, ...parametrosAtuais() })
+                    });
+                    if (!response.ok) {
+                        const data = await response.json();
+                        throw new Error(data.message || 'Ocorreu um erro desconhecido.');
+                    }
+                    const url = URL.createObjectURL(await response.blob());
+                    const link = document.createElement('a');
+                    link.href = url;
+                    link.download = filename;
+                    document.body.appendChild(link);
+                    link.click();
+                    link.remove();
+                    URL.revokeObjectURL(url);
+                } catch (error) {
+                    console.error('Erro ao gerar o PDF:', error);
+                    alert('Falha ao gerar o PDF: ' + error.message);
+                } finally {
+                    button.innerHTML = originalText;
+                    button.disabled = false;
+                }
+                return;
+            }
+            const elementForPdf = element.cloneNode(true);
+            const pdfHeader = elementForPdf.querySelector('#pdf-header');
+            if (pdfHeader) {
+                pdfHeader.classList.remove('hidden');
+            }
+            if (glucoseChartInstance) {
+                const imageURL = glucoseChartInstance.toBase64Image('image/jpeg', 1.0);
+                const canvasInClone = elementForPdf.querySelector('#glucoseChart');
+                if (canvasInClone) {
+                    const img = document.createElement('img');
+                    img.src = imageURL;
+                    img.style.width = '100%';
+                    img.style.height = 'auto';
+                    canvasInClone.parentNode.replaceChild(img, canvasInClone);
+                }
+            }
+            const opt = { margin: 5, filename: filename, image: { type: 'jpeg', quality: 0.98 }, html2canvas: { scale: 2, useCORS: true, letterRendering: true }, jsPDF: { unit: 'mm', format: 'a4', orientation: 'landscape' }, pagebreak: { mode: 'css', before: '.pdf-page' } };
+            html2pdf().from(elementForPdf).set(opt).save();
+        }
+
+        const graficoVisaoGeral = {{ chart_data|safe }};
+
+        function atualizarGrafico(dadosGrafico) {
+            const chart = window.glucoseChartInstance;
+            chart.data.labels = dadosGrafico.labels;
+            chart.data.datasets[0].data = dadosGrafico.data;
+            chart.update();
+            const resumo = document.getElementById('grafico-resumo');
+            if (resumo) {
+                resumo.textContent = dadosGrafico.exibidos < dadosGrafico.total
+                    ? `Exibindo ${dadosGrafico.exibidos} de ${dadosGrafico.total} leituras (curva reduzida preservando picos e vales).`
+                    : `Exibindo ${dadosGrafico.total} leituras.`;
+            }
+        }
+
+        async function detalharGrafico() {
+            try {
+                const response = await fetch('/chart-data', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ dataset_id: datasetId, inicio: document.getElementById('zoom-inicio').value, fim: document.getElementById('zoom-fim').value })
+                });
+                const result = await response.json();
+                if (response.ok && result.status === 'success') {
+                    atualizarGrafico(result);
+                } else {
+                    alert(`Erro ao detalhar o gráfico: ${result.message}`);
+                }
+            } catch (error) {
+                alert('Não foi possível conectar ao servidor para detalhar o gráfico.');
+            }
+        }
+
+        const ctx = document.getElementById('glucoseChart');
+        if (ctx) {
+            const chartData = graficoVisaoGeral;
+            if (window.glucoseChartInstance) {
+                window.glucoseChartInstance.destroy();
+            }
+            window.glucoseChartInstance = new Chart(ctx, {
+                type: 'line',
+                data: {
+                    labels: chartData.labels,
+                    datasets: [{
+                        label: 'Glicemia (mg/dL)',
+                        data: chartData.data,
+                        borderColor: 'rgb(29, 78, 216)',
+                        backgroundColor: 'rgba(29, 78, 216, 0.1)',
+                        borderWidth: 2,
+                        pointRadius: 3,
+                        pointBackgroundColor: 'rgb(29, 78, 216)',
+                        tension: 0.1,
+                        fill: true
+                    }]
+                },
+                options: {
+                    animation: false, 
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    plugins: { legend: { display: false } },
+                    scales: { y: { beginAtZero: false, title: { display: true, text: 'Glicemia (mg/dL)' } }, x: { ticks: { autoSkip: true, maxRotation: 70, minRotation: 45 } } }
+                }
+            });
+        }
+    </script>
+</body>
+</html>
+"""
+
+DAY_TEMPLATE = """
+<div class="pdf-page mb-8">
+    <div class="bg-white p-4 rounded-t-lg shadow-md border-b flex flex-wrap justify-between items-center gap-2">
+        <div>
+            <h3 class="text-xl font-bold text-gray-800">{{ dia.data }}</h3>
+            <p class="text-sm text-gray-500">Total: {{ "%.1f"|format(dia.total_kcal) }} kcals / {{ "%.1f"|format(dia.total_carbs) }}g carbs</p>
+        </div>
+        <div class="text-right"><h4 class="font-bold text-lg text-blue-700">Total Insulina do Dia</h4><p class="font-bold text-2xl text-blue-700" data-total-dia="{{ dia_idx }}">{{ "%.0f"|format(dia.total_insulina) }} UI</p></div>
+    </div>
+    <div class="grid grid-cols-1 lg:grid-cols-5 gap-6 p-4 bg-gray-50 rounded-b-lg shadow-md pdf-day-container">
+        <div class="lg:col-span-2 pdf-day-glicemias">
+            <h4 class="font-semibold mb-2 text-lg">Glicemias e Doses</h4>
+            <ul class="space-y-3">
+            {% for glicemia in dia.glicemias %}
+                <li class="p-3 rounded-lg {% if glicemia.valor < 70 %} bg-sky-100 {% elif glicemia.valor > 180 %} bg-red-100 {% else %} bg-green-100 {% endif %}">
+                    <div class="flex justify-between items-center"><span class="text-sm text-gray-600">{{ glicemia.hora }} ({{ glicemia.tipo }})</span><span class="font-bold text-gray-800 text-lg">{{ glicemia.valor }} mg/dL</span></div>
+                    <div class="mt-2 pt-2 border-t border-gray-300/50"><p class="font-bold text-blue-800" data-dose="{{ dia_idx }}-{{ loop.index0 }}">Dose Sugerida: {{ glicemia.dose_sugerida }} UI</p><p class="text-xs text-gray-500 italic" data-calculo="{{ dia_idx }}-{{ loop.index0 }}">Cálculo: {{ glicemia.calculo }}</p></div>
+                </li>
+            {% endfor %}
+            </ul>
+        </div>
+        <div class="lg:col-span-3 pdf-day-refeicoes">
+             <h4 class="font-semibold mb-2 text-lg">Refeições e Alimentos</h4>
+             {% for refeicao in dia.refeicoes %}
+                <div class="mb-4 bg-white p-3 rounded-md shadow-sm">
+                    <p class="font-bold text-md text-gray-700">{{ refeicao.nome }}</p>
+                    <p class="text-xs text-gray-500 -mt-1 mb-2">{{ "%.1f"|format(refeicao.total_kcal) }} kcals / {{ "%.1f"|format(refeicao.total_carbs) }}g carbs</p>
+                    <ul class="list-disc list-inside text-sm space-y-1 text-gray-600 pl-2">
+                    {% for alimento in refeicao.alimentos %}
+                        <li>{{ alimento.nome }} <span class="text-gray-500">({{ alimento.detalhes }})</span></li>
+                    {% else %}
+                        <li class="list-none italic">Nenhum alimento detalhado.</li>
+                    {% endfor %}
+                    </ul>
+                </div>
+             {% else %}
+                <p class="text-gray-500">Nenhuma refeição registrada para este dia.</p>
+             {% endfor %}
+        </div>
+    </div>
+</div>
+"""
+
+SHELL_TEMPLATE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8"><meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Relatório de Controle Glicêmico</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    <style>
+        body { font-family: 'Inter', sans-serif; }
+        @media print {
+            html, body { -webkit-print-color-adjust: exact; print-color-adjust: exact; font-size: 8pt; }
+            .no-print { display: none !important; }
+            .pdf-page { page-break-before: always; page-break-inside: avoid; }
+            .shadow-md { box-shadow: none !important; border: 1px solid #eee; }
+        }
+    </style>
+</head>
+<body class="bg-gray-100 text-gray-800">
+    <div id="report-content" class="container mx-auto p-4 sm:p-6 md:p-8">
+        <p id="carregando" class="text-gray-500">Carregando relatório...</p>
+    </div>
+    <script>
+        // Página única dos relatórios publicados no formato compacto: lê ?dados=<nome>,
+        // baixa <nome>.json.gz (gerado por publicar_relatorios) e monta o relatório.
+        const esc = valor => String(valor ?? '').replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
+        const decimal = valor => Number.isInteger(valor) ? valor.toFixed(1) : String(valor);  // Como o str() de um float no Python
+        const fmt1 = valor => Number(valor).toFixed(1);
+
+        async function carregarDados(nome) {
+            const response = await fetch(`${encodeURIComponent(nome)}.json.gz`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const bytes = new Uint8Array(await response.arrayBuffer());
+            if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) {  // O servidor já descompactou (Content-Encoding: gzip)
+                return JSON.parse(new TextDecoder().decode(bytes));
+            }
+            const fluxo = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return JSON.parse(await new Response(fluxo).text());
+        }
+
+        function calculo(r, tipo, [hora, , valor, dose, doseCarbs, doseCorrecao, carbs]) {
+            if (tipo.toLowerCase().includes('depois')) return `Correção para ${valor}mg/dL = ${doseCorrecao}UI`;
+            return `Carbs (${carbs === null ? 0 : decimal(carbs)}g / ${r.carb_ratio} = ${doseCarbs}UI) + Correção (${valor}mg/dL = ${doseCorrecao}UI) = ${dose}UI`;
+        }
+
+        function cartao(titulo, conteudo, dica) {
+            return `<div class="bg-white p-6 rounded-lg shadow-md" title="${esc(dica)}"><h3 class="font-semibold text-gray-500">${titulo}</h3>${conteudo}</div>`;
+        }
+
+        function montarResumo(r) {
+            const a = r.analise, alvo = a.tempo_no_alvo;
+            const porTipo = Object.entries(a.por_tipo || {}).map(([tipo, t]) =>
+                `<tr class="border-b"><td class="py-2">${esc(tipo)}</td><td>${t.leituras}</td><td>${t.glicemia_media} mg/dL</td><td>${t.glicemia_min} / ${t.glicemia_max} mg/dL</td><td>${t.no_alvo}%</td></tr>`).join('');
+            return `
+            <header class="mb-8">
+                <h1 class="text-3xl md:text-4xl font-bold text-blue-700">Relatório de Controle Glicêmico</h1>
+                <p class="text-md text-gray-600">Paciente: ${esc(r.paciente)} | Período: ${esc(r.periodo)}</p>
+            </header>
+            <section class="mb-8">
+                <h2 class="text-2xl font-semibold mb-4 text-gray-700">Resumo Geral</h2>
+                <div class="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-5 gap-6">
+                    ${cartao('Glicemia Média', `<p class="text-4xl font-bold text-blue-600">${a.glicemia_media} <span class="text-lg">mg/dL</span></p>`, 'A média de todas as medições de glicose no período.')}
+                    ${cartao('HbA1c Estimada', `<p class="text-4xl font-bold text-green-600">${a.hba1c_estimada}<span class="text-lg">%</span></p><p class="text-sm text-gray-500">GMI: ${a.gmi}%</p>`, 'Estimativa da Hemoglobina Glicada (A1c) baseada na glicemia média. Fórmula: (Glicemia Média + 46.7) / 28.7.')}
+                    ${cartao('Variabilidade (DP)', `<p class="text-4xl font-bold text-purple-600">${a.desvio_padrao}</p><p class="text-sm text-gray-500">CV: ${a.cv}%</p>`, 'Desvio Padrão (DP). Um valor mais baixo indica maior estabilidade glicêmica.')}
+                    ${cartao('Medições Extremas', `<div class="flex items-baseline"><p class="text-2xl font-bold text-red-500">${a.glicemia_max}</p><span class="mx-2 text-gray-400">/</span><p class="text-2xl font-bold text-sky-500">${a.glicemia_min}</p><span class="text-sm ml-1">mg/dL</span></div>`, 'O valor mais alto e o mais baixo registrados.')}
+                    ${cartao('Total de Dias', `<p class="text-4xl font-bold text-gray-600">${r.total_dias}</p>`, 'O número total de dias com registros no relatório.')}
+                </div>
+            </section>
+            <section class="mb-8">
+                <h2 class="text-2xl font-semibold mb-4 text-gray-700">Glicemia Alvo</h2>
+                <div class="bg-white p-6 rounded-lg shadow-md">
+                    <div class="w-full bg-gray-200 rounded-full h-8 flex overflow-hidden">
+                        <div class="bg-sky-500 h-8 flex items-center justify-center text-white font-bold" style="width: ${alvo.abaixo}%" title="Abaixo do Alvo">${alvo.abaixo}%</div>
+                        <div class="bg-green-500 h-8 flex items-center justify-center text-white font-bold" style="width: ${alvo.no_alvo}%" title="No Alvo">${alvo.no_alvo}%</div>
+                        <div class="bg-red-500 h-8 flex items-center justify-center text-white font-bold" style="width: ${alvo.acima}%" title="Acima do Alvo">${alvo.acima}%</div>
+                    </div>
+                </div>
+            </section>
+            ${porTipo ? `
+            <section class="mb-8">
+                <h2 class="text-2xl font-semibold mb-4 text-gray-700">Glicemia por Momento</h2>
+                <div class="bg-white p-6 rounded-lg shadow-md overflow-x-auto">
+                    <table class="w-full text-sm text-left">
+                        <thead class="text-gray-500 border-b"><tr><th class="py-2">Momento</th><th>Leituras</th><th>Média</th><th>Mín / Máx</th><th>No Alvo</th></tr></thead>
+                        <tbody>${porTipo}</tbody>
+                    </table>
+                    <p class="text-xs text-gray-500 mt-3">Percentis (mg/dL): P5 ${a.percentis.p5} · P25 ${a.percentis.p25} · Mediana ${a.percentis.p50} · P75 ${a.percentis.p75} · P95 ${a.percentis.p95}</p>
+                </div>
+            </section>` : ''}
+            <div class="pdf-page">
+                <h2 class="text-2xl font-semibold mb-4 text-gray-700">Tendência Glicêmica</h2>
+                ${r.grafico.exibidos < r.grafico.total ? `<p class="mb-3 text-sm text-gray-600">Exibindo ${r.grafico.exibidos} de ${r.grafico.total} leituras (curva reduzida preservando picos e vales).</p>` : ''}
+                <div class="bg-white p-6 rounded-lg shadow-md h-[600px]"><canvas id="glucoseChart"></canvas></div>
+            </div>`;
+        }
+
+        function montarDia(r, dia) {
+            const glicemias = dia.glicemias.map(g => {
+                const [hora, tipoIdx, valor, dose] = g, tipo = r.tipos[tipoIdx];
+                const cor = valor < 70 ? 'bg-sky-100' : valor > 180 ? 'bg-red-100' : 'bg-green-100';
+                return `<li class="p-3 rounded-lg ${cor}">
+                    <div class="flex justify-between items-center"><span class="text-sm text-gray-600">${hora} (${esc(tipo)})</span><span class="font-bold text-gray-800 text-lg">${valor} mg/dL</span></div>
+                    <div class="mt-2 pt-2 border-t border-gray-300/50"><p class="font-bold text-blue-800">Dose Sugerida: ${dose} UI</p><p class="text-xs text-gray-500 italic">Cálculo: ${esc(calculo(r, tipo, g))}</p></div>
+                </li>`;
+            }).join('');
+            const refeicoes = dia.refeicoes.map(([nome, kcal, carbs, alimentos]) => `
+                <div class="mb-4 bg-white p-3 rounded-md shadow-sm">
+                    <p class="font-bold text-md text-gray-700">${esc(nome)}</p>
+                    <p class="text-xs text-gray-500 -mt-1 mb-2">${fmt1(kcal)} kcals / ${fmt1(carbs)}g carbs</p>
+                    <ul class="list-disc list-inside text-sm space-y-1 text-gray-600 pl-2">${alimentos.length
+                        ? alimentos.map(([alimento, detalhes]) => `<li>${esc(alimento)} <span class="text-gray-500">(${esc(detalhes)})</span></li>`).join('')
+                        : '<li class="list-none italic">Nenhum alimento detalhado.</li>'}</ul>
+                </div>`).join('') || '<p class="text-gray-500">Nenhuma refeição registrada para este dia.</p>';
+            return `
+            <div class="pdf-page mb-8">
+                <div class="bg-white p-4 rounded-t-lg shadow-md border-b flex flex-wrap justify-between items-center gap-2">
+                    <div><h3 class="text-xl font-bold text-gray-800">${esc(dia.data)}</h3><p class="text-sm text-gray-500">Total: ${fmt1(dia.total_kcal)} kcals / ${fmt1(dia.total_carbs)}g carbs</p></div>
+                    <div class="text-right"><h4 class="font-bold text-lg text-blue-700">Total Insulina do Dia</h4><p class="font-bold text-2xl text-blue-700">${Math.round(dia.total_insulina)} UI</p></div>
+                </div>
+                <div class="grid grid-cols-1 lg:grid-cols-5 gap-6 p-4 bg-gray-50 rounded-b-lg shadow-md">
+                    <div class="lg:col-span-2"><h4 class="font-semibold mb-2 text-lg">Glicemias e Doses</h4><ul class="space-y-3">${glicemias}</ul></div>
+                    <div class="lg:col-span-3"><h4 class="font-semibold mb-2 text-lg">Refeições e Alimentos</h4>${refeicoes}</div>
+                </div>
+            </div>`;
+        }
+
+        async function iniciar() {
+            const conteudo = document.getElementById('report-content');
+            const nome = new URLSearchParams(window.location.search).get('dados');
+            if (!nome) {
+                conteudo.innerHTML = '<p class="text-red-600">Nenhum relatório indicado (parâmetro ?dados=).</p>';
+                return;
+            }
+            let r;
+            try {
+                r = await carregarDados(nome);
+            } catch (error) {
+                conteudo.innerHTML = `<p class="text-red-600">Não foi possível carregar o relatório: ${esc(error.message)}</p>`;
+                return;
+            }
+            document.title = `Relatório de Controle Glicêmico - ${r.paciente} - ${r.periodo}`;
+            conteudo.innerHTML = montarResumo(r) + `
+            <section>
+                <h2 class="text-2xl font-semibold my-4 text-gray-700 print:hidden">Registros Detalhados por Dia</h2>
+                ${r.dias.map(dia => montarDia(r, dia)).join('')}
+            </section>`;
+            new Chart(document.getElementById('glucoseChart'), {
+                type: 'line',
+                data: { labels: r.grafico.labels, datasets: [{ label: 'Glicemia (mg/dL)', data: r.grafico.data, borderColor: 'rgb(29, 78, 216)', backgroundColor: 'rgba(29, 78, 216, 0.1)',
+                        borderWidth: 2, pointRadius: 3, pointBackgroundColor: 'rgb(29, 78, 216)', tension: 0.1, fill: true }] },
+                options: { animation: false, responsive: true, maintainAspectRatio: false, plugins: { legend: { display: false } },
+                           scales: { y: { beginAtZero: false, title: { display: true, text: 'Glicemia (mg/dL)' } }, x: { ticks: { autoSkip: true, maxRotation: 70, minRotation: 45 } } } }
+            });
+        }
+        iniciar();
+    </script>
+</body>
+</html>
+"""
+
+INDEX_TEMPLATE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Relatórios de Controle Glicêmico</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    <style> 
+        body { font-family: 'Inter', sans-serif; } 
+    </style>
+</head>
+<body class="bg-gray-100 flex items-center justify-center min-h-screen py-12">
+    <div class="max-w-3xl w-full bg-white p-8 rounded-lg shadow-lg">
+        <div class="text-center mb-8">
+            <h1 class="text-3xl font-bold text-blue-700 mb-2">Relatórios de Controle Glicêmico</h1>
+            <p class="text-gray-600">Acesse os relatórios detalhados gerados para acompanhamento.</p>
+        </div>
+
+        <div class="space-y-4">
+            <h2 class="text-xl font-semibold text-gray-800 border-b pb-2">Relatórios Disponíveis</h2>
+            
+            <ul class="list-disc list-inside space-y-3 pt-2">
+                {%- for relatorio in relatorios %}
+                <li>
+                    <a href="{{ relatorio.href }}" 
+                       class="text-blue-600 hover:text-blue-800 hover:underline font-medium"
+                       target="_blank">
+                       {{ relatorio.titulo }}
+                    </a>
+                </li>
+                {%- endfor %}
+            </ul>
+
+            <div class="pt-6 text-center text-sm text-gray-500">
+                <p>Este site é um repositório estático dos relatórios gerados pela aplicação <a href="https://github.com/clsribeiro/controle-glicemico" class="underline" target="_blank">Analisador de Glicemia</a>.</p>
+            </div>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+COHORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Painel da Coorte</title>
+    <script src="https://cdn.tailwindcss.com"></script>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    <style> body { font-family: 'Inter', sans-serif; } </style>
+</head>
+<body class="bg-gray-100 text-gray-800">
+    <div class="container mx-auto p-4 md:p-8">
+        <header class="flex flex-wrap justify-between items-center gap-4 mb-6">
+            <div>
+                <h1 class="text-3xl font-bold text-blue-700">Painel da Coorte</h1>
+                <p class="text-gray-600">{{ painel.pacientes|length }} paciente(s){% if painel.semanas %} · semanas de {{ painel.semanas[0] }} a {{ painel.semanas[-1] }}{% endif %}</p>
+            </div>
+            <form method="get" class="flex flex-wrap items-end gap-3 text-sm">
+                <div>
+                    <label for="semanas" class="block text-xs font-medium text-gray-500">Semanas</label>
+                    <input type="number" name="semanas" id="semanas" min="1" max="104" value="{{ semanas }}" class="mt-1 w-20 px-2 py-1.5 border border-gray-300 rounded-md">
+                </div>
+                <div>
+                    <label for="fim" class="block text-xs font-medium text-gray-500">Até</label>
+                    <input type="date" name="fim" id="fim" value="{{ fim }}" class="mt-1 px-2 py-1.5 border border-gray-300 rounded-md">
+                </div>
+                <button type="submit" class="bg-blue-600 text-white font-bold py-2 px-4 rounded-lg hover:bg-blue-700">Atualizar</button>
+                <a href="/" class="text-blue-600 hover:underline py-2">Voltar</a>
+            </form>
+        </header>
+        {% macro celula(resumo) %}
+        <td class="p-3 whitespace-nowrap">
+            {% if resumo and resumo.leituras %}
+            <p class="font-bold {% if resumo.no_alvo >= 70 %}text-green-600{% elif resumo.no_alvo >= 50 %}text-yellow-600{% else %}text-red-600{% endif %}" title="Tempo no alvo (70-180 mg/dL)">{{ resumo.no_alvo }}% no alvo</p>
+            <p>{{ resumo.glicemia_media }} mg/dL · A1c {{ resumo.hba1c_estimada }}%</p>
+            <p class="text-xs text-gray-500">{% if resumo.insulina is not none %}{{ resumo.insulina }} UI · {% endif %}{{ resumo.dias }} dia(s)</p>
+            {% elif resumo %}
+            <p class="text-xs text-gray-500">{{ resumo.dias }} dia(s) sem leituras</p>
+            {% else %}
+            <p class="text-gray-300">—</p>
+            {% endif %}
+        </td>
+        {% endmacro %}
+        {% if painel.pacientes %}
+        <div class="bg-white rounded-lg shadow-md overflow-x-auto">
+            <table class="w-full text-sm text-left">
+                <thead class="text-gray-500 border-b">
+                    <tr>
+                        <th class="p-3">Paciente</th>
+                        <th class="p-3">Período</th>
+                        {% for semana in painel.semanas %}<th class="p-3 whitespace-nowrap">{{ semana[8:10] }}/{{ semana[5:7] }}</th>{% endfor %}
+                    </tr>
+                </thead>
+                <tbody>
+                {% for paciente in painel.pacientes %}
+                    <tr class="border-b align-top">
+                        <td class="p-3 font-semibold"><a href="/historico?paciente={{ paciente.nome|urlencode }}&inicio={{ painel.semanas[0] }}&fim={{ painel.fim }}" class="text-blue-600 hover:underline">{{ paciente.nome }}</a></td>
+                        {{ celula(paciente.periodo) }}
+                        {% for semana in painel.semanas %}{{ celula(paciente.semanas.get(semana)) }}{% endfor %}
+                    </tr>
+                {% endfor %}
+                </tbody>
+            </table>
+        </div>
+        <p class="text-xs text-gray-500 mt-3">Semanas de segunda a domingo. HbA1c estimada: (Glicemia Média + 46.7) / 28.7. A insulina é a calculada com os parâmetros da última importação de cada paciente.</p>
+        {% else %}
+        <p class="text-gray-500">Nenhuma leitura gravada no banco para o período.</p>
+        {% endif %}
+    </div>
+</body>
+</html>
+"""
+
+registro_templates = RegistroTemplates(app.jinja_env, {
+    'upload': UPLOAD_TEMPLATE, 'relatorio': REPORT_TEMPLATE, 'dia': DAY_TEMPLATE, 'index': INDEX_TEMPLATE, 'casca': SHELL_TEMPLATE,
+    'coorte': COHORT_TEMPLATE,
+})
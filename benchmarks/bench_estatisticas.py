@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Benchmark do módulo de estatísticas (analisar_dados_gerais)
+#
+# Compara o motor atual com a implementação anterior (lista achatada +
+# statistics.mean/stdev + somas separadas), confere que as métricas em comum são
+# idênticas e mede o tempo de cada caminho sobre a SerieGlicemias já montada:
+# lista ordenada, histogramas (ambos em Python puro) e NumPy. "série" é o caminho
+# escolhido por analisar_dados_gerais (LIMIAR_NUMPY, LIMIAR_HISTOGRAMA); "dicts"
+# é a mesma chamada sem a série pronta, lendo as colunas dos dicts de glicemia.
+#
+# Como usar: python benchmarks/bench_estatisticas.py [dias ...]
+# -----------------------------------------------------------------------------
+
+import os
+import random
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analisador import estatisticas
+from analisador.estatisticas import analisar_dados_gerais
+from analisador.serie import SerieGlicemias
+
+TIPOS = ["Antes do café da manhã", "Depois do café da manhã", "Antes do almoço", "Depois do almoço", "Antes do jantar", "Depois do jantar"]
+
+def analisar_dados_gerais_anterior(dados_completos):
+    """Implementação anterior, mantida aqui como referência de resultado e de tempo."""
+    todas_as_glicemias = [g['valor'] for dia in dados_completos.get('dias', []) for g in dia.get('glicemias', [])]
+    if not todas_as_glicemias: return {}
+    total = len(todas_as_glicemias)
+    glicemia_media = statistics.mean(todas_as_glicemias)
+    return {"glicemia_media": round(glicemia_media), "glicemia_max": max(todas_as_glicemias), "glicemia_min": min(todas_as_glicemias), "desvio_padrao": round(statistics.stdev(todas_as_glicemias), 1) if total > 1 else 0, "hba1c_estimada": round((glicemia_media + 46.7) / 28.7, 1), "tempo_no_alvo": {"no_alvo": round(sum(1 for g in todas_as_glicemias if 70 <= g <= 180) / total * 100), "abaixo": round(sum(1 for g in todas_as_glicemias if g < 70) / total * 100), "acima": round(sum(1 for g in todas_as_glicemias if g > 180) / total * 100)}}
+
+def gerar_dados(dias, leituras_por_dia=6, semente=42):
+    aleatorio = random.Random(semente)
+    return {"dias": [{"data": f"Dia {d}", "glicemias": [{"hora": f"{6 + 3 * i:02d}:00", "valor": max(40, int(aleatorio.gauss(150, 55))), "tipo": TIPOS[i % len(TIPOS)]}
+                                                        for i in range(leituras_por_dia)]} for d in range(dias)]}
+
+def cronometrar(funcao, repeticoes=5):
+    numero = max(1, timeit.Timer(funcao).autorange()[0] // 10)
+    return min(timeit.repeat(funcao, number=numero, repeat=repeticoes)) / numero * 1000
+
+def caminho(nome, funcao):
+    """Tempo de funcao com analisar_dados_gerais forçada a um caminho (None se o NumPy não estiver instalado)."""
+    originais = estatisticas.LIMIAR_NUMPY, estatisticas.LIMIAR_HISTOGRAMA, estatisticas.carregar_numpy
+    if nome == 'numpy':
+        if originais[2]() is None: return None
+        estatisticas.LIMIAR_NUMPY = 0
+    else:
+        estatisticas.carregar_numpy = lambda: None
+        estatisticas.LIMIAR_HISTOGRAMA = 0 if nome == 'histogramas' else 10 ** 9
+    try:
+        return cronometrar(funcao)
+    finally:
+        estatisticas.LIMIAR_NUMPY, estatisticas.LIMIAR_HISTOGRAMA, estatisticas.carregar_numpy = originais
+
+def main(quantidades):
+    colunas = ('anterior', 'ordenada', 'histogramas', 'numpy', 'série', 'dicts')
+    print(f"{'dias':>6} {'leituras':>9} " + " ".join(f"{c:>11}" for c in colunas) + f" {'ganho':>6}   (ms)")
+    for quantidade in quantidades:
+        dados = gerar_dados(quantidade)
+        com_serie = {**dados, "serie": SerieGlicemias.de_dias(dados['dias'])}
+        anterior, atual = analisar_dados_gerais_anterior(dados), analisar_dados_gerais(com_serie)
+        divergentes = [k for k in anterior if anterior[k] != atual[k]]
+        if divergentes:
+            raise SystemExit(f"Métricas divergentes: {divergentes}")
+        tempos = [cronometrar(lambda: analisar_dados_gerais_anterior(dados))]
+        tempos += [caminho(nome, lambda: analisar_dados_gerais(com_serie)) for nome in ('ordenada', 'histogramas', 'numpy')]
+        tempos += [cronometrar(lambda: analisar_dados_gerais(com_serie)), cronometrar(lambda: analisar_dados_gerais(dados))]
+        print(f"{quantidade:>6} {atual['total_leituras']:>9} " + " ".join(f"{t:>11.2f}" if t is not None else f"{'-':>11}" for t in tempos)
+              + f" {tempos[0] / tempos[4]:>5.1f}x")
+
+if __name__ == '__main__':
+    main([int(d) for d in sys.argv[1:]] or [3, 7, 15, 30, 91, 182, 365, 1825, 7300])
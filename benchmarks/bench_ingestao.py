@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Benchmark do pipeline de ingestão (upload .mhtml -> relatório renderizado)
+#
+# Gera exportações sintéticas (benchmarks/gerar_mhtml.py) e mede, para cada
+# extrator e para o modo streaming, o tempo e o pico de memória de cada etapa:
+# extração, doses, estatísticas e renderização. Os tempos das sub-etapas (mime,
+# quoted_printable, arvore_html...) vêm da própria instrumentação do aplicativo.
+# Os tempos são o mínimo de N repetições; a memória é medida numa passada à parte,
+# com tracemalloc, para não distorcer os tempos (tracemalloc só enxerga alocações do
+# Python: a árvore do lxml, em C, não entra no pico). O cache de fragmentos por dia
+# fica desligado, para medir a renderização a frio.
+#
+# Como usar: python benchmarks/bench_ingestao.py [dias ...] [--repeticoes N] [--json saida.json]
+# -----------------------------------------------------------------------------
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analisador import web
+from analisador.estatisticas import analisar_dados_gerais
+from analisador.extracao import carregar_lxml, extrair_mhtml
+from analisador.instrumentacao import Medicao, medicao_atual
+from analisador.insulina import get_default_correction_table
+from analisador.serie import montar_dados
+from gerar_mhtml import gerar_mhtml
+
+ETAPAS = ["extracao", "doses", "estatisticas", "renderizacao"]
+
+def modos_disponiveis():
+    modos = [("bs4", "bs4", False), ("incremental", "incremental", False), ("streaming", "bs4", True)]
+    if carregar_lxml() is not None:
+        modos.insert(1, ("lxml", "lxml", False))
+    return modos
+
+def executar_etapas(conteudo, extrator, streaming):
+    """Executa o pipeline etapa por etapa, como em home(); gera (etapa, função) para o chamador medir."""
+    tabela = get_default_correction_table()
+    estado = {}
+    def extracao():
+        estado["base"], erro = extrair_mhtml(io.BytesIO(conteudo), streaming, extrator)
+        if erro:
+            raise SystemExit(erro)
+    def doses():
+        estado["dados"] = montar_dados(estado["base"], "Benchmark", 15, tabela)
+    def estatisticas():
+        analisar_dados_gerais(estado["dados"])
+    def renderizacao():
+        with web.app.test_request_context():
+            web.registro_templates.renderizar('relatorio', **web.contexto_relatorio(estado["dados"], 15, tabela))
+    return zip(ETAPAS, (extracao, doses, estatisticas, renderizacao))
+
+def medir_tempos(conteudo, extrator, streaming, repeticoes):
+    """Menor tempo (ms) de cada etapa e sub-etapa instrumentada em 'repeticoes' execuções."""
+    melhores = {}
+    for _ in range(repeticoes):
+        medicao = Medicao()
+        token = medicao_atual.set(medicao)
+        try:
+            tempos = {}
+            for etapa, funcao in executar_etapas(conteudo, extrator, streaming):
+                inicio = time.perf_counter()
+                funcao()
+                tempos[etapa] = (time.perf_counter() - inicio) * 1000
+        finally:
+            medicao_atual.reset(token)
+        tempos.update({f"  {sub}": s * 1000 for sub, s in medicao.etapas.items() if sub not in tempos})
+        for etapa, ms in tempos.items():
+            melhores[etapa] = min(ms, melhores.get(etapa, ms))
+    return melhores
+
+def medir_memoria(conteudo, extrator, streaming):
+    """Pico de memória alocada (MB) durante cada etapa, além do que as etapas anteriores mantêm."""
+    picos = {}
+    tracemalloc.start()
+    try:
+        for etapa, funcao in executar_etapas(conteudo, extrator, streaming):
+            atual, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            funcao()
+            picos[etapa] = (tracemalloc.get_traced_memory()[1] - atual) / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+    return picos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede tempo e memória por etapa da ingestão de exportações sintéticas.')
+    parser.add_argument('dias', type=int, nargs='*', default=[7, 90, 365])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--json', dest='saida_json', help='Grava os resultados neste arquivo JSON')
+    args = parser.parse_args(argv)
+    web.cache_fragmentos = web.CacheFragmentos(0)
+    resultados = []
+    for dias in args.dias:
+        conteudo = gerar_mhtml(dias)
+        print(f"\n{dias} dias ({len(conteudo) / 1024:.0f} KiB)")
+        print(f"{'modo':<12} {'etapa':<20} {'tempo (ms)':>11} {'pico (MB)':>10}")
+        for nome, extrator, streaming in modos_disponiveis():
+            tempos = medir_tempos(conteudo, extrator, streaming, args.repeticoes)
+            picos = medir_memoria(conteudo, extrator, streaming)
+            for etapa, ms in tempos.items():
+                pico = f"{picos[etapa]:>10.1f}" if etapa in picos else f"{'':>10}"
+                print(f"{nome:<12} {etapa:<20} {ms:>11.1f} {pico}")
+            total = sum(tempos[e] for e in ETAPAS)
+            print(f"{nome:<12} {'total':<20} {total:>11.1f} {max(picos.values()):>10.1f}")
+            resultados.append({"dias": dias, "bytes": len(conteudo), "modo": nome, "tempos_ms": {e.strip(): round(v, 2) for e, v in tempos.items()},
+                               "pico_mb": {e: round(v, 2) for e, v in picos.items()}})
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
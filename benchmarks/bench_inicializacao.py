@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Benchmark de inicialização dos pontos de entrada
+#
+# Mede, em processos novos, quanto cada ponto de entrada leva para importar o que
+# precisa, descontado o tempo do interpretador vazio (python -c pass), e compara
+# com o orçamento de cada um. Os processos do pool do lote (importar_lote,
+# exportar_pdfs) importam analisador.lote ao iniciar com 'spawn'; a linha de
+# comando é medida até o argparse (lote --help). Além do tempo, confere com
+# -X importtime que as dependências pesadas (Flask, bs4, lxml, NumPy) não são
+# carregadas por quem não as usa. Sai com código 1 se algum orçamento estourar.
+#
+# Como usar: python benchmarks/bench_inicializacao.py [--repeticoes N] [--json saida.json]
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PESADOS = ('flask', 'werkzeug', 'jinja2', 'bs4', 'lxml', 'numpy')
+
+# (nome, argumentos do python, orçamento em ms acima do interpretador, módulos pesados permitidos)
+PONTOS_DE_ENTRADA = [
+    ("insulina (doses)", ['-c', 'import analisador.insulina'], 15, ()),
+    ("extracao", ['-c', 'import analisador.extracao'], 60, ()),
+    ("estatisticas", ['-c', 'import analisador.estatisticas'], 50, ()),
+    ("processo do lote", ['-c', 'import analisador.lote'], 120, ()),
+    ("lote (linha de comando)", ['analisador_glicemia_real.py', 'lote', '--help'], 150, ()),
+    ("web", ['-c', 'import analisador.web'], 600, PESADOS),
+]
+
+def executar(argumentos):
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, *argumentos], cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - inicio) * 1000
+
+def mediana_ms(argumentos, repeticoes):
+    executar(argumentos)  # Aquecimento: grava os .pyc e carrega o cache de disco
+    return statistics.median(executar(argumentos) for _ in range(repeticoes))
+
+def modulos_carregados(argumentos):
+    """Pacotes de primeiro nível importados pelo ponto de entrada (saída de -X importtime)."""
+    saida = subprocess.run([sys.executable, '-X', 'importtime', *argumentos], cwd=RAIZ, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.PIPE, text=True, check=True).stderr
+    return {linha.rsplit('|', 1)[1].strip().split('.')[0] for linha in saida.splitlines() if linha.startswith('import time:') and '|' in linha}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede o tempo de inicialização de cada ponto de entrada e compara com o orçamento.')
+    parser.add_argument('--repeticoes', type=int, default=7)
+    parser.add_argument('--json', dest='saida_json', help='Grava os resultados neste arquivo JSON')
+    args = parser.parse_args(argv)
+    base = mediana_ms(['-c', 'pass'], args.repeticoes)
+    print(f"Interpretador vazio: {base:.0f} ms (mediana de {args.repeticoes})\n")
+    print(f"{'ponto de entrada':<26} {'tempo (ms)':>10} {'orçamento':>10}  situação")
+    resultados, estourou = [], False
+    for nome, argumentos, orcamento, permitidos in PONTOS_DE_ENTRADA:
+        tempo = mediana_ms(argumentos, args.repeticoes) - base
+        indevidos = sorted(m for m in modulos_carregados(argumentos) & set(PESADOS) if m not in permitidos)
+        ok = tempo <= orcamento and not indevidos
+        estourou |= not ok
+        situacao = "ok" if ok else ("acima do orçamento" if tempo > orcamento else "") + (f" importou {', '.join(indevidos)}" if indevidos else "")
+        print(f"{nome:<26} {tempo:>10.0f} {orcamento:>10}  {situacao.strip()}")
+        resultados.append({"ponto_de_entrada": nome, "tempo_ms": round(tempo, 1), "orcamento_ms": orcamento, "pesados_indevidos": indevidos, "ok": ok})
+    if args.saida_json:
+        with open(args.saida_json, 'w', encoding='utf-8') as f:
+            json.dump({"interpretador_ms": round(base, 1), "pontos_de_entrada": resultados}, f, ensure_ascii=False, indent=2)
+    return 1 if estourou else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# -----------------------------------------------------------------------------
+# Gerador de exportações .mhtml sintéticas
+#
+# Reproduz a marcação que os extratores esperam: período no h2, um bloco por dia
+# com h1.font-bold.text-xl e o parágrafo de totais, o cartão "Glicemias" (tipo +
+# p.text-gray-500 "HH:MM: N mg/dl") e um cartão por refeição, com os totais em
+# div.text-sm.text-gray-500 e os alimentos em .p-4 > div > div > p.font-bold. O HTML
+# vai em quoted-printable dentro de um multipart/related, como no "Salvar como" do
+# navegador. A saída é determinística para a mesma semente.
+#
+# Como usar: python benchmarks/gerar_mhtml.py 365 -o exportacao.mhtml [opções]
+# -----------------------------------------------------------------------------
+
+import argparse
+import datetime
+import quopri
+import random
+import sys
+
+MESES = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+TIPOS = ["Antes do café da manhã", "Depois do café da manhã", "Antes do almoço", "Depois do almoço", "Antes do lanche",
+         "Antes do jantar", "Depois do jantar"]
+ALIMENTOS = ["Arroz branco", "Feijão carioca", "Pão francês", "Banana prata", "Frango grelhado", "Iogurte natural",
+             "Café com leite", "Maçã", "Batata doce", "Salada verde & tomate"]
+FRONTEIRA = "----MultipartBoundary--Sintetico----"
+
+def gerar_html(dias, leituras_por_dia=5, alimentos_por_refeicao=3, lanches=2, inicio=datetime.date(2025, 1, 1), semente=1):
+    aleatorio = random.Random(semente)
+    refeicoes = ["Café da manhã", "Almoço"] + ["Lanche"] * lanches + ["Jantar"]
+    fim = inicio + datetime.timedelta(days=dias - 1)
+    partes = ['<html><head><meta charset="utf-8"><title>Relatório</title></head><body><div class="container">',
+              f'<h2 class="text-lg">Relatório: {inicio:%d/%m/%y} - {fim:%d/%m/%y}</h2>']
+    for i in range(dias):
+        data = inicio + datetime.timedelta(days=i)
+        partes.append(f'<div class="space-y-4"><div class="flex"><h1 class="font-bold text-xl">{data.day} de {MESES[data.month - 1]} de {data.year}</h1>'
+                      f'<p class="text-sm">{aleatorio.uniform(1000, 2500):.1f} kcals / {aleatorio.uniform(100, 300):.1f} carbs</p></div>')
+        partes.append('<div class="rounded border"><div class="p-4"><div class="font-bold text-lg">Glicemias</div>')
+        for j in range(leituras_por_dia):
+            minutos = 6 * 60 + j * (16 * 60 // max(leituras_por_dia, 1)) + aleatorio.randint(0, 59)
+            partes.append(f'<div><p>{TIPOS[j % len(TIPOS)]}</p><p class="text-gray-500">{minutos // 60:02d}:{minutos % 60:02d}: '
+                          f'{max(40, int(aleatorio.gauss(160, 60)))} mg/dl</p></div>')
+        partes.append('</div></div>')
+        for nome in refeicoes:
+            partes.append(f'<div class="rounded border"><div class="p-4"><div class="font-bold text-lg">{nome}</div>'
+                          f'<div class="text-sm text-gray-500">{aleatorio.uniform(100, 800):.1f} kcals / {aleatorio.uniform(10, 90):.1f} carbs</div>')
+            for _ in range(alimentos_por_refeicao):
+                alimento = aleatorio.choice(ALIMENTOS).replace('&', '&amp;')
+                partes.append(f'<div><div><p class="font-bold">{alimento}</p><div><span>1 porção</span>\n <span> {aleatorio.randint(1, 50)}g carbs</span><br></div></div></div>')
+            partes.append('</div></div>')
+        partes.append('</div>')
+    partes.append('</div></body></html>')
+    return "".join(partes)
+
+def gerar_mhtml(dias, **opcoes):
+    """Bytes de um .mhtml com 'dias' dias; as opções são as de gerar_html."""
+    corpo = quopri.encodestring(gerar_html(dias, **opcoes).encode('utf-8')).decode('ascii').replace('\n', '\r\n')
+    return (f'From: <Saved by Blink>\r\nSubject: Relatorio\r\nMIME-Version: 1.0\r\nContent-Type: multipart/related;\r\n'
+            f'\ttype="text/html";\r\n\tboundary="{FRONTEIRA}"\r\n\r\n\r\n--{FRONTEIRA}\r\nContent-Type: text/html\r\n'
+            f'Content-ID: <frame-1>\r\nContent-Transfer-Encoding: quoted-printable\r\nContent-Location: https://exemplo/relatorio\r\n\r\n'
+            f'{corpo}\r\n--{FRONTEIRA}\r\nContent-Type: text/css\r\nContent-Transfer-Encoding: quoted-printable\r\n\r\nbody{{}}\r\n'
+            f'--{FRONTEIRA}--\r\n').encode('ascii')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera uma exportação .mhtml sintética.')
+    parser.add_argument('dias', type=int)
+    parser.add_argument('-o', '--saida', help='Arquivo de saída (padrão: stdout)')
+    parser.add_argument('--leituras', type=int, default=5, help='Glicemias por dia')
+    parser.add_argument('--alimentos', type=int, default=3, help='Alimentos por refeição')
+    parser.add_argument('--lanches', type=int, default=2, help='Refeições "Lanche" por dia')
+    parser.add_argument('--inicio', type=datetime.date.fromisoformat, default=datetime.date(2025, 1, 1))
+    parser.add_argument('--semente', type=int, default=1)
+    args = parser.parse_args()
+    conteudo = gerar_mhtml(args.dias, leituras_por_dia=args.leituras, alimentos_por_refeicao=args.alimentos,
+                           lanches=args.lanches, inicio=args.inicio, semente=args.semente)
+    if args.saida:
+        with open(args.saida, 'wb') as f:
+            f.write(conteudo)
+    else:
+        sys.stdout.buffer.write(conteudo)
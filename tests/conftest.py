@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados')
+
+@pytest.fixture
+def exportacao():
+    """Exportação .mhtml pequena (3 dias, 7 leituras e 5 refeições por dia, dois "Lanche"), gerada por benchmarks/gerar_mhtml.py."""
+    with open(os.path.join(DADOS, 'exportacao.mhtml'), 'rb') as f:
+        return f.read()
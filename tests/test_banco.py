@@ -0,0 +1,140 @@
+import datetime
+import io
+import sqlite3
+
+import pytest
+
+from analisador.banco import ESQUEMA_BANCO, BancoGlicemias
+from analisador.extracao import extrair_mhtml
+from analisador.insulina import get_default_correction_table
+from analisador.serie import montar_dados
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+RESUMOS = ('resumos_dias', 'resumos_semanas', 'insulina_dias', 'insulina_semanas')
+LEITURAS = ('dias', 'glicemias', 'refeicoes', 'doses')
+CONTAGEM = dict.fromkeys(('novos', 'substituidos', 'inalterados', 'mantidos', 'ignorados'), 0)
+
+def _dia(data, valores, tipo="Depois do almoço"):
+    """Dia sintético; com leituras pós-prandiais a dose é só a correção (101-135 = 1, 136-170 = 2, ...)."""
+    return {"data": f"{data.day} de {MESES[data.month - 1]} de {data.year}", "total_kcal": 0, "total_carbs": 0, "refeicoes": [],
+            "glicemias": [{"hora": f"{8 + i:02d}:00", "valor": valor, "tipo": tipo} for i, valor in enumerate(valores)]}
+
+def _importar(banco, dias, paciente="Ana", carb_ratio=15, tabela=None, dataset_id=None):
+    tabela = tabela or get_default_correction_table()
+    return banco.importar(montar_dados({"periodo": "", "dias": dias}, paciente, carb_ratio, tabela, dataset_id), carb_ratio, tabela)
+
+def _tabelas(banco, tabelas):
+    with sqlite3.connect(banco.caminho) as conexao:
+        return {tabela: sorted(conexao.execute(f"SELECT * FROM {tabela}").fetchall()) for tabela in tabelas}
+
+@pytest.fixture
+def banco(tmp_path):
+    return BancoGlicemias(str(tmp_path / 'glicemias.db'))
+
+@pytest.fixture
+def base(exportacao):
+    return extrair_mhtml(io.BytesIO(exportacao))[0]
+
+def test_reimportar_a_mesma_exportacao_nao_altera_o_banco(banco, base):
+    assert _importar(banco, base['dias'], dataset_id='exportacao') == {**CONTAGEM, "novos": 3}
+    antes = _tabelas(banco, LEITURAS + RESUMOS)
+    assert _importar(banco, base['dias'], dataset_id='exportacao') == {**CONTAGEM, "inalterados": 3}
+    assert _tabelas(banco, LEITURAS + RESUMOS) == antes
+    assert banco.carregar_base("Ana") == {"periodo": "01/01/25 - 03/01/25", "dias": base['dias']}
+
+def test_reimportar_dia_alterado_substitui_so_o_dia(banco, base):
+    _importar(banco, base['dias'])
+    alterado = [dict(dia, glicemias=[dict(g) for g in dia['glicemias']]) for dia in base['dias']]
+    alterado[1]['glicemias'][0]['valor'] += 50
+    assert _importar(banco, alterado) == {**CONTAGEM, "substituidos": 1, "inalterados": 2}
+    assert banco.carregar_base("Ana")['dias'] == alterado
+    # Um dia menos completo que o gravado não o substitui
+    incompleto = [dict(alterado[2], glicemias=alterado[2]['glicemias'][:-1])]
+    assert _importar(banco, incompleto) == {**CONTAGEM, "mantidos": 1}
+    assert banco.carregar_base("Ana")['dias'][2] == alterado[2]
+
+def test_dia_sem_data_reconhecivel(banco):
+    assert _importar(banco, [dict(_dia(datetime.date(2025, 1, 1), [120]), data="Ontem")]) == {**CONTAGEM, "ignorados": 1}
+
+def test_resumos_incrementais_iguais_a_reconstruir(banco):
+    """Importações, substituições e outros parâmetros em sequência: os agregados incrementais batem com a reconstrução."""
+    segunda = datetime.date(2025, 3, 3)
+    semana = lambda inicio, valores: [_dia(segunda + datetime.timedelta(days=inicio + i), [v + 7 * i for v in valores]) for i in range(9)]
+    _importar(banco, semana(0, [95, 150, 210]))
+    _importar(banco, semana(5, [60, 130, 190, 260]))  # Sobrepõe dias e muda a virada da semana
+    _importar(banco, semana(0, [100, 140]), paciente="Bia")
+    _importar(banco, semana(5, [60, 130, 190, 260]), carb_ratio=10, tabela={"101-200": 1, "200+": 2})  # Outros parâmetros, mesmos dias
+    _importar(banco, semana(7, [300, 310, 45, 100, 120]))  # Substitui dias com doses de dois conjuntos de parâmetros
+    incrementais = _tabelas(banco, RESUMOS)
+    banco.reconstruir_resumos()
+    assert _tabelas(banco, RESUMOS) == incrementais
+
+def test_migracao_da_versao_1(banco, tmp_path):
+    """Um banco da versão 1 (sem agregados nem parâmetros por paciente) ganha os agregados iguais aos incrementais."""
+    segunda = datetime.date(2025, 3, 3)
+    _importar(banco, [_dia(segunda + datetime.timedelta(days=i), [90 + 20 * i, 180 + i]) for i in range(10)])
+    _importar(banco, [_dia(segunda, [250])], paciente="Bia")
+    caminho_v1 = str(tmp_path / 'v1.db')
+    esquema_v1 = ESQUEMA_BANCO[:ESQUEMA_BANCO.index("CREATE TABLE IF NOT EXISTS resumos_dias")].replace(", parametros_id TEXT)", ")")
+    with sqlite3.connect(caminho_v1) as v1, sqlite3.connect(banco.caminho) as v2:
+        v1.executescript(esquema_v1)
+        for tabela in ('pacientes', 'parametros', 'importacoes') + LEITURAS:
+            linhas = v2.execute(f"SELECT * FROM {tabela}").fetchall()
+            if tabela == 'pacientes':
+                linhas = [linha[:2] for linha in linhas]
+            if linhas:
+                v1.executemany(f"INSERT INTO {tabela} VALUES ({', '.join('?' * len(linhas[0]))})", linhas)
+        v1.execute("PRAGMA user_version = 1")
+    migrado = BancoGlicemias(caminho_v1)
+    with sqlite3.connect(caminho_v1) as conexao:
+        assert conexao.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert _tabelas(migrado, RESUMOS + ('pacientes',)) == _tabelas(banco, RESUMOS + ('pacientes',))
+    assert migrado.coorte(fim=segunda) == banco.coorte(fim=segunda)
+
+# --- Painel da coorte ---
+SEGUNDA = datetime.date(2025, 3, 3)
+
+def _importar_coorte(banco):
+    """Ana: semana de 03/03 (seg e dom), de 10/03 e de 17/03; Bia: quarta, 12/03. Doses (só correção): 200 = 3, 150 = 2, 250 = 5, 300 = 6, 180 = 3, 120 = 1."""
+    dia = lambda n, valores: _dia(SEGUNDA + datetime.timedelta(days=n), valores)
+    _importar(banco, [dia(0, [100, 200]), dia(6, [60]), dia(7, [150, 250]), dia(14, [300])])
+    _importar(banco, [dia(9, [180, 120])], paciente="Bia")
+
+def _resumo(dias, leituras, media, desvio, hba1c, no_alvo, abaixo, acima, insulina):
+    return {"dias": dias, "leituras": leituras, "glicemia_media": media, "desvio_padrao": desvio, "hba1c_estimada": hba1c,
+            "no_alvo": no_alvo, "abaixo": abaixo, "acima": acima, "insulina": insulina}
+
+COORTE = {
+    "semanas": ["2025-03-03", "2025-03-10"], "fim": "2025-03-16",
+    "pacientes": [
+        {"nome": "Ana", "semanas": {"2025-03-03": _resumo(2, 3, 120, 72.1, 5.8, 33, 33, 33, 3), "2025-03-10": _resumo(1, 2, 200, 70.7, 8.6, 50, 0, 50, 7)},
+         "periodo": _resumo(3, 5, 152, 76.0, 6.9, 40, 20, 40, 10)},
+        {"nome": "Bia", "semanas": {"2025-03-10": _resumo(1, 2, 150, 42.4, 6.9, 100, 0, 0, 4)}, "periodo": _resumo(1, 2, 150, 42.4, 6.9, 100, 0, 0, 4)},
+    ],
+}
+
+@pytest.mark.parametrize('fim', [datetime.date(2025, 3, 10), datetime.date(2025, 3, 12), datetime.date(2025, 3, 16)])
+def test_coorte_agregados(banco, fim):
+    """Qualquer data da semana de 10/03 (segunda a domingo) fecha a janela nela; a semana de 17/03 fica de fora."""
+    _importar_coorte(banco)
+    assert banco.coorte(2, fim) == COORTE
+
+def test_coorte_janela(banco):
+    assert banco.coorte() == {"semanas": [], "pacientes": []}
+    _importar_coorte(banco)
+    padrao = banco.coorte()  # Termina na semana mais recente do banco
+    assert padrao["semanas"][0] == "2025-01-27" and padrao["semanas"][-1] == "2025-03-17" and len(padrao["semanas"]) == 8
+    assert padrao["fim"] == "2025-03-23" and [p["nome"] for p in padrao["pacientes"]] == ["Ana", "Bia"]
+    ultima = banco.coorte(1, datetime.date(2025, 3, 17))
+    assert ultima["semanas"] == ["2025-03-17"] and ultima["pacientes"] == [
+        {"nome": "Ana", "semanas": {"2025-03-17": _resumo(1, 1, 300, 0, 12.1, 0, 0, 100, 6)}, "periodo": _resumo(1, 1, 300, 0, 12.1, 0, 0, 100, 6)}]
+    assert banco.coorte(2, datetime.date(2025, 3, 2))["pacientes"] == []  # Domingo anterior: semanas de 17/02 e 24/02
+
+def test_coorte_apos_substituir_dia(banco):
+    """A substituição de um dia aplica só a diferença nos agregados da semana."""
+    _importar_coorte(banco)
+    assert _importar(banco, [_dia(SEGUNDA + datetime.timedelta(days=7), [150, 100])])["substituidos"] == 1
+    ana = banco.coorte(2, SEGUNDA)["pacientes"][0]
+    assert ana["semanas"]["2025-03-03"] == COORTE["pacientes"][0]["semanas"]["2025-03-03"]
+    ana = banco.coorte(2, SEGUNDA + datetime.timedelta(days=7))["pacientes"][0]
+    assert ana["semanas"]["2025-03-10"] == _resumo(1, 2, 125, 35.4, 6.0, 100, 0, 0, 2)
@@ -0,0 +1,60 @@
+import io
+import os
+
+from analisador import extracao, web
+from analisador.extracao import CacheRelatorios, extrair_mhtml
+from analisador.insulina import get_default_correction_table
+from analisador.serie import montar_dados
+from analisador.web import CacheFragmentos, renderizar_dias
+
+BASE = {"periodo": "01/01/25 - 01/01/25", "dias": []}
+
+def test_arquivo_podado_por_outro_processo_conta_como_ausente(tmp_path, monkeypatch):
+    cache = CacheRelatorios(max_bytes=0, diretorio=str(tmp_path))  # max_bytes=0: nada fica em memória
+    cache.guardar('a', BASE)
+    assert cache.obter('a') == BASE
+    os.remove(tmp_path / 'a.json')
+    assert cache.obter('a') is None
+    cache.guardar('b', BASE)
+    original = extracao.os.utime
+    def podado_antes_do_utime(caminho, *args):
+        os.remove(caminho)
+        return original(caminho, *args)
+    monkeypatch.setattr(extracao.os, 'utime', podado_antes_do_utime)
+    assert cache.obter('b') is None
+
+def test_poda_do_disco_sem_varrer_a_cada_gravacao(tmp_path, monkeypatch):
+    cache = CacheRelatorios(max_bytes=0, diretorio=str(tmp_path), max_arquivos_disco=20)
+    varreduras = []
+    original = extracao.os.scandir
+    monkeypatch.setattr(extracao.os, 'scandir', lambda caminho: varreduras.append(caminho) or original(caminho))
+    for i in range(60):
+        cache.guardar(f'k{i}', BASE)
+    assert len(varreduras) <= 15  # Antes: uma varredura por gravação
+    restantes = sorted(os.listdir(tmp_path))
+    assert len(restantes) <= 20 and 'k59.json' in restantes
+    cache.guardar('k0', BASE)  # Regravar uma chave existente não conta como arquivo novo
+    assert cache.obter('k59') == BASE
+
+def test_fragmentos_so_dos_dias_com_doses_alteradas(exportacao, monkeypatch):
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    template, renderizados = web.registro_templates.obter('dia'), []
+    original = template.render
+    monkeypatch.setattr(template, 'render', lambda **contexto: renderizados.append(contexto['dia_idx']) or original(**contexto))
+    cache, tabela = CacheFragmentos(), get_default_correction_table()
+    def renderizar(tabela):
+        renderizados.clear()
+        with web.app.app_context():
+            return renderizar_dias(montar_dados(base, "Ana", 15, tabela, 'exportacao'), cache)
+    inicial = renderizar(tabela)
+    assert renderizados == [0, 1, 2]
+    assert renderizar(dict(tabela)) == inicial and renderizados == []
+    # 241-275 só alcança 266 (dia 1) e 254 (dia 2): o dia 3 vem do cache
+    alterada = renderizar({**tabela, "241-275": 9})
+    assert renderizados == [0, 1]
+    assert alterada[2] == inicial[2] and alterada[0] != inicial[0] and alterada[1] != inicial[1]
+    assert "Correção (266mg/dL = 9UI)" in alterada[0] and "Correção (254mg/dL = 9UI)" in alterada[1]
+    # Nenhuma leitura passa de 310: mudar 311-345 não altera dose alguma
+    assert renderizar({**tabela, "241-275": 9, "311-345": 12}) == alterada and renderizados == []
+    # Voltar à tabela original reaproveita os fragmentos da primeira renderização
+    assert renderizar(tabela) == inicial and renderizados == []
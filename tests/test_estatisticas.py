@@ -0,0 +1,120 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from analisador import estatisticas
+from analisador.estatisticas import analisar_dados_gerais, reduzir_lttb, resumo_somas, somas_glicemias
+from analisador.serie import SerieGlicemias
+
+TIPOS = ["Antes do café da manhã", "Depois do café da manhã", "Antes do almoço", "Depois do almoço", "Antes do jantar", "Depois do jantar"]
+
+def _dias(quantidade, leituras_por_dia=6, semente=3):
+    """Dias sintéticos; o primeiro, o último e um a cada cinco ficam sem leituras."""
+    aleatorio = random.Random(semente)
+    return [{"data": f"{d % 28 + 1} de Março de 2025", "refeicoes": [],
+             "glicemias": [{"hora": f"{6 + 3 * i:02d}:00", "valor": max(40, int(aleatorio.gauss(150, 60))), "tipo": TIPOS[i % len(TIPOS)]}
+                           for i in range(0 if d % 5 == 0 or d == quantidade - 1 else leituras_por_dia)]} for d in range(quantidade)]
+
+def _percentil(ordenados, p):
+    pos = (len(ordenados) - 1) * p / 100
+    baixo, alto = ordenados[math.floor(pos)], ordenados[math.ceil(pos)]
+    return round(baixo + (alto - baixo) * (pos - math.floor(pos)), 1)
+
+def _resumo(valores):
+    return {"leituras": len(valores), "glicemia_media": round(statistics.mean(valores)), "glicemia_max": max(valores), "glicemia_min": min(valores),
+            "no_alvo": round(sum(70 <= v <= 180 for v in valores) / len(valores) * 100)}
+
+def _referencia(dias):
+    """As mesmas métricas calculadas da forma direta, com o módulo statistics."""
+    valores = [g['valor'] for dia in dias for g in dia['glicemias']]
+    total, media, desvio = len(valores), statistics.mean(valores), statistics.stdev(valores)
+    tipos = sorted({g['tipo'] for dia in dias for g in dia['glicemias']}, key=[g['tipo'] for dia in dias for g in dia['glicemias']].index)
+    return {
+        "glicemia_media": round(media), "glicemia_max": max(valores), "glicemia_min": min(valores), "desvio_padrao": round(desvio, 1),
+        "hba1c_estimada": round((media + 46.7) / 28.7, 1),
+        "tempo_no_alvo": {"no_alvo": round(sum(70 <= v <= 180 for v in valores) / total * 100), "abaixo": round(sum(v < 70 for v in valores) / total * 100),
+                          "acima": round(sum(v > 180 for v in valores) / total * 100)},
+        "total_leituras": total, "cv": round(desvio / media * 100, 1), "gmi": round(3.31 + 0.02392 * media, 1),
+        "percentis": {f"p{p}": _percentil(sorted(valores), p) for p in (5, 25, 50, 75, 95)},
+        "por_tipo": {tipo: _resumo([g['valor'] for dia in dias for g in dia['glicemias'] if g['tipo'] == tipo]) for tipo in tipos},
+        "por_dia": [{"data": dia['data'], **_resumo([g['valor'] for g in dia['glicemias']])} for dia in dias if dia['glicemias']],
+    }
+
+def _forcar_caminho(monkeypatch, caminho):
+    if caminho == 'numpy':
+        monkeypatch.setattr(estatisticas, 'LIMIAR_NUMPY', 0)
+    else:
+        monkeypatch.setattr(estatisticas, 'carregar_numpy', lambda: None)
+        monkeypatch.setattr(estatisticas, 'LIMIAR_HISTOGRAMA', 0 if caminho == 'histogramas' else 10 ** 9)
+
+@pytest.fixture(params=['ordenada', 'histogramas', 'numpy'])
+def caminho(request, monkeypatch):
+    """Executa o teste pelos três caminhos de analisar_dados_gerais: lista ordenada, histogramas e NumPy."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    _forcar_caminho(monkeypatch, request.param)
+    return request.param
+
+@pytest.mark.parametrize('quantidade', [3, 30, 400])
+def test_analisar_dados_gerais(caminho, quantidade):
+    dias = _dias(quantidade)
+    esperado = _referencia(dias)
+    assert analisar_dados_gerais({"dias": dias}) == esperado
+    assert analisar_dados_gerais({"dias": dias, "serie": SerieGlicemias.de_dias(dias)}) == esperado
+
+def test_sem_leituras(caminho):
+    assert analisar_dados_gerais({"dias": []}) == {}
+    assert analisar_dados_gerais({"dias": [{"data": "1 de Março de 2025", "glicemias": [], "refeicoes": []}]}) == {}
+
+def test_uma_leitura(caminho):
+    analise = analisar_dados_gerais({"dias": [{"data": "1 de Março de 2025", "refeicoes": [], "glicemias": [{"hora": "08:00", "valor": 65, "tipo": "Antes do almoço"}]}]})
+    assert analise['desvio_padrao'] == 0 and analise['tempo_no_alvo'] == {"no_alvo": 0, "abaixo": 100, "acima": 0}
+    assert analise['percentis'] == {"p5": 65, "p25": 65, "p50": 65, "p75": 65, "p95": 65}
+
+def test_resumo_somas_igual_a_analise():
+    dias = _dias(7)
+    valores = [g['valor'] for dia in dias for g in dia['glicemias']]
+    resumo, analise = resumo_somas(7, somas_glicemias(valores)), analisar_dados_gerais({"dias": dias})
+    assert (resumo['glicemia_media'], resumo['desvio_padrao'], resumo['hba1c_estimada']) == (analise['glicemia_media'], analise['desvio_padrao'], analise['hba1c_estimada'])
+    assert {k: resumo[k] for k in ('no_alvo', 'abaixo', 'acima')} == analise['tempo_no_alvo']
+
+@pytest.mark.parametrize('leituras_por_dia', [1, 2, 4])
+def test_caminhos_arredondam_igual(monkeypatch, leituras_por_dia):
+    """Dias com poucas leituras têm médias e percentuais terminados em .5: os três caminhos arredondam igual."""
+    pytest.importorskip('numpy')
+    dados = {"dias": _dias(300, leituras_por_dia, semente=leituras_por_dia)}
+    resultados = []
+    for caminho in ('numpy', 'histogramas', 'ordenada'):
+        with monkeypatch.context() as m:
+            _forcar_caminho(m, caminho)
+            resultados.append(analisar_dados_gerais(dados))
+    assert resultados == [_referencia(dados['dias'])] * 3
+
+# --- LTTB ---
+
+@pytest.mark.parametrize('alvo', [3, 10, 97, 500])
+def test_lttb_mantem_extremidades(alvo):
+    aleatorio = random.Random(alvo)
+    valores = [aleatorio.randint(60, 250) for _ in range(1000)]
+    indices = reduzir_lttb(valores, alvo, [5 * i for i in range(1000)])
+    assert len(indices) == alvo and indices[0] == 0 and indices[-1] == 999
+    assert indices == sorted(set(indices))
+    assert indices == reduzir_lttb(valores, alvo)  # x uniforme: o mesmo que usar a posição
+
+def test_lttb_mantem_picos():
+    valores = [120 + (i % 7) for i in range(2000)]
+    valores[437], valores[1210], valores[1999] = 420, 38, 130
+    indices = reduzir_lttb(valores, 40)
+    assert {437, 1210} <= set(indices)
+
+@pytest.mark.parametrize('alvo', [0, 2, 5, 6])
+def test_lttb_sem_reducao(alvo):
+    assert reduzir_lttb([100, 150, 90, 200, 80], alvo) == [0, 1, 2, 3, 4]
+
+def test_lttb_usa_o_tempo_como_eixo_x():
+    """A última leitura vem horas depois: no tempo, o pico é a leitura de 100, não a de 90."""
+    valores = [0, 60, 100, 90, 200]
+    assert reduzir_lttb(valores, 3) == [0, 3, 4]
+    assert reduzir_lttb(valores, 3, [0, 60, 120, 180, 1200]) == [0, 2, 4]
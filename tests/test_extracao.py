@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+from analisador.extracao import EXTRATORES, carregar_lxml, extrair_mhtml, iterar_html_mhtml, verificar_paridade_extratores
+from analisador.insulina import get_default_correction_table
+from analisador.serie import montar_dados
+
+COMBINACOES = [(extrator, streaming) for extrator in EXTRATORES for streaming in (False, True)]
+
+def _relatorio(conteudo, extrator, streaming):
+    """Estrutura comparável do relatório: dias, refeições e, por leitura, hora, valor, tipo, dose e cálculo."""
+    if extrator == 'lxml' and carregar_lxml() is None:
+        pytest.skip("lxml não instalado")
+    base, erro = extrair_mhtml(io.BytesIO(conteudo), streaming, extrator)
+    assert erro is None
+    dados = montar_dados(base, 'Teste', 15, get_default_correction_table())
+    return base['periodo'], [
+        {"data": dia['data'], "total_kcal": dia['total_kcal'], "total_carbs": dia['total_carbs'], "refeicoes": dia['refeicoes'],
+         "total_insulina": dia['total_insulina'],
+         "glicemias": [(g['hora'], g['valor'], g['tipo'], g['dose_sugerida'], g['calculo']) for g in dia['glicemias']]}
+        for dia in dados['dias']]
+
+@pytest.mark.parametrize('extrator,streaming', COMBINACOES)
+def test_extratores_produzem_o_mesmo_relatorio(exportacao, extrator, streaming):
+    assert _relatorio(exportacao, extrator, streaming) == _relatorio(exportacao, 'bs4', False)
+
+def test_relatorio_da_exportacao(exportacao):
+    periodo, dias = _relatorio(exportacao, 'bs4', False)
+    assert periodo == '01/01/25 - 03/01/25'
+    assert [dia['data'] for dia in dias] == ['1 de Janeiro de 2025', '2 de Janeiro de 2025', '3 de Janeiro de 2025']
+    assert all(len(dia['glicemias']) == 7 and len(dia['refeicoes']) == 5 for dia in dias)
+    assert dias[0]['refeicoes'][0]['alimentos'][0] == {"nome": "Salada verde & tomate", "detalhes": "1 porção 4g carbs"}
+    assert dias[0]['glicemias'][0] == ('06:41', 266, 'Antes do café da manhã', 11, 'Carbs (85.8g / 15 = 6UI) + Correção (266mg/dL = 5UI) = 11UI')
+    assert dias[0]['glicemias'][1] == ('08:23', 193, 'Depois do café da manhã', 3, 'Correção para 193mg/dL = 3UI')
+    assert dias[0]['total_insulina'] == sum(g[3] for g in dias[0]['glicemias'])
+
+def test_verificar_paridade_extratores(exportacao):
+    html = ''.join(iterar_html_mhtml(io.BytesIO(exportacao)))
+    assert verificar_paridade_extratores(html) == []
+
+def test_arquivo_sem_html():
+    base, erro = extrair_mhtml(io.BytesIO(b'MIME-Version: 1.0\r\nContent-Type: text/plain\r\n\r\nnada\r\n'))
+    assert base is None and erro
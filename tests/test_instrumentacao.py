@@ -0,0 +1,105 @@
+import io
+import json
+import logging
+import re
+import threading
+
+from analisador import web
+from analisador.extracao import extrair_mhtml
+from analisador.instrumentacao import BUCKETS_SEGUNDOS, Medicao, Metricas, contar, medicao_atual, medir
+
+AMOSTRA = re.compile(r'^([a-z_]+)(?:\{((?:[a-z_]+="[^"]*",?)*)\})? (\S+)$')
+
+def analisar_exposicao(texto):
+    """
+    Lê o formato texto do Prometheus conferindo a estrutura: HELP e TYPE antes das amostras de
+    cada família, buckets acumulados terminando em +Inf igual a _count, e _sum/_count por série.
+    Devolve {(nome da amostra, rótulos): valor}.
+    """
+    assert texto.endswith("\n")
+    tipos, amostras, ajuda = {}, {}, set()
+    for linha in texto.splitlines():
+        if linha.startswith("# HELP "):
+            ajuda.add(linha.split()[2])
+            continue
+        if linha.startswith("# TYPE "):
+            _, _, familia, tipo = linha.split()
+            assert familia in ajuda and familia not in tipos and tipo in ('histogram', 'counter')
+            tipos[familia] = tipo
+            continue
+        nome, rotulos, valor = AMOSTRA.match(linha).groups()
+        familia = re.sub(r'_(bucket|sum|count)$', '', nome)
+        familia = familia if familia in tipos else nome
+        assert familia in tipos, f"amostra antes do TYPE: {linha}"
+        amostras[(nome, tuple(re.findall(r'([a-z_]+)="([^"]*)"', rotulos or '')))] = float(valor)
+    for (nome, rotulos), valor in amostras.items():
+        if nome.endswith('_count') and tipos.get(nome[:-6]) == 'histogram':
+            familia = nome[:-6]
+            buckets = [amostras[(familia + '_bucket', rotulos + (('le', str(limite)),))] for limite in BUCKETS_SEGUNDOS + ('+Inf',)]
+            assert buckets == sorted(buckets) and buckets[-1] == valor
+            assert (familia + '_sum', rotulos) in amostras
+    return amostras
+
+def test_exportar():
+    metricas = Metricas()
+    metricas.descrever('teste_segundos', 'Duração de teste.')
+    for segundos in (0.0005, 0.003, 0.003, 7, 100):
+        metricas.observar('teste_segundos', (('etapa', 'a'),), segundos)
+    metricas.incrementar('teste_total', (('tipo', 'x'),), 2)
+    texto = metricas.exportar()
+    assert texto.startswith("# HELP teste_segundos Duração de teste.\n# TYPE teste_segundos histogram\n")
+    assert "# HELP teste_total teste_total\n# TYPE teste_total counter\nteste_total{tipo=\"x\"} 2\n" in texto
+    amostras = analisar_exposicao(texto)
+    bucket = lambda le: amostras[('teste_segundos_bucket', (('etapa', 'a'), ('le', le)))]
+    assert (bucket('0.001'), bucket('0.005'), bucket('5'), bucket('10'), bucket('60'), bucket('+Inf')) == (1, 3, 3, 4, 4, 5)
+    assert amostras[('teste_segundos_count', (('etapa', 'a'),))] == 5
+    assert amostras[('teste_segundos_sum', (('etapa', 'a'),))] == round(107.0065, 6)
+
+def test_medicao_isolada_por_contexto():
+    """Cada thread (como cada requisição ou tarefa) vê só a sua Medicao, mesmo intercalando as etapas."""
+    barreira, medicoes = threading.Barrier(2), {}
+    def trabalhar(nome, leituras):
+        assert medicao_atual.get() is None  # Thread nova começa sem medição
+        medicoes[nome] = medicao = Medicao()
+        medicao_atual.set(medicao)
+        for _ in range(3):
+            barreira.wait()
+            with medir(nome):
+                contar('leituras', leituras)
+    threads = [threading.Thread(target=trabalhar, args=args) for args in (('a', 1), ('b', 10))]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert medicoes['a'].contadores == {'leituras': 3} and set(medicoes['a'].etapas) == {'a'}
+    assert medicoes['b'].contadores == {'leituras': 30} and set(medicoes['b'].etapas) == {'b'}
+    assert medicao_atual.get() is None
+
+# --- /metrics e a medição de cada requisição ---
+
+def _raspar(cliente):
+    resposta = cliente.get('/metrics')
+    assert resposta.status_code == 200 and resposta.headers['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    return analisar_exposicao(resposta.get_data(as_text=True))
+
+def test_metrics_apos_requisicao(exportacao, caplog):
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    web.cache_relatorios.guardar('metricas', base)
+    cliente = web.app.test_client()
+    antes = _raspar(cliente)
+    externa = Medicao()
+    token = medicao_atual.set(externa)  # O cliente de teste atende no mesmo thread
+    try:
+        with caplog.at_level(logging.INFO, logger='analisador.requisicoes'):
+            assert cliente.post('/recalculate', json={"dataset_id": 'metricas'}).status_code == 200
+        assert medicao_atual.get() is externa and not externa.etapas and not externa.contadores
+    finally:
+        medicao_atual.reset(token)
+    depois = _raspar(cliente)
+    delta = lambda chave: depois.get(chave, 0) - antes.get(chave, 0)
+    assert delta(('analisador_requisicoes_total', (('rota', 'recalculate'), ('metodo', 'POST'), ('status', '200')))) == 1
+    assert delta(('analisador_requisicao_segundos_count', (('rota', 'recalculate'),))) == 1
+    assert delta(('analisador_requisicao_segundos_bucket', (('rota', 'recalculate'), ('le', '+Inf')))) == 1
+    assert delta(('analisador_etapa_segundos_count', (('etapa', 'doses'),))) >= 1
+    assert ('analisador_requisicoes_total', (('rota', 'metrics'), ('metodo', 'GET'), ('status', '200'))) in depois
+    # O log da requisição traz só as etapas dela, não as da extração feita acima
+    registro, = [json.loads(r.getMessage()) for r in caplog.records if r.name == 'analisador.requisicoes']
+    assert registro['rota'] == 'recalculate' and set(registro['etapas_ms']) == {'doses'} and registro['contadores'] == {}
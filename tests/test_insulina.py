@@ -0,0 +1,41 @@
+import pytest
+
+from analisador import insulina
+from analisador.insulina import TabelaCorrecao, calcular_dose_insulina, compilar_tabela_correcao, get_default_correction_table
+
+@pytest.mark.parametrize('glicemia,dose', [(45, 0), (100, 0), (101, 1), (135, 1), (136, 2), (205, 3), (206, 4), (310, 6), (345, 7), (346, 8), (600, 8)])
+def test_dose_da_tabela_padrao(glicemia, dose):
+    assert compilar_tabela_correcao(get_default_correction_table()).dose(glicemia) == dose
+
+def test_tabela_fora_de_ordem_e_doses_em_texto():
+    tabela = TabelaCorrecao({"200+": "3", "101-150": "1", "151-200": "2"})
+    assert [tabela.dose(g) for g in (100, 101, 150, 151, 200, 201)] == [0, 1, 1, 2, 2, 3]
+
+def test_doses_float_inteiras():
+    """JSON pode trazer as doses como 1.0; compilam igual a 1 (e usam a mesma entrada do cache)."""
+    tabela = compilar_tabela_correcao({"101-150": 1.0, "151-200": 2, "200+": "3"})
+    assert tabela is compilar_tabela_correcao({"101-150": 1, "151-200": 2.0, "200+": 3.0})
+    assert [tabela.dose(g) for g in (101, 151, 201)] == [1, 2, 3]
+    with pytest.raises(ValueError):
+        compilar_tabela_correcao({"101-150": 1.5})
+
+@pytest.mark.parametrize('tabela', [{"101-150": 1, "140-200": 2}, {"101-150": 1, "160-200": 2}, {"101-abc": 1}, {"101-150": "x"}, {"150-101": 1}])
+def test_tabela_invalida(tabela):
+    with pytest.raises(ValueError):
+        TabelaCorrecao(tabela)
+
+@pytest.mark.parametrize('sem_numpy', [False, True])
+def test_doses_para_igual_a_dose(monkeypatch, sem_numpy):
+    if sem_numpy:
+        monkeypatch.setattr(insulina, 'carregar_numpy', lambda: None)
+    tabela = compilar_tabela_correcao(get_default_correction_table())
+    glicemias = list(range(30, 700))
+    assert [int(d) for d in tabela.doses_para(glicemias)] == [tabela.dose(g) for g in glicemias]
+    assert list(TabelaCorrecao({}).doses_para([150, 300])) == [0, 0]
+
+def test_calcular_dose_insulina():
+    antes = calcular_dose_insulina({"valor": 180}, 45.0, "Antes do almoço", 15)
+    assert antes['dose_sugerida'] == 6 and antes['calculo'] == "Carbs (45.0g / 15 = 3UI) + Correção (180mg/dL = 3UI) = 6UI"
+    depois = calcular_dose_insulina({"valor": 180}, 45.0, "Depois do almoço", 15)
+    assert depois['dose_sugerida'] == 3 and depois['calculo'] == "Correção para 180mg/dL = 3UI"
+    assert calcular_dose_insulina({"valor": 90}, 45.0, "Antes do almoço", 0)['dose_sugerida'] == 0
@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+
+from analisador import lote, web
+from analisador.lote import importar_lote, main_lote, pool_lote, tabela_correcao_argumento
+
+TABELA = {"101-200": "1", "200+": "2"}
+
+@pytest.fixture
+def arquivo(exportacao, tmp_path):
+    caminho = tmp_path / 'exportacao.mhtml'
+    caminho.write_bytes(exportacao)
+    return str(caminho)
+
+def _lote(arquivo, tmp_path, *opcoes):
+    saida = tmp_path / 'resumo.json'
+    assert main_lote([arquivo, '--processos', '1', '--banco', '', '--json', str(saida), *opcoes]) == 0
+    return json.loads(saida.read_text(encoding='utf-8'))['pacientes'][0]
+
+def test_tabela_correcao_argumento(tmp_path):
+    assert tabela_correcao_argumento("101-200=1, 200+=2") == TABELA
+    arquivo = tmp_path / 'tabela.json'
+    arquivo.write_text(json.dumps(TABELA), encoding='utf-8')
+    assert tabela_correcao_argumento(str(arquivo)) == TABELA
+
+@pytest.mark.parametrize('texto', ["101-200", "101-200=1,150-300=2", "", "101-x=1"])
+def test_tabela_correcao_argumento_invalida(texto, capsys):
+    with pytest.raises(SystemExit) as saida:
+        main_lote(['qualquer.mhtml', '--correction-table', texto])
+    assert saida.value.code == 2 and 'tabela de correção inválida' in capsys.readouterr().err
+
+def test_tabela_correcao_json_invalido(tmp_path):
+    arquivo = tmp_path / 'tabela.json'
+    arquivo.write_text('[1, 2]', encoding='utf-8')
+    with pytest.raises(SystemExit):
+        main_lote(['qualquer.mhtml', '--correction-table', str(arquivo)])
+
+def test_main_lote_usa_tabela_de_correcao(arquivo, tmp_path):
+    padrao = _lote(arquivo, tmp_path)
+    com_tabela = _lote(arquivo, tmp_path, '--correction-table', '101-200=1,200+=2')
+    assert com_tabela['total_insulina'] < padrao['total_insulina']
+    assert com_tabela['glicemia_media'] == padrao['glicemia_media']
+
+def test_pool_compartilhado(exportacao, monkeypatch):
+    monkeypatch.setattr(lote, '_pool_lote', None)
+    pool = pool_lote(1)
+    try:
+        assert pool_lote(4) is pool
+        arquivos = [("a.mhtml", "Ana", exportacao), ("b.mhtml", "Bia", exportacao)]
+        resultado = importar_lote(arquivos, 15, TABELA, pool=pool)
+        assert [r['status'] for r in resultado['arquivos']] == ['ok', 'ok'] and set(resultado['pacientes']) == {"Ana", "Bia"}
+        assert importar_lote(arquivos[:1], 15, TABELA, pool=pool)['arquivos'][0]['status'] == 'ok'  # O pool continua aberto
+    finally:
+        pool.shutdown()
+
+def test_batch_usa_pool_compartilhado(exportacao, monkeypatch):
+    monkeypatch.setattr(lote, '_pool_lote', None)
+    monkeypatch.setattr(web, 'banco_glicemias', lambda: None)
+    cliente, pools = web.app.test_client(), []
+    try:
+        for _ in range(2):
+            resposta = cliente.post('/batch', data={"report_files": [(io.BytesIO(exportacao), 'semana.mhtml')]})
+            assert resposta.status_code == 200 and resposta.json['arquivos'][0]['status'] == 'ok'
+            pools.append(lote._pool_lote)
+        assert pools[0] is not None and pools[0] is pools[1]
+    finally:
+        pools[0].shutdown()
@@ -0,0 +1,67 @@
+import io
+import re
+import zlib
+
+import pytest
+
+from analisador.extracao import extrair_mhtml
+from analisador.insulina import get_default_correction_table
+from analisador.pdf import gerar_pdf
+from analisador.serie import montar_dados
+
+@pytest.fixture
+def dados(exportacao):
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    return montar_dados(base, "Ana", 15, get_default_correction_table(), 'exportacao')
+
+def _objetos(pdf):
+    """Lê a tabela xref a partir de 'startxref' e devolve {número: bytes do objeto}, conferindo cada deslocamento."""
+    assert pdf.startswith(b'%PDF-1.4\n') and pdf.endswith(b'%%EOF\n')
+    inicio_xref = int(re.search(rb'startxref\n(\d+)\n%%EOF\n$', pdf).group(1))
+    assert pdf[inicio_xref:].startswith(b'xref\n')
+    cabecalho = re.match(rb'xref\n0 (\d+)\n', pdf[inicio_xref:])
+    total, entradas = int(cabecalho.group(1)), inicio_xref + cabecalho.end()
+    linhas = [pdf[entradas + 20 * k:entradas + 20 * (k + 1)] for k in range(total)]  # Entradas de 20 bytes exatos
+    assert linhas[0] == b'0000000000 65535 f \n'
+    trailer = pdf[entradas + 20 * total:]
+    assert trailer.startswith(b'trailer\n') and re.search(rb'/Size (\d+)', trailer).group(1) == b'%d' % total
+    objetos = {}
+    for numero, linha in enumerate(linhas[1:], 1):
+        assert re.fullmatch(rb'\d{10} 00000 n \n', linha)
+        posicao = int(linha[:10])
+        assert pdf[posicao:].startswith(b'%d 0 obj\n' % numero)
+        fim = pdf.index(b'\nendobj\n', posicao)
+        objetos[numero] = pdf[posicao + len(b'%d 0 obj\n' % numero):fim]
+    return objetos, trailer
+
+def _fluxo(objeto):
+    """Descompacta o fluxo de um objeto, conferindo /Length."""
+    comprimento = int(re.match(rb'<< /Length (\d+) /Filter /FlateDecode >>\nstream\n', objeto).group(1))
+    inicio = objeto.index(b'stream\n') + len(b'stream\n')
+    assert objeto[inicio + comprimento:] == b'\nendstream'
+    return zlib.decompress(objeto[inicio:inicio + comprimento])
+
+def test_estrutura_do_pdf(dados):
+    objetos, trailer = _objetos(gerar_pdf(dados))
+    raiz, info = (int(n) for n in re.search(rb'/Root (\d+) 0 R /Info (\d+) 0 R', trailer).groups())
+    assert objetos[raiz] == b'<< /Type /Catalog /Pages 2 0 R >>'
+    assert b'/Title (Relat\xf3rio de Controle Glic\xeamico - Ana - 01/01/25 - 03/01/25)' in objetos[info]
+    kids = [int(n) for n in re.findall(rb'(\d+) 0 R', re.search(rb'/Kids \[(.*?)\]', objetos[2]).group(1))]
+    assert re.search(rb'/Count (\d+)', objetos[2]).group(1) == b'%d' % len(kids) and len(kids) >= 2 + len(dados['dias'])
+    conteudo = b''
+    for pagina in kids:
+        assert objetos[pagina].startswith(b'<< /Type /Page /Parent 2 0 R')
+        fluxo = _fluxo(objetos[int(re.search(rb'/Contents (\d+) 0 R', objetos[pagina]).group(1))])
+        assert fluxo.count(b' BT ') == fluxo.count(b' ET')
+        conteudo += fluxo
+    assert b'(Paciente: Ana | Per\xedodo: 01/01/25 - 03/01/25) Tj' in conteudo
+    for dia in dados['dias']:
+        assert b'(%s) Tj' % dia['data'].encode('cp1252') in conteudo and b'(%d UI) Tj' % round(dia['total_insulina']) in conteudo
+        for g in dia['glicemias']:
+            assert b'(Dose Sugerida: %d UI) Tj' % g.dose_sugerida in conteudo
+
+def test_pdf_deterministico(dados, exportacao):
+    primeiro = gerar_pdf(dados)
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    assert gerar_pdf(dados) == gerar_pdf(montar_dados(base, "Ana", 15, get_default_correction_table(), 'exportacao')) == primeiro
+    assert gerar_pdf(montar_dados(base, "Ana", 10, get_default_correction_table(), 'exportacao')) != primeiro
@@ -0,0 +1,30 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+import analisador_glicemia_real
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+@pytest.mark.parametrize('modulo', sorted(analisador_glicemia_real.EXPORTADOS))
+def test_nomes_exportados(modulo):
+    definicoes = vars(importlib.import_module(f'analisador.{modulo}'))
+    for nome in analisador_glicemia_real.EXPORTADOS[modulo]:
+        assert getattr(analisador_glicemia_real, nome) is definicoes[nome]
+
+def _modulos_apos(codigo):
+    """Executa o código num processo novo e devolve os módulos 'analisador.*' e 'flask' carregados."""
+    saida = subprocess.run([sys.executable, '-c', f"import sys, analisador_glicemia_real as m\n{codigo}\n"
+                            "print(' '.join(sorted(n for n in sys.modules if n.startswith('analisador.') or n == 'flask')))"],
+                           cwd=RAIZ, capture_output=True, text=True, check=True)
+    return saida.stdout.split()
+
+def test_nome_desconhecido_nao_importa_o_pacote():
+    assert _modulos_apos("assert not hasattr(m, 'nao_existe') and not hasattr(m, '__path__')") == []
+
+def test_nome_importa_so_o_seu_modulo():
+    modulos = _modulos_apos("m.montar_dados")
+    assert 'analisador.serie' in modulos and 'flask' not in modulos and 'analisador.web' not in modulos
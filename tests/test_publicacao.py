@@ -0,0 +1,137 @@
+import gzip
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+
+from analisador.extracao import extrair_mhtml
+from analisador.insulina import get_default_correction_table
+from analisador.publicacao import ARQUIVO_MANIFESTO, dados_compactos
+from analisador.serie import montar_dados
+from analisador.web import app, publicar_relatorios
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+ARQUIVO = "relatorio_glicemico_ana_01-01-25 - 03-01-25.html"
+COMPACTO = "relatorio_glicemico_ana_01-01-25 - 03-01-25.json.gz"
+
+@pytest.fixture
+def item(exportacao):
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    return {"base": base, "dataset_id": 'exportacao', "paciente": "Ana", "carb_ratio": 15, "correction_table": get_default_correction_table()}
+
+@pytest.fixture
+def destino(tmp_path):
+    return str(tmp_path / 'relatorios'), str(tmp_path / 'index.html')
+
+def _manifesto(diretorio):
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), encoding='utf-8') as f:
+        return json.load(f)
+
+def _envelhecer(*caminhos):
+    """Marca os arquivos com mtime 0: se continuarem assim, não foram reescritos."""
+    for caminho in caminhos:
+        os.utime(caminho, (0, 0))
+
+def _reescritos(*caminhos):
+    return [os.path.basename(c) for c in caminhos if os.stat(c).st_mtime != 0]
+
+def test_publicacao_identica_fica_inalterada(item, destino):
+    diretorio, index = destino
+    assert publicar_relatorios([item], *destino) == {"relatorios": {ARQUIVO: 'publicado'}, "index_alterado": True}
+    relatorio, manifesto = os.path.join(diretorio, ARQUIVO), _manifesto(diretorio)
+    assert manifesto["relatorios"][ARQUIVO]["paciente"] == "Ana" and manifesto["relatorios"][ARQUIVO]["formato"] == 'html'
+    _envelhecer(relatorio, index, os.path.join(diretorio, ARQUIVO_MANIFESTO))
+    assert publicar_relatorios([dict(item)], *destino) == {"relatorios": {ARQUIVO: 'inalterado'}, "index_alterado": False}
+    assert _reescritos(relatorio, index, os.path.join(diretorio, ARQUIVO_MANIFESTO)) == []
+    assert _manifesto(diretorio) == manifesto
+
+def test_forcar_e_parametros_novos_republicam(item, destino):
+    diretorio, index = destino
+    publicar_relatorios([item], *destino)
+    relatorio = os.path.join(diretorio, ARQUIVO)
+    _envelhecer(relatorio, index)
+    assert publicar_relatorios([item], *destino, forcar=True)["relatorios"] == {ARQUIVO: 'publicado'}
+    assert _reescritos(relatorio, index) == [ARQUIVO]  # O index só muda se o conteúdo mudar
+    assert publicar_relatorios([dict(item, carb_ratio=10)], *destino)["relatorios"] == {ARQUIVO: 'publicado'}
+    assert _manifesto(diretorio)["relatorios"][ARQUIVO]["parametros"]["carb_ratio"] == 10
+    os.remove(relatorio)  # Arquivo apagado: republica mesmo com a impressão igual
+    assert publicar_relatorios([dict(item, carb_ratio=10)], *destino)["relatorios"] == {ARQUIVO: 'publicado'} and os.path.exists(relatorio)
+
+def test_index_regenerado_do_manifesto(item, destino):
+    diretorio, index = destino
+    publicar_relatorios([item, dict(item, paciente="Bia", formato='compacto')], *destino)
+    with open(index, encoding='utf-8') as f:
+        original = f.read()
+    assert 'href="relatorios/relatorio_glicemico_ana_01-01-25 - 03-01-25.html"' in original
+    assert 'href="relatorios/relatorio.html?dados=relatorio_glicemico_bia_01-01-25%20-%2003-01-25"' in original
+    assert "Relatório de 01/01/25 a 03/01/25 - Bia" in original
+    os.remove(index)  # Apagado, volta igual a partir do manifesto, sem republicar nada
+    assert publicar_relatorios([item], *destino) == {"relatorios": {ARQUIVO: 'inalterado'}, "index_alterado": True}
+    with open(index, encoding='utf-8') as f:
+        assert f.read() == original
+    # Uma entrada removida do manifesto sai do index na próxima publicação
+    manifesto = _manifesto(diretorio)
+    del manifesto["relatorios"]["relatorio_glicemico_bia_01-01-25 - 03-01-25.json.gz"]
+    with open(os.path.join(diretorio, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f)
+    assert publicar_relatorios([item], *destino)["index_alterado"] is True
+    with open(index, encoding='utf-8') as f:
+        assert "Bia" not in f.read()
+
+# --- Formato compacto ---
+
+def _calculo(r, tipo, glicemia):
+    """O calculo() da página compartilhada, para comparar com o texto do relatório HTML."""
+    _, _, valor, dose, dose_carbs, dose_correcao, carbs = glicemia
+    if 'depois' in tipo.lower():
+        return f"Correção para {valor}mg/dL = {dose_correcao}UI"
+    return f"Carbs ({0 if carbs is None else float(carbs)}g / {r['carb_ratio']} = {dose_carbs}UI) + Correção ({valor}mg/dL = {dose_correcao}UI) = {dose}UI"
+
+def _publicar_compacto(diretorio, hashseed):
+    """Publica a exportação de teste no formato compacto num processo novo e devolve os bytes do .json.gz."""
+    codigo = ("import io, sys\n"
+              "from analisador.extracao import extrair_mhtml\n"
+              "from analisador.insulina import get_default_correction_table\n"
+              "from analisador.web import publicar_relatorios\n"
+              "base, _ = extrair_mhtml(open(sys.argv[1], 'rb'))\n"
+              "publicar_relatorios([{'base': base, 'dataset_id': 'exportacao', 'paciente': 'Ana', 'carb_ratio': 15,"
+              " 'correction_table': get_default_correction_table(), 'formato': 'compacto'}], sys.argv[2], sys.argv[2] + '.html')\n")
+    subprocess.run([sys.executable, '-c', codigo, os.path.join(RAIZ, 'tests', 'dados', 'exportacao.mhtml'), str(diretorio)],
+                   cwd=RAIZ, env={**os.environ, 'PYTHONHASHSEED': str(hashseed)}, check=True)
+    with open(os.path.join(diretorio, COMPACTO), 'rb') as f:
+        return f.read()
+
+def test_compacto_deterministico(item, destino, tmp_path):
+    diretorio, _ = destino
+    publicar_relatorios([dict(item, formato='compacto')], *destino)
+    with open(os.path.join(diretorio, COMPACTO), 'rb') as f:
+        conteudo = f.read()
+    assert conteudo[4:8] == bytes(4)  # mtime zerado no cabeçalho gzip
+    publicar_relatorios([dict(item, formato='compacto')], *destino, forcar=True)
+    with open(os.path.join(diretorio, COMPACTO), 'rb') as f:
+        assert f.read() == conteudo
+    # Noutro processo, com outra semente de hash, os bytes são os mesmos
+    assert _publicar_compacto(tmp_path / 'semente1', 1) == _publicar_compacto(tmp_path / 'semente2', 2) == conteudo
+
+def test_compacto_ida_e_volta(item, destino):
+    diretorio, _ = destino
+    publicar_relatorios([dict(item, formato='compacto')], *destino)
+    with open(os.path.join(diretorio, COMPACTO), 'rb') as f:
+        r = json.loads(gzip.decompress(f.read()).decode('utf-8'))
+    dados = montar_dados(item['base'], "Ana", 15, item['correction_table'], 'exportacao')
+    assert r == json.loads(json.dumps(dados_compactos(dados, app.config['GRAFICO_MAX_PONTOS'])))
+    assert (r["paciente"], r["periodo"], r["total_dias"], r["carb_ratio"]) == ("Ana", "01/01/25 - 03/01/25", 3, "15")
+    assert set(r["analise"]) >= {"glicemia_media", "hba1c_estimada", "gmi", "desvio_padrao", "cv", "tempo_no_alvo", "por_tipo", "percentis"}
+    assert r["grafico"]["exibidos"] == r["grafico"]["total"] == 21
+    # A página remonta, de cada leitura, o que o relatório HTML mostra
+    for dia_r, dia in zip(r["dias"], dados['dias'], strict=True):
+        assert (dia_r["data"], dia_r["total_insulina"]) == (dia['data'], dia['total_insulina'])
+        assert [(g[0], r["tipos"][g[1]], g[2], g[3], _calculo(r, r["tipos"][g[1]], g)) for g in dia_r["glicemias"]] == \
+            [(g.hora, g.tipo, g.valor, g.dose_sugerida, g.calculo) for g in dia['glicemias']]
+        assert dia_r["refeicoes"] == [[ref['nome'], ref['total_kcal'], ref['total_carbs'], [[a['nome'], a['detalhes']] for a in ref['alimentos']]]
+                                      for ref in dia['refeicoes']]
+        assert all(g[6] is None or not math.isnan(g[6]) for g in dia_r["glicemias"])
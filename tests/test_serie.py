@@ -0,0 +1,95 @@
+import io
+import math
+
+from analisador.extracao import extrair_mhtml
+from analisador.insulina import calcular_dose_insulina, get_default_correction_table
+from analisador.serie import SerieGlicemias, calcular_doses, carbs_pre_refeicao, categoria_medicao, categoria_refeicao
+
+def _refeicao(nome, carbs, hora=None):
+    refeicao = {"nome": nome, "total_kcal": 0, "total_carbs": carbs, "alimentos": []}
+    if hora: refeicao["hora"] = hora
+    return refeicao
+
+def _glicemia(hora, valor, tipo):
+    return {"hora": hora, "valor": valor, "tipo": tipo}
+
+def test_categorias():
+    assert categoria_refeicao("Café da manhã") == 'cafe'
+    assert categoria_refeicao("Almoço") == 'almoco'
+    assert categoria_refeicao("Lanche da tarde") == 'lanche'
+    assert categoria_refeicao("Ceia") is None
+    assert categoria_medicao("Antes do jantar") == 'jantar'
+    assert categoria_medicao("Depois do jantar") is None
+    assert categoria_medicao("Antes do café") == categoria_medicao("Antes do Café da Manhã") == 'cafe'
+
+def test_carbs_pre_refeicao():
+    refeicoes = [_refeicao("Café da manhã", 40.0), _refeicao("Almoço", 70.0), _refeicao("Jantar", 55.0)]
+    glicemias = [_glicemia("07:00", 120, "Antes do café da manhã"), _glicemia("09:00", 150, "Depois do café da manhã"),
+                 _glicemia("12:00", 110, "Antes do almoço"), _glicemia("15:00", 100, "Antes do lanche"), _glicemia("19:00", 130, "Antes do jantar")]
+    assert carbs_pre_refeicao(glicemias, refeicoes) == [40.0, None, 70.0, None, 55.0]
+    assert carbs_pre_refeicao(glicemias, []) == [None] * 5
+
+def test_carbs_antes_do_cafe_abreviado():
+    assert carbs_pre_refeicao([_glicemia("07:00", 120, "Antes do café")], [_refeicao("Café da manhã", 40.0)]) == [40.0]
+
+def test_varios_lanches_pelo_horario():
+    """Cada medição fica com o primeiro lanche no mesmo horário ou depois dela; o lanche das 10:00, sem medição, não é usado."""
+    refeicoes = [_refeicao("Lanche", 20.0, "10:00"), _refeicao("Lanche", 30.0, "15:30"), _refeicao("Lanche", 15.0, "21:00")]
+    glicemias = [_glicemia("20:50", 140, "Antes do lanche"), _glicemia("15:30", 120, "Antes do lanche"), _glicemia("12:00", 110, "Depois do almoço")]
+    assert carbs_pre_refeicao(glicemias, refeicoes) == [15.0, 30.0, None]
+
+def test_lanches_fora_de_ordem_e_horario_no_nome():
+    refeicoes = [_refeicao("Lanche 21:00", 15.0), _refeicao("Jantar", 50.0, "19:00"), _refeicao("Lanche 9:45", 20.0)]
+    glicemias = [_glicemia("09:40", 100, "Antes do lanche"), _glicemia("18:55", 130, "Antes do jantar"), _glicemia("20:55", 150, "Antes do lanche")]
+    assert carbs_pre_refeicao(glicemias, refeicoes) == [20.0, 50.0, 15.0]
+
+def test_medicoes_repetidas_antes_da_mesma_refeicao():
+    refeicoes = [_refeicao("Lanche", 30.0, "15:30"), _refeicao("Café da manhã", 40.0)]
+    glicemias = [_glicemia("07:00", 120, "Antes do café da manhã"), _glicemia("08:30", 250, "Antes do café da manhã"),
+                 _glicemia("15:00", 120, "Antes do lanche"), _glicemia("15:40", 110, "Antes do lanche")]
+    assert carbs_pre_refeicao(glicemias, refeicoes) == [40.0, 40.0, 30.0, 30.0]
+
+def test_cartoes_repetidos_sem_horario():
+    """Sem horário, entre dois cartões de mesmo nome vale o de menos carboidratos, em qualquer ordem dos cartões."""
+    glicemias = [_glicemia("20:06", 150, "Antes do jantar")]
+    assert carbs_pre_refeicao(glicemias, [_refeicao("Jantar", 36.0), _refeicao("Jantar", 31.0)]) == [31.0]
+    assert carbs_pre_refeicao(glicemias, [_refeicao("Jantar", 31.0), _refeicao("Jantar", 36.0)]) == [31.0]
+
+def test_lanche_qualificado():
+    """O qualificador do nome ("da manhã", "da tarde") decide o lanche; a palavra-chave só vale para quem não tem qualificador."""
+    refeicoes = [_refeicao("Lanche da tarde", 33.0), _refeicao("Lanche da manhã", 32.0)]
+    glicemias = [_glicemia("15:29", 183, "Antes do lanche da tarde"), _glicemia("10:00", 120, "Antes do lanche"), _glicemia("16:00", 120, "Antes do lanche")]
+    assert carbs_pre_refeicao(glicemias, refeicoes) == [33.0, 32.0, 33.0]
+    assert carbs_pre_refeicao([_glicemia("15:29", 183, "Antes do lanche da tarde")], [_refeicao("Lanche da manhã", 32.0)]) == [None]
+    assert carbs_pre_refeicao([_glicemia("15:29", 183, "Antes do lanche da tarde")], [_refeicao("Lanche", 20.0)]) == [20.0]
+    assert carbs_pre_refeicao([_glicemia("22:00", 140, "Antes da ceia")], [_refeicao("Ceia", 10.0)]) == [10.0]
+
+def test_dia_do_relatorio_de_exemplo():
+    """27 de Agosto de 2025 em relatorios/relatorio_glicemico_cleiton_25-08-25 - 09-09-25.html, com os cartões na ordem da exportação."""
+    refeicoes = [_refeicao("Jantar", 104.0), _refeicao("Café da manhã", 121.0), _refeicao("Lanche da manhã", 32.0),
+                 _refeicao("Almoço", 75.5), _refeicao("Lanche da tarde", 33.0), _refeicao("Ceia", 10.0)]
+    glicemias = [_glicemia("07:39", 88, "Antes do café da manhã"), _glicemia("09:15", 252, "Antes do café da manhã"),
+                 _glicemia("12:10", 216, "Antes do almoço"), _glicemia("15:29", 183, "Antes do lanche da tarde"),
+                 _glicemia("19:25", 189, "Antes do jantar"), _glicemia("22:44", 146, "Depois do jantar"), _glicemia("23:59", 208, "Depois do jantar")]
+    assert carbs_pre_refeicao(glicemias, refeicoes) == [121.0, 121.0, 75.5, 33.0, 104.0, None, None]
+
+def test_calcular_doses_igual_a_calcular_dose_insulina(exportacao):
+    """A etapa colunar deve dar, leitura a leitura, a mesma dose e o mesmo texto da função de referência."""
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    tabela = get_default_correction_table()
+    for carb_ratio in (15, 10.5):
+        dias, serie = calcular_doses(base, carb_ratio, tabela)
+        for dia_base, dia in zip(base['dias'], dias):
+            carbs = carbs_pre_refeicao(dia_base['glicemias'], dia_base['refeicoes'])
+            esperado = [calcular_dose_insulina(dict(g), c or 0, g['tipo'], carb_ratio, tabela) for g, c in zip(dia_base['glicemias'], carbs)]
+            assert [(g['dose_sugerida'], g['calculo']) for g in dia['glicemias']] == [(e['dose_sugerida'], e['calculo']) for e in esperado]
+            assert dia['total_insulina'] == sum(e['dose_sugerida'] for e in esperado)
+
+def test_serie_colunar():
+    dias = [{"data": "2 de Janeiro de 2025", "glicemias": [_glicemia("08:30", 140, "Antes do almoço")], "refeicoes": [_refeicao("Almoço", 30.0)]},
+            {"data": "3 de Janeiro de 2025", "glicemias": [], "refeicoes": []}]
+    serie = SerieGlicemias.de_dias(dias).calcular_doses(15, get_default_correction_table())
+    assert len(serie) == 1 and serie.hora(0) == "08:30" and serie.carbs[0] == 30.0
+    assert serie.timestamps[0] == (20090 * 1440) + 8 * 60 + 30
+    assert serie.intervalo_dia(1) == (1, 1) and serie.total_insulina_dia(0) == 4
+    assert math.isnan(SerieGlicemias.de_dias([{"data": "x", "glicemias": [_glicemia("08:00", 90, "Depois do almoço")]}]).carbs[0])
@@ -0,0 +1,149 @@
+import datetime
+import io
+import time
+
+import pytest
+
+from analisador import web
+from analisador.extracao import CacheRelatorios, extrair_mhtml, parse_mhtml
+
+ROTAS = ['/recalculate', '/publish', '/export-pdf']
+
+@pytest.fixture
+def cliente(exportacao, tmp_path):
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    web.cache_relatorios.guardar('teste', base)
+    web.app.config.update(DIRETORIO_RELATORIOS=str(tmp_path / 'relatorios'), ARQUIVO_INDEX=str(tmp_path / 'index.html'))
+    return web.app.test_client()
+
+@pytest.mark.parametrize('rota', ROTAS)
+@pytest.mark.parametrize('tabela', [[1, 2], "101-135", 5, {"101-x": 1}, {"101-150": 1, "140-200": 2}])
+def test_tabela_de_correcao_invalida(cliente, rota, tabela):
+    resposta = cliente.post(rota, json={"dataset_id": 'teste', "carb_ratio": 15, "correction_table": tabela})
+    assert resposta.status_code == 400
+    assert resposta.json['status'] == 'error' and resposta.json['message'].startswith('Parâmetros inválidos')
+
+@pytest.mark.parametrize('rota', ROTAS + ['/chart-data'])
+def test_corpo_que_nao_e_objeto(cliente, rota):
+    assert cliente.post(rota, json=['dataset_id']).status_code == 400
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_tabela_valida(cliente, rota):
+    resposta = cliente.post(rota, json={"dataset_id": 'teste', "carb_ratio": 10, "correction_table": {"101-200": 1, "200+": 2}})
+    assert resposta.status_code == 200
+
+def _janela(cliente, **parametros):
+    return cliente.post('/chart-data', json={"dataset_id": 'teste', **parametros})
+
+def test_chart_data_janela(cliente):
+    completo = _janela(cliente).json
+    assert completo['total'] == completo['exibidos'] == 21
+    dia = _janela(cliente, inicio="2025-01-02", fim="2025-01-02").json
+    assert dia['labels'] == completo['labels'][7:14] and dia['data'] == completo['data'][7:14]
+    # Com hora, os limites são inclusivos: 06:29 e 20:03 são a primeira e a última leitura do dia 2
+    assert _janela(cliente, inicio="2025-01-02T06:29", fim="2025-01-02T20:03").json['labels'] == dia['labels']
+    assert _janela(cliente, inicio="2025-01-02T06:30", fim="2025-01-02T20:02").json['labels'] == dia['labels'][1:-1]
+    reduzido = _janela(cliente, inicio="2025-01-02T08:00", fim="2025-01-03T12:00", max_pontos=3).json
+    janela = _janela(cliente, inicio="2025-01-02T08:00", fim="2025-01-03T12:00").json
+    assert (reduzido['total'], reduzido['exibidos'], janela['exibidos']) == (9, 3, 9)
+    assert reduzido['labels'][0] == janela['labels'][0] and reduzido['labels'][-1] == janela['labels'][-1]
+    assert _janela(cliente, inicio="2030-01-01").json['total'] == 0
+
+@pytest.mark.parametrize('parametros', [{"max_pontos": 2}, {"max_pontos": 0}, {"max_pontos": "muitos"}, {"max_pontos": [5]},
+                                        {"inicio": "ontem"}, {"fim": "2025-13-01"}, {"inicio": 20250101},
+                                        {"inicio": "2025-01-03", "fim": "2025-01-02"}])
+def test_chart_data_parametros_invalidos(cliente, parametros):
+    resposta = _janela(cliente, **parametros)
+    assert resposta.status_code == 400 and resposta.json['message'].startswith('Parâmetros inválidos')
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_tabela_com_doses_float(cliente, rota):
+    resposta = cliente.post(rota, json={"dataset_id": 'teste', "carb_ratio": 15, "correction_table": {"101-200": 1.0, "200+": 2.0}})
+    assert resposta.status_code == 200
+
+def test_recalcular(cliente):
+    dias = cliente.post('/recalculate', json={"dataset_id": 'teste', "carb_ratio": 15}).json['dias']
+    assert dias[0]['glicemias'][0] == {"hora": "06:41", "dose_sugerida": 11, "calculo": "Carbs (85.8g / 15.0 = 6UI) + Correção (266mg/dL = 5UI) = 11UI"}
+
+# --- Painel da coorte ---
+@pytest.fixture
+def banco(cliente, exportacao, tmp_path, monkeypatch):
+    monkeypatch.setitem(web.app.config, 'BANCO_GLICEMIAS', str(tmp_path / 'glicemias.db'))
+    banco = web.banco_glicemias()
+    base, _ = extrair_mhtml(io.BytesIO(exportacao))
+    for paciente in ("Ana", "Bia"):
+        banco.importar(web.montar_dados(base, paciente, 15, web.get_default_correction_table()), 15, web.get_default_correction_table())
+    return banco
+
+def test_coorte_json(cliente, banco):
+    resposta = cliente.get('/coorte?formato=json&semanas=2&fim=2025-01-05')
+    assert resposta.status_code == 200
+    painel = resposta.json
+    assert painel.pop('status') == 'success' and painel == banco.coorte(2, datetime.date(2025, 1, 5))
+    assert painel['semanas'] == ["2024-12-23", "2024-12-30"] and painel['fim'] == "2025-01-05"
+    ana = painel['pacientes'][0]
+    assert ana['nome'] == "Ana" and list(ana['semanas']) == ["2024-12-30"] and ana['periodo']['dias'] == 3 and ana['periodo']['leituras'] == 21
+
+def test_coorte_html(cliente, banco):
+    resposta = cliente.get('/coorte?semanas=2&fim=2025-01-05')
+    assert resposta.status_code == 200
+    pagina = resposta.get_data(as_text=True)
+    ana = banco.coorte(2, datetime.date(2025, 1, 5))['pacientes'][0]['periodo']
+    assert 'Painel da Coorte' in pagina and '2 paciente(s)' in pagina and '/historico?paciente=Bia&inicio=2024-12-23&fim=2025-01-05' in pagina
+    assert f"{ana['no_alvo']}% no alvo" in pagina and f"{ana['glicemia_media']} mg/dL · A1c {ana['hba1c_estimada']}%" in pagina
+
+@pytest.mark.parametrize('parametros', ['semanas=0', 'semanas=105', 'semanas=x', 'fim=05/01/2025'])
+def test_coorte_parametros_invalidos(cliente, banco, parametros):
+    resposta = cliente.get(f'/coorte?formato=json&{parametros}')
+    assert resposta.status_code == 400 and resposta.json['message'].startswith('Parâmetros inválidos')
+    assert cliente.get(f'/coorte?{parametros}').status_code == 302
+
+def test_coorte_sem_banco(cliente, monkeypatch):
+    monkeypatch.setitem(web.app.config, 'BANCO_GLICEMIAS', '')
+    assert cliente.get('/coorte?formato=json').status_code == 400
+    assert cliente.get('/coorte').status_code == 302
+
+# --- Fila de processamento (/jobs) ---
+def _aguardar(cliente, job_id, limite=10):
+    fim = time.monotonic() + limite
+    while (situacao := cliente.get(f'/jobs/{job_id}').json)['situacao'] in ('na_fila', 'processando'):
+        assert time.monotonic() < fim, situacao
+        time.sleep(0.01)
+    return situacao
+
+def test_tarefa_concluida(cliente, exportacao):
+    resposta = cliente.post('/jobs', data={"report_file": (io.BytesIO(exportacao), 'semana.mhtml'), "patient_name": "Ana", "carb_ratio": "15"})
+    assert resposta.status_code == 202
+    job_id = resposta.json['job_id']
+    assert resposta.json['status_url'] == f'/jobs/{job_id}' and resposta.json['report_url'] == f'/jobs/{job_id}/report'
+    situacao = _aguardar(cliente, job_id)
+    assert situacao['situacao'] == 'concluida' and situacao['erro'] is None
+    assert (situacao['progresso'], situacao['dias_processados'], situacao['arquivo']) == (100, 3, 'semana.mhtml')
+    relatorio = cliente.get(f'/jobs/{job_id}/report')
+    assert relatorio.status_code == 200 and 'Ana' in relatorio.get_data(as_text=True)
+
+def test_tarefa_com_erro(cliente):
+    resposta = cliente.post('/jobs', data={"report_file": (io.BytesIO(b'sem html'), 'vazio.mhtml')})
+    situacao = _aguardar(cliente, resposta.json['job_id'])
+    assert situacao['situacao'] == 'erro' and 'HTML' in situacao['erro']
+    assert cliente.get(f"/jobs/{resposta.json['job_id']}/report").status_code == 302
+
+def test_tarefa_desconhecida(cliente):
+    resposta = cliente.get('/jobs/nao-existe')
+    assert resposta.status_code == 404 and resposta.json['status'] == 'error'
+    assert cliente.get('/jobs/nao-existe/report').status_code == 302
+
+@pytest.mark.parametrize('dados', [{}, {"report_file": (io.BytesIO(b''), 'semana.txt')}, {"report_file": (io.BytesIO(b''), 'a.mhtml'), "correction_101-x": "1"}])
+def test_tarefa_invalida(cliente, dados):
+    assert cliente.post('/jobs', data=dados).status_code == 400
+
+def test_progresso_com_base_do_cache(exportacao):
+    """Com a extração no cache, o progresso é informado mesmo sem extrair: todos os dias e o arquivo inteiro lido."""
+    cache, chamadas = CacheRelatorios(), []
+    stream = io.BytesIO(exportacao)
+    progresso = lambda dias: chamadas.append((dias, stream.tell()))
+    parse_mhtml(stream, "Ana", 15, web.get_default_correction_table(), cache=cache, progresso=progresso)
+    chamadas.clear()
+    stream.seek(0)
+    dados, erro = parse_mhtml(stream, "Ana", 15, web.get_default_correction_table(), cache=cache, progresso=progresso)
+    assert erro is None and chamadas == [(3, len(exportacao))]